@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Signup Admission Control Benchmark
+
+Offers signups to the app at a fixed arrival rate above what its storage
+can absorb (the opening-day burst) and compares the latency of successful
+signups with admission control off and on. Without it every request is
+accepted, the backlog grows for as long as the burst lasts and so does
+everyone's latency. With it, signups beyond the concurrency limit and its
+queue are answered 503 straight away and admitted ones stay fast.
+
+Storage is a write-ahead log in "always" mode on an emulated disk that
+serializes fsyncs of ``--fsync-ms``, so capacity is about 1000/fsync-ms
+signups per second regardless of the machine's CPU. Latency is measured
+from each request's scheduled arrival, so a lagging server can't hide it.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_admission.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.app import AppConfig, create_app  # noqa: E402
+from src.admission import SignupAdmission  # noqa: E402
+from src.storage import WALStorage  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+ACTIVITIES = 50
+
+
+class SlowDiskWAL(WALStorage):
+    """Fsync-per-record WAL on a device that takes ``latency`` per write"""
+
+    def __init__(self, directory, latency):
+        super().__init__(directory, durability="always")
+        self.latency = latency
+        self._device = threading.Lock()
+
+    def append(self, record):
+        lsn = super().append(record)
+        with self._device:
+            time.sleep(self.latency)
+        return lsn
+
+
+async def call(app, method, path, query=""):
+    """Send one request straight to the ASGI app and return its status"""
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": query.encode(), "headers": [(b"host", b"bench")],
+             "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def offer(app, names, rate, duration):
+    """Send signups at ``rate`` per second; returns (elapsed, [(status, latency ms)])"""
+    results = []
+
+    async def signup(n, scheduled):
+        status = await call(app, "POST", f"/activities/{names[n % len(names)]}/signup",
+                            f"email=burst-{n}@mergington.edu")
+        results.append((status, (time.perf_counter() - scheduled) * 1e3))
+
+    tasks = []
+    start = time.perf_counter()
+    for n in range(int(rate * duration)):
+        scheduled = start + n / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(signup(n, scheduled)))
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - start, results
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def measure(admission, args):
+    catalog = {
+        f"Activity {i:02d}": {"description": "Benchmark", "schedule": "Mondays, 3:30 PM - 4:30 PM",
+                              "max_participants": 1_000_000, "participants": []}
+        for i in range(ACTIVITIES)
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        store = ActivityStore(catalog, storage=SlowDiskWAL(directory, args.fsync_ms / 1e3))
+        app = create_app(AppConfig(store=store))
+        app.state.admission = admission
+        try:
+            return asyncio.run(offer(app, list(catalog), args.rate, args.duration))
+        finally:
+            store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fsync-ms", type=float, default=2.0, help="storage time per signup")
+    parser.add_argument("--overload", type=float, default=2.0, help="offered load / storage capacity")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of offered load")
+    parser.add_argument("--limit", type=int, default=16, help="signups handled at once")
+    parser.add_argument("--queue", type=int, default=32, help="signups waiting for a slot")
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    args = parser.parse_args(argv)
+    capacity = 1e3 / args.fsync_ms
+    args.rate = capacity * args.overload
+
+    print(f"{args.rate:.0f} signups/s offered for {args.duration:.0f}s against ~{capacity:.0f}/s of storage; "
+          f"admission: {args.limit} at once, {args.queue} queued, {args.queue_timeout}s timeout\n")
+    print(f"{'admission':>9} {'ok/s':>6} {'rejected':>8} {'ok p50':>8} {'ok p99':>8} {'reject p99':>10}   (ms)")
+    setups = {
+        "off": SignupAdmission(email_rate=0, max_concurrent=0),
+        "on": SignupAdmission(email_rate=0, max_concurrent=args.limit, queue_size=args.queue,
+                              queue_timeout=args.queue_timeout),
+    }
+    for label, admission in setups.items():
+        elapsed, results = measure(admission, args)
+        ok = sorted(latency for status, latency in results if status == 200)
+        rejected = sorted(latency for status, latency in results if status in (429, 503))
+        print(f"{label:>9} {len(ok) / elapsed:>6.0f} {len(rejected):>8} {statistics.median(ok):>8.1f} "
+              f"{percentile(ok, 0.99):>8.1f} {percentile(rejected, 0.99):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Async Handler Concurrency Benchmark
+
+Drives signup/unregister traffic through the app in-process at increasing
+concurrency, with the write-ahead log in "group" durability mode, and
+compares the async handlers against the previous threadpool (``def``)
+handlers. A threadpool handler holds one of the 40 threadpool slots while
+it waits for its fsync, so beyond 40 concurrent requests they queue; async
+handlers await the group commit without a thread.
+
+Local disks often fsync in well under a millisecond, so by default every
+fsync is padded to ``--fsync-ms`` to emulate network block storage.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+
+# Allow running as `python benchmarks/bench_async.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.app import AppConfig, create_app  # noqa: E402
+from src.admission import SignupAdmission  # noqa: E402
+from src.storage import WALStorage  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+ACTIVITIES = 50
+CONCURRENCY = (10, 40, 80, 160, 320)
+
+
+class SlowDiskWAL(WALStorage):
+    """Group-commit WAL whose fsyncs take at least ``latency`` seconds"""
+
+    def __init__(self, directory, latency):
+        super().__init__(directory, durability="group")
+        self.latency = latency
+
+    def _flush(self):
+        lsn = super()._flush()
+        time.sleep(self.latency)
+        return lsn
+
+
+def threadpool_app(store):
+    """The signup/unregister handlers as plain ``def`` endpoints"""
+    app = FastAPI()
+
+    @app.post("/activities/{activity_name}/signup")
+    def signup_for_activity(activity_name: str, email: str):
+        store.enroll(activity_name, email)
+        return {"message": f"Signed up {email} for {activity_name}"}
+
+    @app.delete("/activities/{activity_name}/participants/{email}")
+    def unregister_from_activity(activity_name: str, email: str):
+        store.withdraw(activity_name, email)
+        return {"message": f"Unregistered {email} from {activity_name}"}
+
+    return app
+
+
+async def call(app, method, path, query=""):
+    """Send one request straight to the ASGI app and return its status
+
+    Cheaper than an HTTP client, so on small machines the client doesn't
+    eat the CPU the server needs.
+    """
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": query.encode(), "headers": [(b"host", b"bench")],
+             "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def run(app, names, concurrency, requests):
+    """Each user toggles its own enrollment; returns (elapsed, latencies ms, errors)"""
+    latencies, errors = [], [0]
+    remaining = [requests]
+
+    async def user(n):
+        email = f"async-{n}@mergington.edu"
+        activity = names[n % len(names)]
+        enrolled = False
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            if enrolled:
+                status = await call(app, "DELETE", f"/activities/{activity}/participants/{email}")
+            else:
+                status = await call(app, "POST", f"/activities/{activity}/signup", f"email={email}")
+            latencies.append((time.perf_counter() - start) * 1e3)
+            errors[0] += status >= 400
+            enrolled = not enrolled
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies), errors[0]
+
+
+def measure(handlers, concurrency, args):
+    catalog = {
+        f"Activity {i:02d}": {"description": "Benchmark", "schedule": "Mondays, 3:30 PM - 4:30 PM",
+                              "max_participants": 1_000_000, "participants": []}
+        for i in range(ACTIVITIES)
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        store = ActivityStore(catalog, storage=SlowDiskWAL(directory, args.fsync_ms / 1e3))
+        if handlers == "async":
+            app = create_app(AppConfig(store=store))
+            # Measure the handlers alone, without shedding any load
+            app.state.admission = SignupAdmission(email_rate=0, max_concurrent=0)
+        else:
+            app = threadpool_app(store)
+        try:
+            return asyncio.run(run(app, list(catalog), concurrency, args.requests))
+        finally:
+            store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3_000, help="requests per run")
+    parser.add_argument("--fsync-ms", type=float, default=10.0, help="minimum fsync latency (0 = real disk)")
+    args = parser.parse_args(argv)
+
+    print(f"{args.requests} signup/unregister requests per run, fsync >= {args.fsync_ms} ms\n")
+    print(f"{'concurrency':>11} {'handlers':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in CONCURRENCY:
+        for handlers in ("threadpool", "async"):
+            elapsed, latencies, errors = measure(handlers, concurrency, args)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{concurrency:>11} {handlers:>10} {len(latencies) / elapsed:>8.0f} "
+                  f"{statistics.median(latencies):>8.1f} {p99:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Live Event Broadcast Benchmark
+
+Attaches 5k simulated local subscribers to the event hub, publishes changes
+from a worker thread (as the sync route handlers do) and measures how long
+each broadcast takes to reach every subscriber.
+"""
+
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_broadcast.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.events import EventHub  # noqa: E402
+
+SUBSCRIBERS = 5_000
+EVENTS = 500
+SLOW_SUBSCRIBERS = 50
+
+
+async def consume(subscriber, arrivals, done):
+    """Drain a subscriber queue, recording when each version arrives"""
+    while True:
+        message = await subscriber.queue.get()
+        if message is None:
+            return
+        version = int(message.split("\n", 1)[0][4:])
+        arrivals[version].append(time.perf_counter())
+        if len(arrivals[version]) == done["expected"]:
+            done["events"][version].set()
+
+
+async def main():
+    hub = EventHub()
+    arrivals = {version: [] for version in range(1, EVENTS + 1)}
+    done = {
+        "expected": SUBSCRIBERS,
+        "events": {version: asyncio.Event() for version in arrivals},
+    }
+
+    consumers = [
+        asyncio.create_task(consume(hub.subscribe(), arrivals, done))
+        for _ in range(SUBSCRIBERS)
+    ]
+    # Slow consumers never read and should be evicted, not block the rest
+    slow = [hub.subscribe() for _ in range(SLOW_SUBSCRIBERS)]
+
+    fanout, first, median = [], [], []
+    for version in range(1, EVENTS + 1):
+        change = {"version": version, "op": "signup", "activity": "Chess Club", "email": "a@b.c"}
+        start = time.perf_counter()
+        thread = threading.Thread(target=hub.publish, args=(change,))
+        thread.start()
+        await done["events"][version].wait()
+        thread.join()
+        times = arrivals[version]
+        fanout.append((max(times) - start) * 1e3)
+        first.append((min(times) - start) * 1e3)
+        median.append((statistics.median(times) - start) * 1e3)
+
+    print(f"subscribers: {SUBSCRIBERS} (+{SLOW_SUBSCRIBERS} slow, evicted: {hub.evictions})")
+    print(f"events:      {EVENTS}")
+    for label, samples in (("first delivery", first), ("median delivery", median), ("full fan-out", fanout)):
+        samples.sort()
+        p50 = statistics.median(samples)
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        print(f"{label:>16}: p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+    assert all(subscriber.evicted for subscriber in slow)
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
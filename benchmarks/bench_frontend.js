@@ -0,0 +1,193 @@
+#!/usr/bin/env node
+/*
+ * Frontend Rendering Benchmark
+ *
+ * Loads the web page (src/static/index.html and app.js) in jsdom against a
+ * stubbed API serving --activities activities (default 5000) and times:
+ *   - the first render of the catalog
+ *   - 1000 live changes arriving through the event stream
+ *   - a full reload in which one activity changed
+ *   - scrolling to the end of the list
+ * and reports how many cards and dropdown options are in the DOM.
+ *
+ * Pass --baseline <file> to run an older app.js the same way, e.g.
+ *   git show <commit>:src/static/app.js > /tmp/app-old.js
+ *
+ * Requires jsdom, a dev dependency in package.json: run `npm install` first.
+ * Usage: node benchmarks/bench_frontend.js [--activities 5000] [--baseline FILE]
+ */
+
+const fs = require("fs");
+const path = require("path");
+
+let JSDOM;
+try {
+  ({ JSDOM } = require("jsdom"));
+} catch (error) {
+  console.error("This benchmark needs jsdom: run npm install in the repository root");
+  process.exit(1);
+}
+
+const STATIC = path.join(__dirname, "..", "src", "static");
+const CHANGES = 1000;
+
+function parseArgs(argv) {
+  const args = { activities: 5000, script: path.join(STATIC, "app.js"), baseline: null };
+  for (let i = 0; i < argv.length; i += 2) {
+    const key = argv[i].replace(/^--/, "");
+    args[key] = key === "activities" ? Number(argv[i + 1]) : argv[i + 1];
+  }
+  return args;
+}
+
+function catalog(count) {
+  const activities = {};
+  for (let i = 0; i < count; i += 1) {
+    const participants = [];
+    for (let n = 0; n < i % 25; n += 1) {
+      participants.push(`student${i * 31 + n}@mergington.edu`);
+    }
+    activities[`Activity ${String(i).padStart(5, "0")}`] = {
+      description: `Learn skill number ${i} with classmates and compete in friendly events`,
+      schedule: "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
+      max_participants: 30,
+      participants,
+      version: 1,
+    };
+  }
+  return activities;
+}
+
+// Minimal API: catalog listing (one page, counts or rosters), the change
+// feed and nothing else
+function createServer(activities) {
+  const server = { version: 1, activities };
+
+  function listing(params) {
+    const name = params.get("name");
+    const data = {};
+    Object.entries(server.activities).forEach(([key, details]) => {
+      if (name && key !== name) {
+        return;
+      }
+      const { participants, ...rest } = details;
+      data[key] = params.get("participants") === "count"
+        ? { ...rest, participant_count: participants.length }
+        : { ...rest, participants: [...participants] };
+    });
+    return data;
+  }
+
+  server.fetch = async (url) => {
+    const parsed = new URL(url, "http://bench");
+    let body;
+    if (parsed.pathname === "/activities/changes") {
+      body = { version: server.version, resync: true, changes: [] };
+    } else {
+      body = listing(parsed.searchParams);
+    }
+    const headers = { "x-activities-version": String(server.version), etag: `"${server.version}"` };
+    return {
+      ok: true,
+      status: 200,
+      headers: { get: (key) => headers[key.toLowerCase()] || null },
+      json: async () => body,
+    };
+  };
+  return server;
+}
+
+function settle() {
+  return new Promise((resolve) => setTimeout(resolve, 0));
+}
+
+async function until(condition) {
+  while (!condition()) {
+    await settle();
+  }
+}
+
+function nextFrame(window) {
+  return new Promise((resolve) => window.requestAnimationFrame(() => setTimeout(resolve, 0)));
+}
+
+async function run(label, scriptFile, count) {
+  const html = fs.readFileSync(path.join(STATIC, "index.html"), "utf8").replace(/<script[^>]*><\/script>/, "");
+  const dom = new JSDOM(html, { pretendToBeVisual: true, runScripts: "outside-only", url: "http://bench/" });
+  const { window } = dom;
+  const server = createServer(catalog(count));
+  let stream = null;
+  window.fetch = server.fetch;
+  window.confirm = () => true;
+  window.EventSource = class {
+    constructor() {
+      stream = this;
+      this.listeners = {};
+    }
+
+    addEventListener(type, listener) {
+      this.listeners[type] = listener;
+    }
+  };
+  window.eval(fs.readFileSync(scriptFile, "utf8"));
+
+  const document = window.document;
+  const list = document.getElementById("activities-list");
+  const select = document.getElementById("activity");
+  const results = {};
+
+  let start = performance.now();
+  document.dispatchEvent(new window.Event("DOMContentLoaded"));
+  await until(() => select.length === count + 1 && stream !== null);
+  results.firstRender = performance.now() - start;
+  results.cards = list.querySelectorAll(".activity-card").length;
+  results.options = select.length - 1;
+
+  // Live changes: signups spread over the catalog, a few on rendered cards
+  const names = Object.keys(server.activities);
+  start = performance.now();
+  for (let n = 0; n < CHANGES; n += 1) {
+    server.version += 1;
+    const activity = names[(n * 7) % names.length];
+    stream.onmessage({
+      data: JSON.stringify({ op: "signup", activity, email: `new${n}@mergington.edu`, version: server.version }),
+    });
+  }
+  await nextFrame(window);
+  results.changes = performance.now() - start;
+
+  // A full reload where a single activity changed
+  server.version += 1;
+  server.activities[names[0]] = { ...server.activities[names[0]], description: "Changed", version: server.version };
+  start = performance.now();
+  await window.syncActivities();
+  await nextFrame(window);
+  results.reload = performance.now() - start;
+  results.options = Math.max(results.options, select.length - 1);
+
+  start = performance.now();
+  list.scrollTop = count * 200;
+  list.dispatchEvent(new window.Event("scroll"));
+  await nextFrame(window);
+  results.scroll = performance.now() - start;
+
+  window.close();
+  console.log(
+    `${label.padStart(10)} ${results.firstRender.toFixed(0).padStart(12)} ${results.changes.toFixed(0).padStart(12)}`
+    + ` ${results.reload.toFixed(0).padStart(10)} ${results.scroll.toFixed(0).padStart(10)}`
+    + ` ${String(results.cards).padStart(6)} ${String(results.options).padStart(8)}`
+  );
+}
+
+async function main() {
+  const args = parseArgs(process.argv.slice(2));
+  console.log(`${args.activities} activities, ${CHANGES} live changes (ms)\n`);
+  console.log(`${"script".padStart(10)} ${"first render".padStart(12)} ${"changes".padStart(12)}`
+    + ` ${"reload".padStart(10)} ${"scroll".padStart(10)} ${"cards".padStart(6)} ${"options".padStart(8)}`);
+  if (args.baseline) {
+    await run("baseline", args.baseline, args.activities);
+  }
+  await run("current", args.script, args.activities);
+}
+
+main();
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+API Load Benchmark
+
+Seeds the catalog at a configurable scale and drives the real app with a
+mixed list/signup/unregister workload, either in-process through the ASGI
+interface or over HTTP against a local uvicorn server. Reports throughput
+and p50/p95/p99 latency per operation as JSON, which
+``scripts/check_performance.py`` compares against regression thresholds.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Allow running as `python benchmarks/bench_load.py` from anywhere
+sys.path.insert(0, str(ROOT))
+
+from src.storage import SQLiteStorage, WALStorage  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+# (activities, participants) presets; --activities/--participants override
+SCALES = {
+    "ci": (500, 20_000),
+    "small": (1_000, 100_000),
+    "large": (10_000, 1_000_000),
+}
+
+DEFAULT_MIX = "list=80,signup=10,unregister=10"
+
+# Page the client asks for, like the web page's count view
+LIST_PATH = "/activities?participants=count&limit=50"
+
+SCHEDULES = [
+    "Mondays, 3:30 PM - 4:30 PM",
+    "Tuesdays and Thursdays, 3:30 PM - 5:00 PM",
+    "Wednesdays, 4:00 PM - 5:30 PM",
+    "Fridays, 2:00 PM - 4:00 PM",
+    "Saturdays, 10:00 AM - 12:00 PM",
+]
+
+
+def seed_activities(count, participants, seed=0):
+    """Build a catalog of ``count`` activities sharing ``participants`` enrollments
+
+    Every activity keeps spare capacity so signups during the run succeed.
+    """
+    rng = random.Random(seed)
+    per_activity = [participants // count + (i < participants % count) for i in range(count)]
+    catalog = {}
+    student = 0
+    for i, size in enumerate(per_activity):
+        emails = [f"student{student + n}@mergington.edu" for n in range(size)]
+        student += size
+        catalog[f"Activity {i:05d}"] = {
+            "description": f"Benchmark activity {i}",
+            "schedule": rng.choice(SCHEDULES),
+            "max_participants": size + 1_000,
+            "participants": emails,
+        }
+    return catalog
+
+
+def parse_mix(text):
+    """Parse "list=80,signup=10,unregister=10" into normalized weights"""
+    weights = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in ("list", "signup", "unregister"):
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}")
+        weights[op] = float(weight)
+    total = sum(weights.values())
+    return {op: weight / total for op, weight in weights.items()}
+
+
+async def run_workload(http, names, mix, requests, concurrency, seed=0):
+    """Issue ``requests`` requests from ``concurrency`` users
+
+    Returns (elapsed seconds, {op: [latency ms]}, {op: error count}).
+    """
+    ops, weights = list(mix), list(mix.values())
+    latencies = {op: [] for op in ops}
+    errors = {op: 0 for op in ops}
+    remaining = [requests]
+
+    async def user(n):
+        rng = random.Random(seed * 100_003 + n)
+        enrolled = []
+        signups = 0
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            op = rng.choices(ops, weights)[0]
+            if op == "unregister" and not enrolled:
+                op = "signup" if "signup" in mix else "list"
+
+            start = time.perf_counter()
+            if op == "list":
+                response = await http.get(LIST_PATH)
+            elif op == "signup":
+                # A fresh student each time, so signups never conflict
+                email = f"load-{seed}-{n}-{signups}@mergington.edu"
+                signups += 1
+                activity = rng.choice(names)
+                response = await http.post(f"/activities/{activity}/signup", params={"email": email})
+                if response.status_code == 200:
+                    enrolled.append((activity, email))
+            else:
+                activity, email = enrolled.pop(rng.randrange(len(enrolled)))
+                response = await http.delete(f"/activities/{activity}/participants/{email}")
+            latencies[op].append((time.perf_counter() - start) * 1e3)
+            if response.status_code >= 400:
+                errors[op] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(elapsed, latencies, errors):
+    """Turn raw samples into the JSON report's ``results`` section"""
+    everything = sorted(sum(latencies.values(), []))
+    operations = {}
+    for op, samples in latencies.items():
+        samples.sort()
+        operations[op] = {
+            "count": len(samples),
+            "errors": errors[op],
+            "p50_ms": round(statistics.median(samples), 3) if samples else None,
+            "p95_ms": round(percentile(samples, 0.95), 3) if samples else None,
+            "p99_ms": round(percentile(samples, 0.99), 3) if samples else None,
+        }
+    return {
+        "requests": len(everything),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(everything) / elapsed, 1),
+        "p50_ms": round(statistics.median(everything), 3),
+        "p95_ms": round(percentile(everything, 0.95), 3),
+        "p99_ms": round(percentile(everything, 0.99), 3),
+        "errors": sum(errors.values()),
+        "operations": operations,
+    }
+
+
+async def bench_inprocess(catalog, args):
+    from src.app import AppConfig, create_app
+
+    app = create_app(AppConfig(store=ActivityStore(catalog)))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        await run_workload(http, list(catalog), args.mix, args.warmup, args.concurrency, seed=1)
+        return await run_workload(http, list(catalog), args.mix, args.requests, args.concurrency)
+
+
+async def bench_server(catalog, args):
+    with tempfile.TemporaryDirectory() as directory:
+        # Seed through the app's own persistence, then let uvicorn load it.
+        # Each worker process keeps its own store, so several workers need
+        # the shared SQLite backend; a write-ahead log has a single writer
+        if args.workers > 1:
+            database = str(Path(directory) / "activities.db")
+            storage = SQLiteStorage(database)
+            env = {**os.environ, "ACTIVITIES_DB": database}
+            env.pop("ACTIVITIES_DATA_DIR", None)
+        else:
+            storage = WALStorage(directory, durability="async")
+            env = {**os.environ, "ACTIVITIES_DATA_DIR": directory, "ACTIVITIES_DURABILITY": "async"}
+            env.pop("ACTIVITIES_DB", None)
+        store = ActivityStore(catalog, storage=storage)
+        store.compact()
+        store.close()
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT, env=env,
+        )
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                         timeout=60) as http:
+                deadline = time.monotonic() + 120
+                while True:
+                    try:
+                        if (await http.get(LIST_PATH)).status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        if time.monotonic() > deadline:
+                            raise RuntimeError("uvicorn did not start") from None
+                        await asyncio.sleep(0.2)
+                await run_workload(http, list(catalog), args.mix, args.warmup, args.concurrency, seed=1)
+                return await run_workload(http, list(catalog), args.mix, args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "server"), default="inprocess")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--activities", type=int, help="override the scale's activity count")
+    parser.add_argument("--participants", type=int, help="override the scale's participant count")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn workers in server mode (more than 1 share a SQLite database)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    activity_count, participant_count = SCALES[args.scale]
+    activity_count = args.activities or activity_count
+    participant_count = args.participants if args.participants is not None else participant_count
+
+    start = time.perf_counter()
+    catalog = seed_activities(activity_count, participant_count)
+    runner = bench_inprocess if args.mode == "inprocess" else bench_server
+    elapsed, latencies, errors = asyncio.run(runner(catalog, args))
+
+    report = {
+        "benchmark": "load",
+        "mode": args.mode,
+        "config": {
+            "activities": activity_count,
+            "participants": participant_count,
+            "mix": args.mix,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers if args.mode == "server" else None,
+        },
+        "setup_s": round(time.perf_counter() - start - elapsed, 3),
+        "results": summarize(elapsed, latencies, errors),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
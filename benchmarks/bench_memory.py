@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Activity Memory Benchmark
+
+Builds a catalog of 10k activities with 1M enrollments (250k students in
+four activities each) and measures the memory it takes as the original
+nested dicts with lists of email strings, as slotted ``Activity`` records
+with interned participant IDs, and as a full ``ActivityStore`` including
+its reverse index and timetables. Each layout is built in a fresh process.
+"""
+
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_memory.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+ACTIVITIES = 10_000
+STUDENTS = 250_000
+PER_STUDENT = 4
+SIZE = STUDENTS * PER_STUDENT // ACTIVITIES
+
+SCHEDULES = [
+    "Mondays, 3:30 PM - 4:30 PM",
+    "Tuesdays and Thursdays, 3:30 PM - 5:00 PM",
+    "Wednesdays, 4:00 PM - 5:30 PM",
+    "Fridays, 2:00 PM - 4:00 PM",
+]
+
+
+def catalog():
+    """Yield (name, details), building every email string separately as
+    request parsing would"""
+    for i in range(ACTIVITIES):
+        # Consecutive activities overlap so every student lands in PER_STUDENT
+        first = i * STUDENTS // ACTIVITIES
+        participants = [f"student{(first + n) % STUDENTS}@mergington.edu" for n in range(SIZE)]
+        yield f"Activity {i:05d}", {
+            "description": f"Benchmark activity {i}",
+            "schedule": SCHEDULES[i % len(SCHEDULES)],
+            "max_participants": 200,
+            "participants": participants,
+        }
+
+
+def build(layout):
+    from src.store import Activity, ActivityStore
+
+    if layout == "dict":
+        return dict(catalog())
+    if layout == "records":
+        return {name: Activity(details) for name, details in catalog()}
+    store = ActivityStore()
+    for name, details in catalog():
+        store[name] = details
+    return store
+
+
+def measure(layout, results):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = build(layout)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put((layout, current, elapsed, len(data)))
+
+
+def main():
+    enrollments = STUDENTS * PER_STUDENT
+    print(f"{ACTIVITIES} activities, {enrollments} enrollments, {STUDENTS} students\n")
+    print(f"{'layout':>28} {'MiB':>8} {'bytes/enrollment':>17} {'build s':>8}")
+
+    labels = {
+        "dict": "nested dicts + email lists",
+        "records": "Activity records + ID arrays",
+        "store": "ActivityStore with indexes",
+    }
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    baseline = None
+    for layout in labels:
+        process = context.Process(target=measure, args=(layout, results))
+        process.start()
+        _, current, elapsed, _ = results.get()
+        process.join()
+        baseline = baseline or current
+        print(f"{labels[layout]:>28} {current / 2**20:>8.1f} {current / enrollments:>17.1f} {elapsed:>8.2f}"
+              + ("" if current == baseline else f"   ({current / baseline:.0%} of dicts)"))
+
+
+if __name__ == "__main__":
+    main()
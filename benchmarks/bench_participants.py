@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Participant Index Benchmark
+
+Measures per-request latency of signup + unregister as the number of
+participants in a single activity grows, and compares the raw membership
+operations of the indexed participant store against a plain list. Also
+times removing participants from the middle of the set and fails if that
+grows with the set's size.
+"""
+
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_participants.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src.app import AppConfig, create_app  # noqa: E402
+from src.store import ActivityStore, ParticipantSet  # noqa: E402
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+REQUESTS = 200
+ACTIVITY = "Benchmark Activity"
+
+# Largest allowed ratio of removal cost at the biggest size to the cost at
+# 1,000 participants, where sets are already indexed
+MAX_REMOVAL_GROWTH = 5
+
+
+def seed(activities, size):
+    """Replace the catalog with a single activity holding `size` participants"""
+    activities.clear()
+    activities[ACTIVITY] = {
+        "description": "Benchmark",
+        "schedule": "Always",
+        "max_participants": size * 2 + REQUESTS,
+        "participants": [f"student{i}@mergington.edu" for i in range(size)],
+    }
+
+
+def time_requests(client):
+    """Return per-request latencies (µs) for signup/unregister round trips"""
+    samples = []
+    for i in range(REQUESTS):
+        email = f"bench{i}@mergington.edu"
+        start = time.perf_counter()
+        client.post(f"/activities/{ACTIVITY}/signup", params={"email": email})
+        client.delete(f"/activities/{ACTIVITY}/participants/{email}")
+        samples.append((time.perf_counter() - start) * 1e6 / 2)
+    return samples
+
+
+def time_ops(container, add, remove):
+    """Return per-operation latency (µs) of membership check + add + remove"""
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        email = f"bench{i}@mergington.edu"
+        if email not in container:
+            add(email)
+        remove(email)
+    return (time.perf_counter() - start) * 1e6 / REQUESTS
+
+
+def time_removals(container, emails):
+    """Return per-operation latency (µs) of removing existing members, front to back"""
+    victims = random.Random(0).sample(emails, min(REQUESTS, len(emails)))
+    start = time.perf_counter()
+    for email in victims:
+        container.remove(email)
+    return (time.perf_counter() - start) * 1e6 / len(victims)
+
+
+def main():
+    activities = ActivityStore()
+    client = TestClient(create_app(AppConfig(store=activities)))
+
+    print(f"{'participants':>12} {'p50 req µs':>11} {'p95 req µs':>11} {'set op µs':>10} {'list op µs':>11}"
+          f" {'remove µs':>10}")
+    removals = {}
+    for size in SIZES:
+        seed(activities, size)
+        samples = sorted(time_requests(client))
+        p50 = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+
+        emails = [f"student{i}@mergington.edu" for i in range(size)]
+        indexed = ParticipantSet(emails)
+        indexed_op = time_ops(indexed, indexed.add, indexed.remove)
+        plain = list(emails)
+        list_op = time_ops(plain, plain.append, plain.remove)
+
+        removals[size] = time_removals(ParticipantSet(emails), emails)
+
+        print(f"{size:>12} {p50:>11.1f} {p95:>11.1f} {indexed_op:>10.2f} {list_op:>11.2f}"
+              f" {removals[size]:>10.2f}")
+
+    growth = removals[SIZES[-1]] / removals[1_000]
+    print(f"\nremoval cost at {SIZES[-1]:,} vs 1,000 participants: {growth:.1f}x")
+    if growth > MAX_REMOVAL_GROWTH:
+        sys.exit(f"removal scales with set size ({growth:.1f}x > {MAX_REMOVAL_GROWTH}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Activity Search Benchmark
+
+Builds a district-sized catalog (100k activities by default) whose names,
+descriptions and schedules draw on a skewed vocabulary, then times
+``ActivityStore.search()`` for a mix of exact, prefix and multi-word
+queries against a linear substring scan of the catalog. Also times
+incremental index updates.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_search.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.listing import projector  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+SUBJECTS = [
+    "chess", "math", "robotics", "drama", "soccer", "basketball", "debate", "art", "photography",
+    "coding", "choir", "orchestra", "chemistry", "astronomy", "poetry", "film", "gardening", "cooking",
+    "volleyball", "tennis", "swimming", "journalism", "history", "language", "spanish", "french",
+    "design", "dance", "yoga", "climbing", "biology", "economics", "philosophy", "sculpture",
+]
+KINDS = ["Club", "Team", "Workshop", "Class", "Society", "League", "Studio", "Lab"]
+LEVELS = ["Junior", "Senior", "Advanced", "Beginner", "Varsity", "Intermediate", "Open"]
+SCHEDULES = [
+    "Mondays, 3:30 PM - 4:30 PM",
+    "Tuesdays and Thursdays, 3:30 PM - 5:00 PM",
+    "Wednesdays, 4:00 PM - 5:30 PM",
+    "Fridays, 2:00 PM - 4:00 PM",
+    "Saturdays, 10:00 AM - 12:00 PM",
+]
+
+QUERIES = ["chess", "math", "robot", "club", "tuesday", "chess club", "advanced photo",
+           "a", "senior debate team", "gardening saturdays", "nothingmatches"]
+
+
+def vocabulary(rng, size):
+    """Made-up words, so descriptions have a realistic number of terms"""
+    syllables = ["ka", "lo", "mi", "ra", "te", "su", "vin", "dor", "pel", "qua", "zen", "bri", "tor"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def catalog(count, seed=0):
+    rng = random.Random(seed)
+    words = vocabulary(rng, 20_000)
+    # Zipf-like skew: a few words are everywhere, most are rare
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    activities = {}
+    for i in range(count):
+        subject = rng.choice(SUBJECTS)
+        name = f"{rng.choice(LEVELS)} {subject.title()} {rng.choice(KINDS)} {i}"
+        filler = rng.choices(words, weights, k=12)
+        activities[name] = {
+            "description": f"Learn {subject} with friends: " + " ".join(filler),
+            "schedule": rng.choice(SCHEDULES),
+            "max_participants": 20,
+            "participants": [],
+        }
+    return activities
+
+
+def timed(function, *args, repeat=200):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        samples.append((time.perf_counter() - start) * 1e3)
+    samples.sort()
+    return result, statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def linear_search(store, text):
+    # The per-request alternative: substring match over every activity
+    words = text.lower().split()
+    hits = []
+    for name in store:
+        record = store[name]
+        haystack = f"{name} {record['description']} {record['schedule']}".lower()
+        if all(word in haystack for word in words):
+            hits.append(name)
+    return hits[:20]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--activities", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    data = catalog(args.activities)
+    start = time.perf_counter()
+    store = ActivityStore(data)
+    print(f"{args.activities} activities, store with index built in {time.perf_counter() - start:.1f}s\n")
+
+    project = projector(("description",), "count")
+    print(f"{'query':>22} {'hits':>5} {'index p50':>10} {'index p99':>10} {'scan p50':>9}   (ms)")
+    for query in QUERIES:
+        results, p50, p99 = timed(store.search, query, project, 20)
+        _, scan_p50, _ = timed(linear_search, store, query, repeat=3)
+        print(f"{query!r:>22} {len(results):>5} {p50:>10.3f} {p99:>10.3f} {scan_p50:>9.1f}")
+
+    # Incremental maintenance: replace and delete activities
+    names = list(data)[:1_000]
+    start = time.perf_counter()
+    for name in names:
+        store[name] = {**data[name], "description": data[name]["description"] + " updated"}
+    updates = (time.perf_counter() - start) / len(names) * 1e3
+    start = time.perf_counter()
+    for name in names:
+        del store[name]
+    deletes = (time.perf_counter() - start) / len(names) * 1e3
+    print(f"\nreplace {updates:.3f} ms, delete {deletes:.3f} ms per activity (including the rest of the store)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+
+Measures how long a fresh interpreter takes to import ``src.app``, and how
+long a uvicorn worker takes from launch to answering its first request
+when it loads a large catalog from the write-ahead log's snapshot: once
+with the search index and reports built before serving
+(``ACTIVITIES_BACKGROUND_INDEXES=0``) and once with them built in the
+background. Also reports when search starts
+answering.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Allow running as `python benchmarks/bench_startup.py` from anywhere
+sys.path.insert(0, str(ROOT))
+
+from src.storage import WALStorage  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+IMPORT = "import time; start = time.perf_counter(); import src.app; print(time.perf_counter() - start)"
+
+
+def catalog(count):
+    return {
+        f"Activity {i:06d}": {
+            "description": f"Learn skill number {i} with classmates and compete in friendly events",
+            "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
+            "max_participants": 30,
+            "participants": [f"student{i * 7 + n}@mergington.edu" for n in range(i % 20)],
+        }
+        for i in range(count)
+    }
+
+
+def import_time(repeat):
+    """Median seconds to import src.app in a fresh interpreter"""
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", IMPORT], cwd=ROOT, capture_output=True, text=True,
+                                check=True)
+        samples.append(float(result.stdout))
+    return statistics.median(samples)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(http, path, deadline):
+    """Poll ``path`` until it answers 200; returns the time it did"""
+    while True:
+        try:
+            if http.get(path).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"{path} did not answer in time")
+        time.sleep(0.01)
+
+
+def time_to_first_request(directory, background):
+    """Seconds from launching uvicorn to the first listing and the first search"""
+    port = free_port()
+    env = {**os.environ, "ACTIVITIES_DATA_DIR": directory, "ACTIVITIES_BACKGROUND_INDEXES": str(int(background))}
+    env.pop("ACTIVITIES_DB", None)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as http:
+            deadline = start + 600
+            listed = wait_for(http, "/activities?limit=1", deadline)
+            searched = wait_for(http, "/activities/search?q=skill", deadline)
+        return listed - start, searched - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--activities", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5, help="imports to time")
+    args = parser.parse_args(argv)
+
+    print(f"import src.app: {import_time(args.repeat) * 1e3:.0f} ms\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Seed through the app's own persistence, as a snapshot with no log
+        store = ActivityStore(catalog(args.activities), storage=WALStorage(directory, durability="async"))
+        store.compact()
+        store.close()
+
+        print(f"{args.activities} activities loaded from a snapshot (s from launch)")
+        print(f"{'search index':>14} {'first request':>14} {'first search':>13}")
+        for background in (False, True):
+            listed, searched = time_to_first_request(directory, background)
+            label = "background" if background else "at startup"
+            print(f"{label:>14} {listed:>14.2f} {searched:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
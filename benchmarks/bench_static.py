@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Static Asset and Compression Benchmark
+
+Compares what a page load costs with the old ``StaticFiles`` mount and with
+the fingerprinted, precompressed ``StaticAssets``: bytes for a first visit,
+and requests and bytes for a revisit (plain files are revalidated one by
+one; fingerprinted ones come from the browser cache). Then times and sizes
+the ``/activities`` catalog for a large catalog sent as is, gzipped per
+request, and gzipped once per version.
+"""
+
+import argparse
+import asyncio
+import gzip
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_static.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.staticfiles import StaticFiles  # noqa: E402
+
+import src.app as app_module  # noqa: E402
+from src.assets import StaticAssets  # noqa: E402
+from src.compression import CompressedBodies  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+STATIC = Path(app_module.__file__).parent / "static"
+BROWSER = "gzip, deflate, br"
+
+
+async def call(app, path, headers=(), root_path=""):
+    """Send one GET straight to an ASGI app; returns (status, headers, body)"""
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": root_path + path, "raw_path": (root_path + path).encode(),
+             "root_path": root_path, "query_string": b"",
+             "headers": [(b"host", b"bench"), *((k.encode(), v.encode()) for k, v in headers)],
+             "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+    response = {"body": b""}
+    received = False
+
+    async def receive():
+        # The request body once, then nothing until the response is sent
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+
+async def page_load(app, revisit_cache=None):
+    """Fetch index.html and what it links to like a browser; returns (requests, bytes, cache)"""
+    cache = {} if revisit_cache is None else revisit_cache
+    requests = sent = 0
+
+    async def fetch(path):
+        nonlocal requests, sent
+        cached = cache.get(path)
+        if cached is not None and "immutable" in cached[0].get("cache-control", ""):
+            return cached[1]
+        headers = [("accept-encoding", BROWSER)]
+        if cached is not None:
+            validator = cached[0].get("etag")
+            headers.append(("if-none-match", validator))
+        status, response_headers, body = await call(app, path, headers, root_path="/static")
+        requests += 1
+        sent += len(body)
+        if status == 304:
+            return cached[1]
+        cache[path] = (response_headers, body)
+        return body
+
+    page = await fetch("/index.html")
+    if page[:2] == b"\x1f\x8b":
+        page = gzip.decompress(page)
+    for link in re.findall(rb'(?:src|href)="([^"]+)"', page):
+        await fetch("/" + link.decode())
+    return requests, sent, cache
+
+
+def catalog(count):
+    return {
+        f"Activity {i:05d}": {
+            "description": f"Learn skill number {i} with classmates and compete in friendly events",
+            "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
+            "max_participants": 30,
+            "participants": [f"student{i * 7 + n}@mergington.edu" for n in range(i % 20)],
+        }
+        for i in range(count)
+    }
+
+
+async def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await function()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return result, statistics.median(samples)
+
+
+async def compare_snapshot(snapshot, repeat):
+    async def identity():
+        return snapshot.body
+
+    once = CompressedBodies()
+    for label, function in (
+        ("identity", identity),
+        ("gzip per request", lambda: CompressedBodies().gzip(snapshot.etag, snapshot.body)),
+        ("gzip per version", lambda: once.gzip(snapshot.etag, snapshot.body)),
+    ):
+        body, p50 = await timed(function, repeat)
+        print(f"{label:>22} {len(body):>10} {p50:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--activities", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'page load':>22} {'requests':>8} {'bytes':>8}")
+    for label, app in (("StaticFiles", StaticFiles(directory=STATIC)), ("StaticAssets", StaticAssets(STATIC))):
+        requests, sent, cache = asyncio.run(page_load(app))
+        print(f"{label + ' first':>22} {requests:>8} {sent:>8}")
+        requests, sent, _ = asyncio.run(page_load(app, cache))
+        print(f"{label + ' revisit':>22} {requests:>8} {sent:>8}")
+
+    store = ActivityStore(catalog(args.activities))
+    snapshot = store.snapshot()
+    print(f"\n/activities with {args.activities} activities: {len(snapshot.body) / 1e6:.1f} MB uncompressed")
+    print(f"{'mode':>22} {'bytes':>10} {'p50 ms':>8}")
+    asyncio.run(compare_snapshot(snapshot, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Storage Durability Benchmark
+
+Measures signup throughput and latency for each write-ahead log durability
+mode (fsync per write, group commit, async) against the in-memory store,
+then times startup to show replay cost follows the log tail, not history.
+"""
+
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Allow running as `python benchmarks/bench_storage.py` from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.storage import MemoryStorage, WALStorage  # noqa: E402
+from src.store import ActivityStore  # noqa: E402
+
+THREADS = 16
+SIGNUPS_PER_THREAD = 250
+ACTIVITIES = 20
+
+
+def seed(capacity=THREADS * SIGNUPS_PER_THREAD):
+    return {
+        f"Activity {i}": {
+            "description": "Benchmark",
+            "schedule": "Always",
+            "max_participants": capacity,
+            "participants": [],
+        }
+        for i in range(ACTIVITIES)
+    }
+
+
+def run_signups(store):
+    """Run concurrent signups, returning (ops/sec, latencies in ms)"""
+    latencies = [[] for _ in range(THREADS)]
+
+    def worker(n):
+        for i in range(SIGNUPS_PER_THREAD):
+            start = time.perf_counter()
+            store.enroll(f"Activity {i % ACTIVITIES}", f"t{n}-s{i}@mergington.edu")
+            latencies[n].append((time.perf_counter() - start) * 1e3)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return THREADS * SIGNUPS_PER_THREAD / elapsed, sorted(sum(latencies, []))
+
+
+def time_startup(directory):
+    start = time.perf_counter()
+    store = ActivityStore(None, storage=WALStorage(directory))
+    elapsed = (time.perf_counter() - start) * 1e3
+    store.close()
+    return elapsed
+
+
+def main():
+    print(f"{THREADS} threads x {SIGNUPS_PER_THREAD} signups across {ACTIVITIES} activities\n")
+    print(f"{'mode':>8} {'ops/sec':>10} {'p50 ms':>8} {'p99 ms':>8}")
+
+    modes = [("memory", None), ("always", "always"), ("group", "group"), ("async", "async")]
+    for label, durability in modes:
+        with tempfile.TemporaryDirectory() as directory:
+            storage = MemoryStorage() if durability is None else WALStorage(
+                directory, durability=durability, snapshot_every=10**9)
+            store = ActivityStore(seed(), storage=storage)
+            throughput, latencies = run_signups(store)
+            store.close()
+        p50 = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{label:>8} {throughput:>10.0f} {p50:>8.3f} {p99:>8.3f}")
+
+    print(f"\n{'history':>8} {'tail':>8} {'startup ms':>11}")
+    for history in (10_000, 100_000):
+        for tail in (100, 10_000):
+            with tempfile.TemporaryDirectory() as directory:
+                store = ActivityStore(seed(history), storage=WALStorage(directory, durability="async",
+                                                                 snapshot_every=10**9))
+                for i in range(history):
+                    store.enroll(f"Activity {i % ACTIVITIES}", f"h{i}@mergington.edu")
+                store.compact()
+                for i in range(tail):
+                    store.withdraw(f"Activity {i % ACTIVITIES}", f"h{i}@mergington.edu")
+                store.close()
+                print(f"{history:>8} {tail:>8} {time_startup(directory):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Multi-Worker Throughput Benchmark
+
+Starts the real app under uvicorn with 1 and N worker processes sharing a
+SQLite database (ACTIVITIES_DB) and measures request throughput for a
+read-heavy and a signup-heavy mix, with the single-process in-memory store
+as the baseline. Load comes from several client processes so the client
+is not the bottleneck.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+WORKERS = max(2, os.cpu_count() or 1)
+CLIENT_PROCESSES = 4
+CONNECTIONS_PER_CLIENT = 8
+DURATION = 5.0
+
+# Share of requests that are writes (a signup or unregister)
+MIXES = {"read-heavy": 0.05, "signup-heavy": 0.8}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, database):
+    port = free_port()
+    # Each connection toggles one student in and out as fast as it can, far
+    # beyond the per-email signup rate limit
+    env = {**os.environ, "ACTIVITIES_EMAIL_RATE": "0"}
+    env.pop("ACTIVITIES_DATA_DIR", None)
+    if database:
+        env["ACTIVITIES_DB"] = database
+    else:
+        env.pop("ACTIVITIES_DB", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/activities").status_code == 200:
+                # Give the remaining workers a moment to come up
+                time.sleep(1)
+                return server, url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def client(url, write_share, client_id, names, results):
+    async def connection(n, http):
+        # Each connection is one student toggling in and out of one activity
+        email = f"bench-{client_id}-{n}@mergington.edu"
+        activity = names[(client_id * CONNECTIONS_PER_CLIENT + n) % len(names)]
+        enrolled = False
+        done = 0
+        deadline = time.monotonic() + DURATION
+        while time.monotonic() < deadline:
+            if random.random() < write_share:
+                if enrolled:
+                    await http.delete(f"/activities/{activity}/participants/{email}")
+                else:
+                    await http.post(f"/activities/{activity}/signup", params={"email": email})
+                enrolled = not enrolled
+            else:
+                await http.get("/activities")
+            done += 1
+        return done
+
+    limits = httpx.Limits(max_connections=CONNECTIONS_PER_CLIENT)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as http:
+        counts = await asyncio.gather(*(connection(n, http) for n in range(CONNECTIONS_PER_CLIENT)))
+    results.put(sum(counts))
+
+
+def run_client(url, write_share, client_id, names, results):
+    asyncio.run(client(url, write_share, client_id, names, results))
+
+
+def measure(url, write_share):
+    """Return requests per second across all client processes"""
+    names = list(httpx.get(f"{url}/activities").json())
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=run_client, args=(url, write_share, n, names, results))
+               for n in range(CLIENT_PROCESSES)]
+    for process in clients:
+        process.start()
+    total = sum(results.get() for _ in clients)
+    for process in clients:
+        process.join()
+    return total / DURATION
+
+
+def main():
+    print(f"{CLIENT_PROCESSES} client processes x {CONNECTIONS_PER_CLIENT} connections, "
+          f"{DURATION:.0f}s per run, {os.cpu_count()} CPUs\n")
+    print(f"{'setup':>18} " + " ".join(f"{mix:>13}" for mix in MIXES) + "   (requests/sec)")
+
+    setups = [("1 worker, memory", 1, False), ("1 worker, sqlite", 1, True),
+              (f"{WORKERS} workers, sqlite", WORKERS, True)]
+    for label, workers, shared in setups:
+        row = []
+        for write_share in MIXES.values():
+            with tempfile.TemporaryDirectory() as directory:
+                database = str(Path(directory) / "activities.db") if shared else None
+                server, url = start_server(workers, database)
+                try:
+                    row.append(measure(url, write_share))
+                finally:
+                    server.terminate()
+                    server.wait()
+        print(f"{label:>18} " + " ".join(f"{rps:>13.0f}" for rps in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Performance Regression Gate
+
+Runs the load benchmark (benchmarks/bench_load.py) for each configured mode
+and fails when throughput, latency or error counts cross the limits in
+benchmarks/thresholds.json, or regress too far against a saved baseline.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BENCHMARK = PROJECT_ROOT / "benchmarks" / "bench_load.py"
+THRESHOLDS = PROJECT_ROOT / "benchmarks" / "thresholds.json"
+
+
+def run_benchmark(mode, args):
+    """Run the load benchmark for one mode and return its JSON report"""
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / "report.json"
+        result = subprocess.run(
+            [sys.executable, str(BENCHMARK), "--mode", mode, "--output", str(output), *args],
+            capture_output=True,
+            text=True,
+            cwd=PROJECT_ROOT
+        )
+        if result.returncode != 0:
+            print(f"❌ Benchmark failed in {mode} mode!")
+            print("STDOUT:", result.stdout)
+            print("STDERR:", result.stderr)
+            return None
+        return json.loads(output.read_text(encoding="utf-8"))
+
+
+def check_limits(results, limits):
+    """Return a list of failure messages for results outside the limits"""
+    failures = []
+    if results["errors"] > limits.get("max_errors", 0):
+        failures.append(f"{results['errors']} failed requests (max {limits.get('max_errors', 0)})")
+    if "min_throughput_rps" in limits and results["throughput_rps"] < limits["min_throughput_rps"]:
+        failures.append(f"throughput {results['throughput_rps']} rps < {limits['min_throughput_rps']} rps")
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        limit = limits.get(f"max_{key}")
+        if limit is not None and results[key] > limit:
+            failures.append(f"{key[:3]} {results[key]} ms > {limit} ms")
+    return failures
+
+
+def check_baseline(results, baseline, tolerance):
+    """Return failure messages for regressions beyond ``tolerance`` vs a baseline"""
+    failures = []
+    if results["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        failures.append(f"throughput {results['throughput_rps']} rps is more than {tolerance:.0%} "
+                        f"below the baseline {baseline['throughput_rps']} rps")
+    if results["p99_ms"] > baseline["p99_ms"] * (1 + tolerance):
+        failures.append(f"p99 {results['p99_ms']} ms is more than {tolerance:.0%} "
+                        f"above the baseline {baseline['p99_ms']} ms")
+    return failures
+
+
+def main():
+    """Run every configured mode and exit non-zero on any regression"""
+    parser = argparse.ArgumentParser(description="Fail when the API's performance regresses")
+    parser.add_argument("--modes", nargs="+", choices=("inprocess", "server"), default=["inprocess"])
+    parser.add_argument("--thresholds", default=str(THRESHOLDS))
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="where to write the combined JSON reports")
+    parser.add_argument("--baseline", help="a previous --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression against the baseline (default 0.25)")
+    args = parser.parse_args()
+
+    thresholds = json.loads(Path(args.thresholds).read_text(encoding="utf-8"))
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else {}
+
+    reports, failed = {}, False
+    for mode in args.modes:
+        limits = thresholds[mode]
+        print(f"⏱️  Running load benchmark ({mode})...")
+        report = run_benchmark(mode, limits.get("args", []))
+        if report is None:
+            sys.exit(1)
+        reports[mode] = report
+
+        results = report["results"]
+        print(f"📊 {results['throughput_rps']} rps, p50 {results['p50_ms']} ms, "
+              f"p95 {results['p95_ms']} ms, p99 {results['p99_ms']} ms, {results['errors']} errors")
+
+        failures = check_limits(results, limits)
+        if mode in baseline:
+            failures += check_baseline(results, baseline[mode]["results"], args.tolerance)
+        for failure in failures:
+            print(f"❌ {mode}: {failure}")
+        if not failures:
+            print(f"✅ {mode}: within thresholds")
+        failed = failed or bool(failures)
+
+    Path(args.output).write_text(json.dumps(reports, indent=2) + "\n", encoding="utf-8")
+    print(f"📝 Wrote {args.output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,34 @@
 """
 Automated Coverage Badge Updater
 
-This script runs the test suite, extracts coverage percentage,
-and automatically updates the coverage badge in README.md
+This script runs the test suite in parallel processes, reads the combined
+coverage percentage from coverage's JSON report, and updates the coverage
+badge in README.md. When none of the inputs (Python files under src/ and
+tests/, the static assets, the benchmark thresholds and the test config)
+have changed since the last run, the tests are skipped and the cached
+percentage is used. Under GitHub Actions the percentage and badge color
+are also written as step outputs.
 """
 
+import argparse
+import hashlib
+import json
 import subprocess
 import re
 import sys
 import os
+import tempfile
 from pathlib import Path
 
+# Last run's input hash and coverage, so unchanged trees skip the tests
+CACHE_FILE = ".coverage_badge_cache.json"
+
+# Files outside src/ and tests/ that affect the result
+CACHE_INPUTS = ("pytest.ini", ".coveragerc", "requirements.txt", "benchmarks/thresholds.json")
+
+# Directories whose every file is an input, not just the Python ones
+CACHE_INPUT_DIRS = ("src/static",)
+
 
 def get_coverage_color(percentage):
     """Determine badge color based on coverage percentage"""
@@ -38,43 +56,131 @@ def get_python_command():
         raise RuntimeError("No suitable Python command found (tried python3, python)")
 
 
-def run_tests_with_coverage():
-    """Run pytest with coverage and capture the output"""
+def source_hash(project_root):
+    """Hash every file that can change the coverage result"""
+    digest = hashlib.sha256()
+    files = [project_root / name for name in CACHE_INPUTS]
+    for directory in ("src", "tests"):
+        files.extend((project_root / directory).rglob("*.py"))
+    for directory in CACHE_INPUT_DIRS:
+        files.extend((project_root / directory).rglob("*"))
+    for path in sorted(files):
+        if path.is_file():
+            digest.update(str(path.relative_to(project_root)).encode())
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def read_cache(project_root):
+    """The cached {"hash", "coverage"} from the last run, or {}"""
+    try:
+        return json.loads((project_root / CACHE_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache(project_root, digest, coverage):
+    (project_root / CACHE_FILE).write_text(
+        json.dumps({"hash": digest, "coverage": coverage}), encoding="utf-8"
+    )
+
+
+def split_tests(test_files, jobs):
+    """Split test files into at most ``jobs`` shards of similar size
+
+    Biggest files first, each to the currently smallest shard; file size
+    stands in for run time.
+    """
+    shards = [[] for _ in range(max(1, min(jobs, len(test_files))))]
+    sizes = [0] * len(shards)
+    for path in sorted(test_files, key=lambda path: path.stat().st_size, reverse=True):
+        smallest = sizes.index(min(sizes))
+        shards[smallest].append(path)
+        sizes[smallest] += path.stat().st_size
+    return shards
+
+
+def run_tests_with_coverage(jobs=None):
+    """Run the test suite with coverage across processes and return the total percentage
+
+    Each shard of test files runs in its own pytest process and writes its
+    own coverage data file; the files are then combined and the total is
+    read from coverage's JSON report.
+    """
     try:
         # Get the project root directory (parent of scripts directory)
         project_root = Path(__file__).parent.parent
-        
+
         # Determine the Python command to use
         python_cmd = get_python_command()
-        
-        # Run pytest with coverage from project root
-        result = subprocess.run(
-            [python_cmd, "-m", "pytest", "tests/", "--cov=src", "--cov-report=term"],
-            capture_output=True,
-            text=True,
-            cwd=project_root
-        )
-        
-        if result.returncode != 0:
-            print("❌ Tests failed!")
-            print("STDOUT:", result.stdout)
-            print("STDERR:", result.stderr)
-            return None
-            
-        # Extract coverage percentage from output
-        coverage_match = re.search(r'TOTAL\s+\d+\s+\d+\s+(\d+)%', result.stdout)
-        if coverage_match:
-            return int(coverage_match.group(1))
-        else:
-            print("❌ Could not extract coverage percentage from output")
-            print("Output:", result.stdout)
-            return None
-            
+
+        test_files = sorted((project_root / "tests").glob("test_*.py"))
+        shards = split_tests(test_files, jobs or os.cpu_count() or 1)
+        print(f"🧵 {len(test_files)} test files across {len(shards)} processes")
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            # Start one pytest per shard, each with its own coverage data file
+            processes = []
+            for index, shard in enumerate(shards):
+                data_file = Path(data_dir) / f".coverage.{index}"
+                command = [python_cmd, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+                           "--cov=src", "--cov-report=", *(str(path.relative_to(project_root)) for path in shard)]
+                output = tempfile.TemporaryFile(mode="w+", dir=data_dir)
+                process = subprocess.Popen(
+                    command,
+                    stdout=output,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    cwd=project_root,
+                    env={**os.environ, "COVERAGE_FILE": str(data_file)},
+                )
+                processes.append((process, output, data_file))
+
+            failed = False
+            for process, output, _ in processes:
+                process.wait()
+                output.seek(0)
+                if process.returncode != 0:
+                    failed = True
+                    print("❌ Tests failed!")
+                    print(output.read())
+                output.close()
+            if failed:
+                return None
+
+            # Merge the shards' data files and read the total from the JSON report
+            combined = Path(data_dir) / ".coverage"
+            report = Path(data_dir) / "coverage.json"
+            for command in (
+                [python_cmd, "-m", "coverage", "combine", "-q", f"--data-file={combined}",
+                 *(str(data_file) for _, _, data_file in processes)],
+                [python_cmd, "-m", "coverage", "json", "-q", f"--data-file={combined}", "-o", str(report)],
+            ):
+                result = subprocess.run(command, capture_output=True, text=True, cwd=project_root)
+                if result.returncode != 0:
+                    print(f"❌ {' '.join(command[2:4])} failed:")
+                    print(result.stdout, result.stderr)
+                    return None
+
+            totals = json.loads(report.read_text(encoding="utf-8"))["totals"]
+            return int(totals["percent_covered_display"])
+
     except Exception as e:
         print(f"❌ Error running tests: {e}")
         return None
 
 
+def write_github_output(coverage_percentage):
+    """Expose the percentage and badge color as step outputs when run in GitHub Actions"""
+    output_path = os.environ.get("GITHUB_OUTPUT")
+    if not output_path:
+        return
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write(f"percentage={coverage_percentage}\n")
+        f.write(f"color={get_coverage_color(coverage_percentage)}\n")
+
+
 def update_readme_badge(coverage_percentage):
     """Update the coverage badge in README.md"""
     # Get the project root directory (parent of scripts directory)
@@ -101,6 +207,9 @@ def update_readme_badge(coverage_percentage):
         
         if re.search(badge_pattern, content):
             updated_content = re.sub(badge_pattern, new_badge, content)
+            if updated_content == content:
+                print(f"✅ README badge already shows {coverage_percentage}% ({color})")
+                return True
             
             # Write updated content back to file
             with open(readme_path, 'w', encoding='utf-8') as f:
@@ -117,15 +226,30 @@ def update_readme_badge(coverage_percentage):
         return False
 
 
-def main():
+def main(argv=None):
     """Main function to run tests and update badge"""
-    print("🧪 Running tests with coverage...")
-    
-    coverage = run_tests_with_coverage()
-    if coverage is None:
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Run the tests with coverage and update the README badge")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="test processes to run (default: one per CPU)")
+    parser.add_argument("--force", action="store_true",
+                        help="run the tests even if their inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    project_root = Path(__file__).parent.parent
+    digest = source_hash(project_root)
+    cache = read_cache(project_root)
+    if not args.force and cache.get("hash") == digest and isinstance(cache.get("coverage"), int):
+        coverage = cache["coverage"]
+        print("⏭️  Inputs unchanged since the last run, skipping tests")
+    else:
+        print("🧪 Running tests with coverage...")
+        coverage = run_tests_with_coverage(args.jobs)
+        if coverage is None:
+            sys.exit(1)
+        write_cache(project_root, digest, coverage)
     
     print(f"📊 Coverage: {coverage}%")
+    write_github_output(coverage)
     
     print("📝 Updating README badge...")
     if update_readme_badge(coverage):
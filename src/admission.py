@@ -0,0 +1,190 @@
+"""
+Admission control for signup bursts
+
+When signups open, many students (and their retrying browsers) hit the
+signup route at once. ``SignupAdmission`` sheds that load before it reaches
+the store:
+
+    rate limits   token buckets per client address and per email; a client
+                  or student over its rate gets 429 Too Many Requests
+    concurrency   at most ``max_concurrent`` signups run at a time, up to
+                  ``queue_size`` more wait in arrival order for at most
+                  ``queue_timeout`` seconds, and anything beyond that gets
+                  503 Service Unavailable straight away
+
+Both rejections carry a ``Retry-After`` header. Admitted requests therefore
+see a short queue instead of sharing the slowdown of an overloaded server.
+Buckets live in a bounded LRU table, so memory stays flat however many
+clients and emails show up; an evicted bucket simply starts full again.
+
+Limits come from the environment (a rate of 0 or a concurrency of 0
+disables that check):
+
+    ACTIVITIES_CLIENT_RATE / _BURST   per-client signups per second / burst
+    ACTIVITIES_EMAIL_RATE / _BURST    per-email signups per second / burst
+    ACTIVITIES_SIGNUP_CONCURRENCY     signups handled at once
+    ACTIVITIES_SIGNUP_QUEUE           signups allowed to wait for a slot
+    ACTIVITIES_SIGNUP_QUEUE_TIMEOUT   seconds a signup may wait
+"""
+
+import asyncio
+import contextlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+# Defaults: clients are off because a whole school may share one address
+CLIENT_RATE, CLIENT_BURST = 0.0, 50
+EMAIL_RATE, EMAIL_BURST = 1.0, 10
+SIGNUP_CONCURRENCY = 64
+SIGNUP_QUEUE = 256
+SIGNUP_QUEUE_TIMEOUT = 2.0
+
+# Token buckets kept per limiter before the least recently used is evicted
+MAX_BUCKETS = 100_000
+
+
+class Rejected(Exception):
+    """A request turned away by admission control, carrying an HTTP status"""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class RateLimiter:
+    """Token buckets of ``burst`` tokens refilled at ``rate`` per second, by key"""
+
+    def __init__(self, rate, burst, max_keys=MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time of the last update), oldest first
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, key, now=None):
+        """Take a token for ``key``; return 0 or the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+class ConcurrencyLimit:
+    """At most ``limit`` holders at a time plus a bounded FIFO queue
+
+    Lives on one event loop. A released slot is handed straight to the
+    oldest waiter, so queued requests are admitted in arrival order.
+    """
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the enclosed block, or raise ``Rejected`` (503)"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+        else:
+            await self._wait()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(self):
+        if len(self._waiters) >= self.queue_size:
+            raise Rejected(503, "Too many signups in progress, please retry shortly", self.timeout)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(503, "Too many signups in progress, please retry shortly", self.timeout) from None
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            with contextlib.suppress(ValueError):
+                self._waiters.remove(future)
+
+    def _release(self):
+        # Hand the slot to the oldest waiter still waiting, if any
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class SignupAdmission:
+    """Per-client and per-email rate limits plus the signup concurrency limit"""
+
+    def __init__(self, client_rate=None, client_burst=None, email_rate=None, email_burst=None,
+                 max_concurrent=None, queue_size=None, queue_timeout=None, max_keys=MAX_BUCKETS):
+        env = os.environ.get
+        client_rate = client_rate if client_rate is not None else float(env("ACTIVITIES_CLIENT_RATE", CLIENT_RATE))
+        client_burst = client_burst if client_burst is not None else float(env("ACTIVITIES_CLIENT_BURST", CLIENT_BURST))
+        email_rate = email_rate if email_rate is not None else float(env("ACTIVITIES_EMAIL_RATE", EMAIL_RATE))
+        email_burst = email_burst if email_burst is not None else float(env("ACTIVITIES_EMAIL_BURST", EMAIL_BURST))
+        if max_concurrent is None:
+            max_concurrent = int(env("ACTIVITIES_SIGNUP_CONCURRENCY", SIGNUP_CONCURRENCY))
+        if queue_size is None:
+            queue_size = int(env("ACTIVITIES_SIGNUP_QUEUE", SIGNUP_QUEUE))
+        if queue_timeout is None:
+            queue_timeout = float(env("ACTIVITIES_SIGNUP_QUEUE_TIMEOUT", SIGNUP_QUEUE_TIMEOUT))
+
+        self.clients = RateLimiter(client_rate, client_burst, max_keys) if client_rate > 0 else None
+        self.emails = RateLimiter(email_rate, email_burst, max_keys) if email_rate > 0 else None
+        self.concurrency = ConcurrencyLimit(max_concurrent, queue_size, queue_timeout) if max_concurrent > 0 else None
+
+    @contextlib.asynccontextmanager
+    async def admit(self, client, email):
+        """Admit one signup for the enclosed block, or raise ``Rejected``"""
+        now = time.monotonic()
+        if self.clients is not None and client is not None:
+            wait = self.clients.acquire(client, now)
+            if wait:
+                raise Rejected(429, "Too many signup attempts from this client", wait)
+        if self.emails is not None:
+            wait = self.emails.acquire(email.lower(), now)
+            if wait:
+                raise Rejected(429, "Too many signup attempts for this email", wait)
+
+        if self.concurrency is None:
+            yield
+            return
+        async with self.concurrency.slot():
+            yield
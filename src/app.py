@@ -3,24 +3,39 @@ High School Management System API
 
 A super simple FastAPI application that allows students to view and sign up
 for extracurricular activities at Mergington High School.
+
+``create_app()`` builds the app; its catalog is loaded (or seeded) and its
+static files are read when the app starts up, not when this module is
+imported.
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
 import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from pathlib import Path
 
-app = FastAPI(title="Mergington High School API",
-              description="API for viewing and signing up for extracurricular activities")
+from src.admission import Rejected, SignupAdmission
+from src.assets import StaticAssets
+from src.bulk import BulkRequestError, InvalidOperation, parse_operation, read_operations
+from src.compression import CompressedBodies, GZipMiddleware, etag_matches, negotiate
+from src.events import EventHub, event_stream
+from src.idempotency import IdempotencyCache, IdempotencyMiddleware
+from src.schedule import describe_interval
+from src.serialization import ORJSONResponse
+from src.metrics import PROMETHEUS_CONTENT_TYPE, Metrics, MetricsMiddleware, TimedRoute, serialization
+from src.listing import (MAX_PAGE_SIZE, ListingError, decode_cursor, encode_cursor,
+                         parse_day_filter, parse_fields, projector)
+from src.storage import open_storage
+from src.store import ActivityStore, StoreError, encode_payload
 
-# Mount the static files directory
-current_dir = Path(__file__).parent
-app.mount("/static", StaticFiles(directory=os.path.join(Path(__file__).parent,
-          "static")), name="static")
 
-# In-memory activity database
-activities = {
+# Seed catalog, used when the storage backend holds no state yet
+SEED_ACTIVITIES = {
     "Chess Club": {
         "description": "Learn strategies and compete in chess tournaments",
         "schedule": "Fridays, 3:30 PM - 5:00 PM",
@@ -78,50 +93,460 @@ activities = {
         }
 }
 
+# Success messages per store outcome, shared by single and bulk endpoints
+MESSAGES = {
+    "enrolled": "Signed up {email} for {activity}",
+    "waitlisted": "Added {email} to the waitlist for {activity}",
+    "unregistered": "Unregistered {email} from {activity}",
+    "unwaitlisted": "Unregistered {email} from {activity}",
+}
+
+
+# Every route; create_app() serves them with per-app state
+router = APIRouter(route_class=TimedRoute)
+
+
+async def store_error_handler(request: Request, exc: StoreError):
+    """Translate store validation failures into the usual {"detail": ...} errors"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail},
+                        headers=getattr(exc, "headers", None))
+
+
+async def rejected_handler(request: Request, exc: Rejected):
+    """Answer requests turned away by admission control, with Retry-After"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+
 
-@app.get("/")
-def root():
+async def get_store(request: Request):
+    """The activity store the routes work on
+
+    The app's own store, loaded at startup. Routes take it as a dependency,
+    so tests can serve a store of their own through
+    ``app.dependency_overrides[get_store]``. Async so that FastAPI resolves
+    it on the event loop instead of in the threadpool.
+    """
+    return request.app.state.activities
+
+
+async def signup_admission(request: Request, email: str):
+    """Apply signup rate limits and hold a signup slot for the request"""
+    async with request.app.state.admission.admit(request.client.host if request.client else None, email):
+        yield
+
+
+@router.get("/")
+async def root():
     return RedirectResponse(url="/static/index.html")
 
 
-@app.get("/activities")
-def get_activities():
-    return activities
+async def json_response(request, body, etag, version, extra_headers=None, cache=False):
+    """Serve pre-serialized JSON, or 304 if the client's ETag is current
 
+    Large bodies are gzipped when the client accepts it; with ``cache`` the
+    compressed body is kept for the next request with the same ETag.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "X-Activities-Version": str(version),
+        **(extra_headers or {}),
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    compressed_bodies = request.app.state.compressed_bodies
+    if (cache and len(body) >= compressed_bodies.min_size
+            and negotiate(request.headers.get("accept-encoding"), ("gzip",))):
+        # Already encoded, so the gzip middleware leaves it alone; the ETag
+        # turns weak as the bytes differ from the uncompressed response
+        headers.update({"ETag": "W/" + etag, "Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+        body = await compressed_bodies.gzip(etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@app.post("/activities/{activity_name}/signup")
-def signup_for_activity(activity_name: str, email: str):
-    """Sign up a student for an activity"""
-    # Validate activity exists
-    if activity_name not in activities:
-        raise HTTPException(status_code=404, detail="Activity not found")
 
-    # Get the specific activity
-    activity = activities[activity_name]
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """Get request metrics for this process in the Prometheus text format"""
+    return Response(content=request.app.state.metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/activities")
+async def get_activities(
+    request: Request,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    name: str | None = None,
+    day: str | None = None,
+    fields: str | None = None,
+    participants: Literal["full", "count", "none"] = "full",
+    activities: ActivityStore = Depends(get_store),
+):
+    """Get activities, optionally paginated, filtered and projected
+
+    Without query parameters the whole catalog is served from a
+    pre-serialized snapshot. ``name`` filters by substring, ``day`` by the
+    weekdays in the schedule, ``fields`` picks the keys returned and
+    ``participants`` renders the roster as the full list, a
+    ``participant_count`` or not at all. When ``limit`` cuts the page short
+    the ``X-Next-Cursor`` header holds the ``cursor`` for the next page.
+    Answers 304 Not Modified when the client's If-None-Match is current.
+    """
+    if (cursor, limit, name, day, fields, participants) == (None, None, None, None, None, "full"):
+        with serialization():
+            snapshot = await activities.snapshot_async()
+        return await json_response(request, snapshot.body, snapshot.etag, snapshot.version, cache=True)
 
-    # Validate student is not already signed up
-    if email in activity["participants"]:
-        raise HTTPException(status_code=400, detail="Student already signed up for this activity")
+    try:
+        after = decode_cursor(cursor) if cursor else 0
+        project = projector(parse_fields(fields), participants, name)
+        day_index = parse_day_filter(day)
+    except ListingError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    # Add student
-    activity["participants"].append(email)
-    return {"message": f"Signed up {email} for {activity_name}"}
+    # Read the version first: a change racing with the query is then
+    # replayed by clients, which skip it using each activity's version
+    version = activities.version
+    # A page is cheap enough for the event loop; the whole catalog is not
+    items, next_seq = await activities.read_async(activities.query, project, after, limit, day_index,
+                                                   offload=limit is None)
+    with serialization():
+        body, etag = encode_payload(dict(items))
+    headers = {"X-Next-Cursor": encode_cursor(next_seq)} if next_seq is not None else None
+    return await json_response(request, body, etag, version, headers)
 
 
-@app.delete("/activities/{activity_name}/participants/{email}")
-def unregister_from_activity(activity_name: str, email: str):
-    """Unregister a student from an activity"""
-    # Validate activity exists
-    if activity_name not in activities:
+@router.get("/activities/search")
+async def search_activities(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    fields: str | None = None,
+    participants: Literal["full", "count", "none"] = "count",
+    activities: ActivityStore = Depends(get_store),
+):
+    """Search activities by name, description and schedule
+
+    Every word in ``q`` must match the start of a word in the activity, and
+    results come best first with their ``score``. Names weigh more than
+    descriptions and schedules, and exact words more than prefixes.
+    ``fields`` and ``participants`` shape each result as in `/activities`.
+    """
+    try:
+        project = projector(parse_fields(fields), participants)
+    except ListingError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    results = await activities.read_async(activities.search, q, project, limit, offload=True)
+    return {
+        "query": q,
+        "results": [{"name": name, "score": round(score, 4), **item} for name, score, item in results],
+    }
+
+
+@router.get("/activities/changes")
+async def get_activity_changes(since: int, activities: ActivityStore = Depends(get_store)):
+    """Get the participant changes made after version `since`
+
+    When the change log no longer reaches back that far, ``resync`` is true
+    and the client should reload `/activities`.
+    """
+    version, changes = await activities.read_async(activities.changes_since, since)
+    if changes is None:
+        return {"version": version, "resync": True, "changes": []}
+    return {"version": version, "resync": False, "changes": changes}
+
+
+@router.get("/activities/stream")
+async def stream_activity_changes(request: Request, activities: ActivityStore = Depends(get_store)):
+    """Stream participant changes as Server-Sent Events"""
+    return StreamingResponse(
+        event_stream(request.app.state.hub, lambda: activities.version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/activities/{activity_name}/signup", dependencies=[Depends(signup_admission)])
+async def signup_for_activity(activity_name: str, email: str, response: Response, waitlist: bool = False,
+                        conflicts: Literal["reject", "warn"] = "reject",
+                        activities: ActivityStore = Depends(get_store)):
+    """Sign up a student for an activity
+
+    Capacity is enforced atomically; a full activity answers 409 unless
+    ``waitlist=true`` is passed, in which case the student is queued (202)
+    and promoted in arrival order as seats free up.
+    A signup overlapping another of the student's activities answers 409;
+    with ``conflicts=warn`` it goes through and the overlapping activities
+    are listed under ``conflicts``. Bursts are shed with 429 (rate limit
+    per client or email) or 503 (too many signups queued), both with
+    ``Retry-After``.
+    """
+    warn = conflicts == "warn"
+    outcome = await activities.enroll_async(activity_name, email, waitlist=waitlist, allow_conflicts=warn)
+    if outcome == "waitlisted":
+        response.status_code = 202
+    result = {"message": MESSAGES[outcome].format(email=email, activity=activity_name)}
+    if warn and outcome == "enrolled":
+        clashes = await activities.read_async(activities.conflicts, email, activity_name)
+        if clashes:
+            result["conflicts"] = sorted(clashes)
+    return result
+
+
+@router.delete("/activities/{activity_name}/participants/{email}")
+async def unregister_from_activity(activity_name: str, email: str, activities: ActivityStore = Depends(get_store)):
+    """Unregister a student from an activity (or its waitlist)"""
+    outcome = await activities.withdraw_async(activity_name, email)
+    return {"message": MESSAGES[outcome].format(email=email, activity=activity_name)}
+
+
+@router.get("/activities/{activity_name}/waitlist/{email}")
+async def get_waitlist_position(activity_name: str, email: str, activities: ActivityStore = Depends(get_store)):
+    """Get a student's place on an activity's waitlist
+
+    Queued students are promoted in order as seats free up, so a client
+    polls this instead of the whole catalog; once promoted the status
+    turns to ``enrolled``.
+    """
+    position, length = await activities.read_async(activities.waitlist_position, activity_name, email)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Student is not on the waitlist for this activity")
+    if position == 0:
+        return {"activity": activity_name, "email": email, "status": "enrolled", "waitlist_length": length}
+    return {"activity": activity_name, "email": email, "status": "waitlisted", "position": position,
+            "waitlist_length": length}
+
+
+@router.get("/students/{email}/schedule")
+async def get_student_schedule(email: str, activities: ActivityStore = Depends(get_store)):
+    """Get a student's weekly meetings in time order
+
+    Answered from the student's timetable index. Activities whose schedule
+    has no recognizable days and times are listed under ``unscheduled``.
+    """
+    intervals, unscheduled = await activities.read_async(activities.timetable_for, email, offload=True)
+    return {
+        "email": email,
+        "schedule": [{"activity": name, **describe_interval(start, end)} for start, end, name in intervals],
+        "unscheduled": unscheduled,
+    }
+
+
+@router.get("/students/{email}/activities")
+async def get_student_activities(email: str, activities: ActivityStore = Depends(get_store)):
+    """Get the activities a student is signed up for and waitlisted on
+
+    Answered from the store's email -> activities indexes, so the cost
+    follows the student's enrollments rather than the size of the catalog.
+    """
+    enrolled, waitlisted = await activities.read_async(activities.enrollments_for, email)
+    return {"email": email, "activities": sorted(enrolled), "waitlisted": sorted(waitlisted)}
+
+
+@router.delete("/students/{email}")
+async def unregister_student(email: str, activities: ActivityStore = Depends(get_store)):
+    """Unregister a student from every activity and waitlist they are on"""
+    outcomes = await activities.withdraw_everywhere_async(email)
+    if not outcomes:
+        raise HTTPException(status_code=404, detail="Student is not signed up for any activity")
+    return {
+        "email": email,
+        "unregistered": sorted(name for name, outcome in outcomes.items() if outcome == "unregistered"),
+        "unwaitlisted": sorted(name for name, outcome in outcomes.items() if outcome == "unwaitlisted"),
+    }
+
+
+@router.get("/reports/summary")
+async def report_summary(activities: ActivityStore = Depends(get_store)):
+    """Get catalog-wide enrollment totals and the fill-rate histogram"""
+    return await activities.read_async(lambda: activities.reports.summary())
+
+
+@router.get("/reports/top-activities")
+async def report_top_activities(
+    by: Literal["participants", "fill_rate"] = "participants",
+    limit: int = Query(10, ge=1, le=100),
+    activities: ActivityStore = Depends(get_store),
+):
+    """Get the most subscribed activities, by participants or fill rate"""
+    top = await activities.read_async(lambda: activities.reports.top_activities(by, limit))
+    return {"by": by, "activities": top}
+
+
+@router.get("/reports/activities/{activity_name}")
+async def report_activity(activity_name: str, activities: ActivityStore = Depends(get_store)):
+    """Get an activity's fill rate and its rank by participants and fill rate"""
+    report = await activities.read_async(lambda: activities.reports.activity(activity_name))
+    if report is None:
         raise HTTPException(status_code=404, detail="Activity not found")
+    return report
+
+
+@router.get("/reports/students")
+async def report_students(activities: ActivityStore = Depends(get_store)):
+    """Get how many students take 1, 2, ... activities"""
+    return await activities.read_async(lambda: activities.reports.students())
+
+
+@router.get("/reports/students/{email}")
+async def report_student(email: str, activities: ActivityStore = Depends(get_store)):
+    """Get the number of activities a student is enrolled in"""
+    names = await activities.read_async(activities.activities_for, email)
+    return {"email": email, "activities": len(names)}
+
+
+@router.get("/reports/demand")
+async def report_demand(activities: ActivityStore = Depends(get_store)):
+    """Get enrolled students and seats offered per hour of the week and of the day"""
+    return await activities.read_async(lambda: activities.reports.demand())
+
+
+@router.post("/activities/bulk")
+async def bulk_update_activities(request: Request, atomic: bool = False,
+                                 activities: ActivityStore = Depends(get_store)):
+    """Apply many signups/unregisters in one request
+
+    The body is a JSON list of ``{"op", "activity", "email"}`` objects (or
+    ``{"operations": [...]}``), NDJSON, or CSV with an ``op,activity,email``
+    header. Every item gets the status and message/detail that the single
+    endpoints would return. With ``atomic=true`` nothing is applied unless
+    every item succeeds, and the response is 409.
+    """
+    try:
+        items = await read_operations(request)
+    except BulkRequestError as exc:
+        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+    outcomes = [None] * len(items)
+    operations, positions = [], []
+    for position, item in enumerate(items):
+        try:
+            operations.append(parse_operation(item))
+            positions.append(position)
+        except InvalidOperation as exc:
+            outcomes[position] = exc
+
+    applied = not (atomic and len(operations) < len(items))
+    if applied and operations:
+        # The store locks and may wait on fsync, so keep it off the event loop
+        results, applied = await run_in_threadpool(activities.apply_batch, operations, atomic)
+        for position, outcome in zip(positions, results):
+            outcomes[position] = outcome
+
+    results = []
+    for item, outcome in zip(items, outcomes):
+        result = {key: item.get(key) for key in ("op", "activity", "email")} if isinstance(item, dict) else {}
+        if isinstance(outcome, StoreError):
+            result.update(status=outcome.status_code, detail=outcome.detail)
+        elif not applied:
+            result.update(status=424, detail="Not applied: another operation in the batch failed")
+        else:
+            result.update(status=202 if outcome == "waitlisted" else 200,
+                          message=MESSAGES[outcome].format(email=item["email"], activity=item["activity"]))
+        results.append(result)
+
+    succeeded = sum(result["status"] < 300 for result in results)
+    return JSONResponse(
+        status_code=200 if applied else 409,
+        content={
+            "atomic": atomic,
+            "applied": applied,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+        },
+    )
+
+
+class AppConfig:
+    """Settings for ``create_app()``
+
+    ``seed`` is the catalog stored when the storage backend is empty and
+    ``storage`` the backend (by default ``open_storage()``, configured from
+    the environment). Both are only used at startup, when the store is
+    loaded; pass ``store`` to serve an already built ``ActivityStore``
+    instead. ``background_indexes`` (``ACTIVITIES_BACKGROUND_INDEXES``, on
+    unless "0") builds the search index and the reports after startup while
+    the app serves other requests, so a large catalog doesn't hold up the
+    first one.
+    """
+
+    def __init__(self, seed=None, storage=None, store=None, static_dir=None, background_indexes=None):
+        self.seed = SEED_ACTIVITIES if seed is None else seed
+        self.storage = storage
+        self.store = store
+        self.static_dir = Path(static_dir) if static_dir else Path(__file__).parent / "static"
+        if background_indexes is None:
+            background_indexes = os.environ.get("ACTIVITIES_BACKGROUND_INDEXES", "1") != "0"
+        self.background_indexes = background_indexes
+
+
+@asynccontextmanager
+async def lifespan(app):
+    config = app.state.config
+    # Read and compress the web page's files now rather than at import
+    app.state.static_assets.load()
+    store = app.state.activities
+    if store is None:
+        # Load (or seed) the catalog now rather than at import, leaving the
+        # search index and reports to a background thread when configured
+        store = ActivityStore(config.seed, storage=config.storage or open_storage(),
+                              defer_indexes=config.background_indexes)
+        store.add_listener(app.state.hub.publish)
+        app.state.activities = store
+    if not (store.search_ready and store.reports_ready):
+        threading.Thread(target=store.build_indexes, name="indexes", daemon=True).start()
+    try:
+        yield
+    finally:
+        if config.store is None:
+            # Flush the write-ahead log (if any) on shutdown
+            store.close()
+            app.state.activities = None
+
+
+def create_app(config=None):
+    """Build the API app; its store is loaded when the app starts up"""
+    config = config or AppConfig()
+    app = FastAPI(title="Mergington High School API",
+                  description="API for viewing and signing up for extracurricular activities",
+                  lifespan=lifespan,
+                  default_response_class=ORJSONResponse)
+    app.state.config = config
+    app.state.activities = config.store
+
+    # Rate limits and the concurrency cap for signups (see src/admission.py)
+    app.state.admission = SignupAdmission()
+
+    # Push every participant change to connected /activities/stream clients
+    app.state.hub = EventHub()
+    if config.store is not None:
+        config.store.add_listener(app.state.hub.publish)
+
+    app.add_exception_handler(StoreError, store_error_handler)
+    app.add_exception_handler(Rejected, rejected_handler)
+    app.include_router(router)
+
+    # Replay responses to retried mutations carrying an Idempotency-Key
+    # (see src/idempotency.py); added first so metrics still see the replays
+    app.state.idempotency = IdempotencyCache()
+    app.add_middleware(IdempotencyMiddleware, cache=app.state.idempotency)
+
+    # gzip API responses above ACTIVITIES_GZIP_MIN_SIZE bytes (see
+    # src/compression.py); inside the metrics so they record bytes sent, and
+    # outside the idempotency cache so it keeps uncompressed responses. The
+    # catalog snapshot is compressed once per version, by json_response()
+    compressed_bodies = app.state.compressed_bodies = CompressedBodies()
+    app.add_middleware(GZipMiddleware, minimum_size=compressed_bodies.min_size,
+                       compresslevel=compressed_bodies.level)
+
+    # Per-route latency, phase and size metrics for /metrics (see src/metrics.py)
+    app.state.metrics = Metrics()
+    app.add_middleware(MetricsMiddleware, metrics=app.state.metrics)
 
-    # Get the specific activity
-    activity = activities[activity_name]
+    # Serve the web page fingerprinted, precompressed and cacheable (see
+    # src/assets.py); the files are read when the app starts up
+    app.state.static_assets = StaticAssets(config.static_dir, load=False)
+    app.mount("/static", app.state.static_assets, name="static")
+    return app
 
-    # Validate student is signed up
-    if email not in activity["participants"]:
-        raise HTTPException(status_code=400, detail="Student is not signed up for this activity")
 
-    # Remove student
-    activity["participants"].remove(email)
-    return {"message": f"Unregistered {email} from {activity_name}"}
+# The app uvicorn serves (`uvicorn src.app:app`), configured from the environment
+app = create_app()
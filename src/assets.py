@@ -0,0 +1,162 @@
+"""
+Static assets
+
+``StaticAssets`` serves the web page (``src/static``) the way a CDN would.
+At startup every file is read once and:
+
+- fingerprinted: ``app.js`` is also served as ``app.<hash>.js``, named after
+  its content, and the HTML pages are rewritten to link to those names
+- precompressed to gzip (and brotli when available), keeping a variant
+  only when it is smaller
+
+Requests get the best variant the client's ``Accept-Encoding`` allows.
+Fingerprinted names change whenever their content does, so they are sent
+with ``Cache-Control: public, max-age=31536000, immutable`` and browsers
+never ask for them again. Pages and the plain names (kept for old links)
+are ``no-cache`` with an ETag, so revisits cost a 304.
+"""
+
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+
+from src.compression import ENCODINGS, compress, etag_matches, negotiate
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Local references in HTML that may point at a fingerprinted asset
+_REFERENCE = re.compile(r'(?P<attr>\b(?:src|href)=")(?P<path>[^"#?:]+)(?P<end>")')
+
+
+class _Asset:
+    """One servable file: its encoded bodies and response headers"""
+
+    __slots__ = ("content_type", "cache_control", "etag", "variants")
+
+    def __init__(self, content, content_type, cache_control):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        # encoding -> body; None is the uncompressed file
+        self.variants = {None: content}
+        for encoding in ENCODINGS:
+            compressed = compress(content, encoding)
+            if len(compressed) < len(content):
+                self.variants[encoding] = compressed
+
+
+def fingerprint(path, content):
+    """``dir/app.js`` -> ``dir/app.<first 12 hex of sha256>.js``"""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, dot, suffix = path.rpartition(".")
+    return f"{stem}.{digest}.{suffix}" if dot and "/" not in suffix else f"{path}.{digest}"
+
+
+class StaticAssets:
+    """ASGI app serving a directory fingerprinted and precompressed
+
+    The files are read and compressed in ``load()``, right away unless
+    ``load`` is False; the app factory leaves it to the lifespan so that
+    importing the app does no file I/O. A request that arrives first loads
+    them itself.
+    """
+
+    def __init__(self, directory, load=True):
+        self.directory = Path(directory)
+        # plain name -> fingerprinted name
+        self.manifest = {}
+        self._assets = {}
+        self.loaded = False
+        if load:
+            self.load()
+
+    def load(self):
+        """Read, fingerprint and compress every file; no-op once loaded"""
+        if self.loaded:
+            return
+        files = {path.relative_to(self.directory).as_posix(): path.read_bytes()
+                 for path in sorted(self.directory.rglob("*")) if path.is_file()}
+        pages = {name for name in files if name.endswith((".html", ".htm"))}
+        for name, content in files.items():
+            if name not in pages:
+                self.manifest[name] = fingerprint(name, content)
+
+        for name, content in files.items():
+            content_type = _content_type(name)
+            if name in pages:
+                content = self._rewrite(name, content)
+                self._assets[name] = _Asset(content, content_type, REVALIDATE)
+                continue
+            self._assets[name] = _Asset(content, content_type, REVALIDATE)
+            self._assets[self.manifest[name]] = _Asset(content, content_type, IMMUTABLE)
+        self.loaded = True
+
+    def _rewrite(self, page, content):
+        # Point the page's local src/href attributes at fingerprinted names
+        base = page.rpartition("/")[0]
+
+        def replace(match):
+            path = match["path"]
+            target = f"{base}/{path}" if base and not path.startswith("/") else path
+            hashed = self.manifest.get(target.lstrip("/"))
+            if hashed is None:
+                return match[0]
+            # Keep the reference's own directory part, swap in the new file name
+            directory, slash, _ = path.rpartition("/")
+            return match["attr"] + directory + slash + hashed.rpartition("/")[2] + match["end"]
+
+        return _REFERENCE.sub(replace, content.decode("utf-8")).encode("utf-8")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            await _send(send, 405, [(b"allow", b"GET, HEAD")], b"Method Not Allowed")
+            return
+
+        if not self.loaded:
+            self.load()
+        path = scope["path"]
+        root = scope.get("root_path", "")
+        if root and path.startswith(root):
+            path = path[len(root):]
+        asset = self._assets.get(path.lstrip("/"))
+        if asset is None:
+            await _send(send, 404, [(b"content-type", b"text/plain; charset=utf-8")], b"Not Found")
+            return
+
+        request_headers = dict(scope.get("headers", ()))
+        encoding = negotiate(request_headers.get(b"accept-encoding", b"").decode("latin-1"),
+                             [encoding for encoding in asset.variants if encoding])
+        body = asset.variants[encoding]
+        # Each encoding is a different representation, so it gets its own ETag
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+        headers = [
+            (b"cache-control", asset.cache_control.encode()),
+            (b"etag", etag.encode()),
+            (b"vary", b"Accept-Encoding"),
+        ]
+        if etag_matches(request_headers.get(b"if-none-match", b"").decode("latin-1"), etag):
+            await _send(send, 304, headers, b"")
+            return
+
+        headers.append((b"content-type", asset.content_type.encode()))
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding.encode()))
+        await _send(send, 200, headers, body, head=scope["method"] == "HEAD")
+
+
+def _content_type(name):
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+async def _send(send, status, headers, body, head=False):
+    if status != 304:
+        headers = [*headers, (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": b"" if head else body})
@@ -0,0 +1,126 @@
+"""
+Bulk roster operations
+
+Parses the body of ``POST /activities/bulk`` so counselors can import whole
+rosters in one request. Operations may be sent as a JSON document, as
+newline-delimited JSON, or as CSV with an ``op,activity,email`` header; the
+line-based formats are decoded incrementally as the body streams in.
+"""
+
+import codecs
+import csv
+import json
+
+from src.store import StoreError
+
+# Largest batch accepted in a single request
+MAX_OPERATIONS = 10_000
+
+OPERATIONS = ("signup", "unregister")
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+UTF8_REQUIRED = "Request body must be UTF-8"
+
+
+class BulkRequestError(ValueError):
+    """The request body as a whole can't be used"""
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class InvalidOperation(StoreError):
+    """A single batch item is malformed"""
+
+    status_code = 422
+
+
+async def read_operations(request):
+    """Return the raw operation items sent in the request body"""
+    content_type = request.headers.get("content-type", "application/json")
+    content_type = content_type.split(";")[0].strip().lower()
+
+    if content_type in NDJSON_TYPES:
+        items = []
+        async for number, line in _lines(request):
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise BulkRequestError(f"Line {number} is not valid JSON") from None
+            _check_size(items)
+        return items
+
+    if content_type == "text/csv":
+        records = []
+        async for record in _csv_records(request):
+            records.append(record)
+            _check_size(records, header=1)
+        return list(csv.DictReader(records))
+
+    if content_type == "application/json":
+        try:
+            body = json.loads(await request.body())
+        except UnicodeDecodeError:
+            raise BulkRequestError(UTF8_REQUIRED) from None
+        except ValueError:
+            raise BulkRequestError("Request body is not valid JSON") from None
+        items = body.get("operations") if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            raise BulkRequestError('Expected a list of operations or {"operations": [...]}')
+        _check_size(items)
+        return items
+
+    raise BulkRequestError(f"Unsupported content type {content_type!r}", status_code=415)
+
+
+def parse_operation(item):
+    """Validate one raw item into an ``(op, activity, email)`` tuple"""
+    if not isinstance(item, dict):
+        raise InvalidOperation("Operation must be an object with op, activity and email")
+    op, activity, email = item.get("op"), item.get("activity"), item.get("email")
+    if op not in OPERATIONS:
+        raise InvalidOperation(f"Unknown op {op!r}, expected one of {', '.join(OPERATIONS)}")
+    if not isinstance(activity, str) or not isinstance(email, str):
+        raise InvalidOperation("Operation needs string activity and email fields")
+    return op, activity, email
+
+
+def _check_size(items, header=0):
+    if len(items) - header > MAX_OPERATIONS:
+        raise BulkRequestError(f"At most {MAX_OPERATIONS} operations per request", status_code=413)
+
+
+async def _csv_records(request):
+    # Join physical lines until quotes balance, so quoted fields may span lines
+    pending = None
+    async for _, line in _lines(request, skip_blank=False):
+        pending = line if pending is None else f"{pending}\n{line}"
+        if pending.count('"') % 2 == 0:
+            if pending.strip():
+                yield pending
+            pending = None
+    if pending is not None:
+        yield pending
+
+
+async def _lines(request, skip_blank=True):
+    # Yield (line number, text) for each line of a streamed body, skipping blank ones by default
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    number = 0
+    try:
+        async for chunk in request.stream():
+            pending += decoder.decode(chunk)
+            *complete, pending = pending.split("\n")
+            for line in complete:
+                number += 1
+                if line.strip() or not skip_blank:
+                    yield number, line.rstrip("\r")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise BulkRequestError(UTF8_REQUIRED) from None
+    if pending.strip():
+        yield number + 1, pending.rstrip("\r")
@@ -0,0 +1,142 @@
+"""
+Response compression
+
+Helpers shared by the static asset server and the JSON endpoints: choosing
+a content encoding from the client's ``Accept-Encoding`` header, matching
+``If-None-Match`` against the ETag of the chosen representation, and
+compressing bodies. gzip is always available; brotli is used as well when
+the ``brotli`` package is installed (``pip install brotli``).
+
+API responses larger than ``ACTIVITIES_GZIP_MIN_SIZE`` bytes (default 1024)
+are gzipped on the fly when the client accepts it, at
+``ACTIVITIES_GZIP_LEVEL`` (default 6: most of the saving of level 9 for a
+fraction of the CPU). Static assets are compressed once, at startup, at the
+highest levels.
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.middleware import gzip as starlette_gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+# Bodies at least this large are compressed off the event loop
+THREAD_MIN_SIZE = 128 * 1024
+
+# Path prefixes whose responses are already negotiated (see src/assets.py)
+PRECOMPRESSED_PATHS = ("/static/",)
+
+# Encodings we can produce, most preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body, encoding, level=None):
+    """Compress ``body`` with ``encoding`` ("gzip" or "br")"""
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and so its ETag) reproducible
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11 if level is None else level)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def accepted_encodings(header):
+    """Parse an Accept-Encoding header into {encoding: quality}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, available=ENCODINGS):
+    """Pick the best of ``available`` the client accepts, or None for identity
+
+    Encodings are tried in the order given, so the server's preference wins
+    between encodings the client accepts equally; ``q=0`` refuses one.
+    """
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+class CompressedBodies:
+    """Small LRU of gzipped bodies by ETag, for responses served repeatedly
+
+    The whole-catalog snapshot is the same bytes until the next mutation,
+    so it is compressed once per version instead of once per request.
+    ``min_size`` and ``level`` also configure on-the-fly compression.
+    """
+
+    def __init__(self, min_size=None, level=None, max_entries=8):
+        env = os.environ.get
+        self.min_size = min_size if min_size is not None else int(env("ACTIVITIES_GZIP_MIN_SIZE", GZIP_MIN_SIZE))
+        self.level = level if level is not None else int(env("ACTIVITIES_GZIP_LEVEL", GZIP_LEVEL))
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def gzip(self, etag, body):
+        """Return ``body`` gzipped, compressing it only the first time"""
+        with self._lock:
+            compressed = self._entries.get(etag)
+            if compressed is not None:
+                self._entries.move_to_end(etag)
+                return compressed
+        if len(body) >= THREAD_MIN_SIZE:
+            compressed = await run_in_threadpool(compress, body, "gzip", self.level)
+        else:
+            compressed = compress(body, "gzip", self.level)
+        with self._lock:
+            self._entries[etag] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+
+class GZipMiddleware(starlette_gzip.GZipMiddleware):
+    """Starlette's gzip middleware, leaving precompressed paths alone"""
+
+    def __init__(self, app, exclude_paths=PRECOMPRESSED_PATHS, **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,124 @@
+"""
+Live activity events
+
+Fan-out hub that pushes participant changes to Server-Sent Events
+subscribers, so browsers watching availability don't have to poll.
+"""
+
+import asyncio
+import json
+
+# Messages buffered per subscriber before it is considered too slow
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Seconds of silence after which a keepalive comment is sent
+KEEPALIVE_INTERVAL = 15
+
+
+class Subscriber:
+    """A single connected client and its bounded message queue"""
+
+    __slots__ = ("queue", "evicted")
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+
+class EventHub:
+    """Broadcast store changes to every subscriber on the event loop
+
+    ``publish()`` may be called from any thread (the sync route handlers run
+    in FastAPI's threadpool); the actual fan-out always happens on the loop
+    that owns the subscribers. Each change is encoded once and shared by all
+    queues. A subscriber whose queue is full is evicted instead of blocking
+    the broadcast, and its stream ends so the browser reconnects and catches
+    up through the change feed.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """Register a subscriber; must be called from the event loop"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self._queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Forget a subscriber, e.g. once its client has disconnected"""
+        self._subscribers.discard(subscriber)
+
+    def publish(self, change):
+        """Queue a change for broadcast; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            self._broadcast(change)
+            return
+        try:
+            loop.call_soon_threadsafe(self._broadcast, change)
+        except RuntimeError:
+            # The loop that owned the subscribers has shut down
+            self._loop = None
+
+    def _broadcast(self, change):
+        message = format_event(change)
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._evict(subscriber)
+
+    def _evict(self, subscriber):
+        self._subscribers.discard(subscriber)
+        subscriber.evicted = True
+        self.evictions += 1
+        # Drop the backlog and wake the consumer so its stream can end
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+
+def format_event(change):
+    """Encode a change as a Server-Sent Events frame"""
+    data = json.dumps(change, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {change['version']}\ndata: {data}\n\n"
+
+
+async def event_stream(hub, current_version, keepalive=KEEPALIVE_INTERVAL):
+    """Yield SSE frames for one client until it disconnects or is evicted
+
+    The first frame is a ``version`` event carrying ``current_version()`` as
+    read right after subscribing, so the client can tell whether it missed
+    anything before the stream started.
+    """
+    subscriber = hub.subscribe()
+    try:
+        version = current_version()
+        yield f"retry: 3000\nevent: version\ndata: {json.dumps({'version': version})}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        hub.unsubscribe(subscriber)
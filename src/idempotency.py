@@ -0,0 +1,208 @@
+"""
+Idempotency keys for mutations
+
+A client that retries a POST or DELETE after a timeout can't tell whether
+its first attempt went through. Sending the same ``Idempotency-Key`` header
+with every attempt makes the retries safe: ``IdempotencyMiddleware`` runs
+the request once, keeps its response in a bounded TTL cache and answers
+later requests with that key from the cache (marked ``Idempotent-Replayed:
+true``) without routing them or touching the store. Requests that arrive
+while the first one is still running wait for it and get the same answer.
+
+A key is bound to the request it first came with (method, path, query and
+body); reusing it for a different request answers 422. Responses that say
+"try again" (5xx, 429) are not kept, so a retry really is retried.
+
+The cache is per process: with several workers a retry that lands on
+another worker executes again and gets the store's usual answer.
+
+    ACTIVITIES_IDEMPOTENCY_TTL    seconds a response is kept (default 1 day)
+    ACTIVITIES_IDEMPOTENCY_KEYS   responses kept at most (default 100000)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_KEYS = 100_000
+MAX_KEY_LENGTH = 255
+
+MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class _Entry:
+    """One key: the request it belongs to and, once finished, its response"""
+
+    __slots__ = ("fingerprint", "response", "expires", "done")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        # (status, headers, body), or None while the request is running
+        self.response = None
+        self.expires = None
+        self.done = asyncio.Event()
+
+
+class IdempotencyCache:
+    """Responses by idempotency key, expiring after ``ttl`` seconds
+
+    Entries are kept in the order they finished, which with a single TTL is
+    also expiry order, so expired entries are dropped from the front and the
+    oldest one makes room once ``max_entries`` is reached.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        env = os.environ.get
+        self.ttl = ttl if ttl is not None else float(env("ACTIVITIES_IDEMPOTENCY_TTL", IDEMPOTENCY_TTL))
+        self.max_entries = (max_entries if max_entries is not None
+                            else int(env("ACTIVITIES_IDEMPOTENCY_KEYS", IDEMPOTENCY_KEYS)))
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Forget every stored response"""
+        self._entries.clear()
+
+    def get(self, key, now=None):
+        """Return the live entry for ``key``, or None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires is not None and entry.expires <= self._now(now):
+            del self._entries[key]
+            return None
+        return entry
+
+    def begin(self, key, fingerprint):
+        """Register a request that is about to run under ``key``"""
+        entry = self._entries[key] = _Entry(fingerprint)
+        return entry
+
+    def finish(self, key, entry, response, now=None):
+        """Store ``entry``'s response, or forget the key if it is None"""
+        now = self._now(now)
+        if response is None:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        else:
+            entry.response = response
+            entry.expires = now + self.ttl
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+            self._evict(now)
+        entry.done.set()
+
+    def _evict(self, now):
+        while self._entries:
+            key, oldest = next(iter(self._entries.items()))
+            expired = oldest.expires is not None and oldest.expires <= now
+            if not expired and len(self._entries) <= self.max_entries:
+                return
+            del self._entries[key]
+
+    @staticmethod
+    def _now(now):
+        return time.monotonic() if now is None else now
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware answering repeated ``Idempotency-Key`` requests"""
+
+    def __init__(self, app, cache=None):
+        self.app = app
+        self.cache = cache if cache is not None else IdempotencyCache()
+
+    async def __call__(self, scope, receive, send):
+        key = _header(scope, b"idempotency-key") if scope["type"] == "http" else None
+        if key is None or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+            return
+
+        body, receive = await _buffer(receive)
+        fingerprint = hashlib.sha256(b"\0".join(
+            (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body))).digest()
+
+        while True:
+            entry = self.cache.get(key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                await _send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+                return
+            if entry.response is not None:
+                await _replay(send, entry.response)
+                return
+            # A request with this key is running: wait, then look again (its
+            # response, or nothing if it wasn't kept and this one must run)
+            await entry.done.wait()
+
+        entry = self.cache.begin(key, fingerprint)
+        response = {"status": None, "headers": [], "body": []}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", ()))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        keep = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+            status = response["status"]
+            if status is not None and status < 500 and status != 429:
+                keep = (status, response["headers"], b"".join(response["body"]))
+        finally:
+            self.cache.finish(key, entry, keep)
+
+
+def _header(scope, name):
+    for header, value in scope.get("headers", ()):
+        if header == name:
+            return value.decode("latin-1").strip()
+    return None
+
+
+async def _buffer(receive):
+    # Read the whole body (for the fingerprint) and hand it on unchanged
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    sent = False
+
+    async def replay_receive():
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return body, replay_receive
+
+
+async def _replay(send, response):
+    status, headers, body = response
+    await send({"type": "http.response.start", "status": status,
+                "headers": [*headers, (b"idempotent-replayed", b"true")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, content):
+    body = json.dumps(content).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
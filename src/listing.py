@@ -0,0 +1,106 @@
+"""
+Activity listing options
+
+Cursor, filter and projection helpers for ``GET /activities`` query
+parameters, so clients can fetch only the page and fields they render.
+"""
+
+import base64
+import binascii
+
+from src.schedule import parse_day
+
+# Largest page a client may request
+MAX_PAGE_SIZE = 500
+
+# Fields a client may project; the first three plus participants make up
+# the default payload
+FIELDS = (
+    "description",
+    "schedule",
+    "max_participants",
+    "participants",
+    "participant_count",
+    "spots_left",
+    "version",
+)
+DEFAULT_FIELDS = ("description", "schedule", "max_participants", "participants")
+
+PARTICIPANT_MODES = ("full", "count", "none")
+
+
+class ListingError(ValueError):
+    """A listing query parameter can't be understood"""
+
+
+def encode_cursor(seq):
+    """Wrap a catalog position in an opaque cursor string"""
+    return base64.urlsafe_b64encode(f"a:{seq}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the catalog position stored in a cursor from encode_cursor()"""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, seq = text.split(":")
+        if prefix != "a":
+            raise ValueError(prefix)
+        return int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ListingError("Invalid cursor") from None
+
+
+def parse_fields(fields):
+    """Split a comma-separated ``fields`` parameter, validating each name"""
+    if fields is None:
+        return DEFAULT_FIELDS
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in selected if field not in FIELDS]
+    if unknown:
+        raise ListingError(f"Unknown field(s): {', '.join(unknown)}")
+    return selected
+
+
+def parse_day_filter(day):
+    """Turn a ``day`` parameter such as "Monday" or "tue" into a day index"""
+    if day is None:
+        return None
+    index = parse_day(day)
+    if index is None:
+        raise ListingError(f"Unknown day {day!r}")
+    return index
+
+
+def projector(fields, participants="full", name=None):
+    """Build the ``project`` callback for ActivityStore.query()
+
+    ``participants`` decides how the participants field is rendered: the
+    full list, a ``participant_count``, or nothing. ``name`` keeps only
+    activities whose name contains it (case-insensitive).
+    """
+    needle = name.lower() if name else None
+
+    def project(activity_name, record, version):
+        if needle is not None and needle not in activity_name.lower():
+            return None
+        count = len(record["participants"])
+        item = {}
+        for field in fields:
+            if field == "participants":
+                if participants == "full":
+                    item["participants"] = record["participants"].to_list()
+                elif participants == "count":
+                    item["participant_count"] = count
+            elif field == "participant_count":
+                item[field] = count
+            elif field == "spots_left":
+                # None when the activity has no capacity limit
+                capacity = record.get("max_participants")
+                item[field] = None if capacity is None else capacity - count
+            elif field == "version":
+                item[field] = version
+            else:
+                item[field] = record.get(field)
+        return item
+
+    return project
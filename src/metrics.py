@@ -0,0 +1,297 @@
+"""
+Request metrics and profiling
+
+``MetricsMiddleware`` times every request and aggregates per-route latency
+histograms, a breakdown of where the time went, response sizes and
+in-flight counts; ``render()`` exposes them in the Prometheus text format.
+Aggregation happens on the event loop thread after each response, so the
+hot path only takes timestamps and never locks.
+
+Routes created with ``TimedRoute`` also report when their endpoint starts
+and finishes, which splits a request into three phases:
+
+    dispatch   routing, parameter validation and dependency solving
+    handler    the endpoint function itself
+    serialize  response encoding (``jsonable_encoder`` and rendering, plus
+               any explicit ``serialization()`` blocks inside the handler)
+
+Profiling is opt-in: with ``ACTIVITIES_PROFILING=1`` a request carrying an
+``X-Profile: 1`` header is run under cProfile, and
+``ACTIVITIES_PROFILE_SAMPLE`` profiles that fraction of all requests,
+keeping only dumps slower than ``ACTIVITIES_PROFILE_SLOW_MS``. Dumps are
+written to ``ACTIVITIES_PROFILE_DIR`` and named in the ``X-Profile-File``
+response header.
+
+cProfile profiles a thread, not a task, so the profile covers the event
+loop for as long as the request is in flight: it also records every other
+request the loop ran meanwhile, and none of the work offloaded to the
+store's executor threads. Read a dump as a sample of the loop around one
+slow request, or send ``X-Profile`` to an otherwise idle worker to profile
+that request alone. One request profiles the loop at a time.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import cProfile
+import functools
+import inspect
+import itertools
+import os
+import pstats
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+
+# Histogram bucket upper bounds (seconds / bytes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Timings of the request being handled, shared with its endpoint
+_current = contextvars.ContextVar("request_timings", default=None)
+
+_dumps = itertools.count(1)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestTimings:
+    """Timestamps and measurements for one request"""
+
+    __slots__ = ("start", "handler_start", "handler_end", "serialization")
+
+    def __init__(self, start):
+        self.start = start
+        self.handler_start = None
+        self.handler_end = None
+        self.serialization = 0.0
+
+
+class Metrics:
+    """Per-route request statistics for one process"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = {}
+        self.durations = {}
+        self.phases = {}
+        self.sizes = {}
+
+    def record(self, method, route, status, duration, phases, size):
+        key = (method, route)
+        self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+        _histogram(self.durations, key, LATENCY_BUCKETS).observe(duration)
+        for phase, seconds in phases.items():
+            _histogram(self.phases, key + (phase,), LATENCY_BUCKETS).observe(seconds)
+        _histogram(self.sizes, key, SIZE_BUCKETS).observe(size)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being handled",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests handled, by route and status",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        _render_histograms(lines, "http_request_duration_seconds", "Request latency, by route",
+                           self.durations, ("method", "route"))
+        _render_histograms(lines, "http_request_phase_seconds",
+                           "Request latency split into dispatch, handler and serialize phases",
+                           self.phases, ("method", "route", "phase"))
+        _render_histograms(lines, "http_response_size_bytes", "Response body size, by route",
+                           self.sizes, ("method", "route"))
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """Opt-in cProfile sampling configured from the environment"""
+
+    def __init__(self, enabled=None, sample=None, slow_ms=None, directory=None):
+        env = os.environ.get
+        self.enabled = enabled if enabled is not None else env("ACTIVITIES_PROFILING", "") not in ("", "0")
+        self.sample = sample if sample is not None else float(env("ACTIVITIES_PROFILE_SAMPLE", "0"))
+        self.slow = (slow_ms if slow_ms is not None else float(env("ACTIVITIES_PROFILE_SLOW_MS", "0"))) / 1e3
+        self.directory = Path(directory or env("ACTIVITIES_PROFILE_DIR") or Path(tempfile.gettempdir()) / "activities-profiles")
+
+    def wanted(self, scope):
+        """Whether to profile this request; returns (profile, forced)"""
+        if not self.enabled:
+            return False, False
+        for name, value in scope.get("headers", ()):
+            if name == b"x-profile" and value not in (b"", b"0"):
+                return True, True
+        return self.sample > 0 and random.random() < self.sample, False
+
+    def path_for(self, route):
+        """Pick the dump file for a profiled request to ``route``"""
+        slug = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+        return self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{os.getpid()}-{next(_dumps)}.prof"
+
+    def dump(self, profile, path):
+        """Write a request's profile of the event loop to ``path``"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        pstats.Stats(profile).dump_stats(path)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware feeding a ``Metrics`` instance (and the profiler)"""
+
+    def __init__(self, app, metrics, profiler=None):
+        self.app = app
+        self.metrics = metrics
+        self.profiler = profiler or Profiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(time.perf_counter())
+        token = _current.set(timings)
+        response = {"status": 500, "start": None, "size": 0}
+
+        profile, forced = self.profiler.wanted(scope)
+        loop_profile = None
+        if profile:
+            loop_profile = cProfile.Profile()
+            try:
+                loop_profile.enable()
+            except ValueError:
+                # Another request is already profiling the event loop thread
+                loop_profile = None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["start"] = time.perf_counter()
+                if profile:
+                    # Name the dump now so the client learns where it will be
+                    response["profile"] = self.profiler.path_for(_route_path(scope))
+                    if forced:
+                        header = (b"x-profile-file", str(response["profile"]).encode())
+                        message = {**message, "headers": [*message.get("headers", ()), header]}
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            self.metrics.in_flight -= 1
+            _current.reset(token)
+            if loop_profile is not None:
+                loop_profile.disable()
+
+            path = _route_path(scope)
+            self.metrics.record(scope["method"], path, response["status"], end - timings.start,
+                                _phases(timings, response["start"] or end), response["size"])
+
+            if loop_profile is not None and (forced or end - timings.start >= self.profiler.slow):
+                self.profiler.dump(loop_profile, response.get("profile") or self.profiler.path_for(path))
+
+
+class TimedRoute(APIRoute):
+    """API route that reports when its (async) endpoint runs"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+@contextlib.contextmanager
+def serialization():
+    """Count the enclosed block as serialization time for the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serialization += time.perf_counter() - start
+
+
+def _timed(endpoint):
+    # Wrap an endpoint, keeping its signature so FastAPI validates it
+    # exactly as before. Every route is async; a sync one would run in a
+    # worker thread, outside the event loop profile
+    if not inspect.iscoroutinefunction(endpoint):
+        raise TypeError(f"TimedRoute endpoints must be async: {endpoint.__qualname__}")
+
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return await endpoint(*args, **kwargs)
+        timings.handler_start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings.handler_end = time.perf_counter()
+    return timed
+
+
+def _route_path(scope):
+    # The matched route's template keeps label cardinality low
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def _phases(timings, response_start):
+    if timings.handler_start is None or timings.handler_end is None:
+        return {}
+    handler = timings.handler_end - timings.handler_start - timings.serialization
+    return {
+        "dispatch": timings.handler_start - timings.start,
+        "handler": max(handler, 0.0),
+        "serialize": max(response_start - timings.handler_end, 0.0) + timings.serialization,
+    }
+
+
+def _histogram(table, key, bounds):
+    histogram = table.get(key)
+    if histogram is None:
+        histogram = table[key] = Histogram(bounds)
+    return histogram
+
+
+def _render_histograms(lines, name, help_text, table, label_names):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(table.items()):
+        labels = ",".join(f'{label}="{_escape(str(value))}"' for label, value in zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
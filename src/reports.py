@@ -0,0 +1,275 @@
+"""
+Reports
+
+``Reports`` keeps the aggregates administrators ask about up to date as
+the store changes, so reading them never walks the catalog:
+
+- totals: activities, enrollments, seats and students (counters)
+- fill rates: each activity's participants / max_participants, a histogram
+  of them in 10% buckets, and the activities ranked by fill rate
+- top-subscribed activities, ranked by participant count
+- per-student enrollment counts and how many students take 1, 2, ...
+  activities
+- time-of-day demand: enrolled students and seats offered in every hour of
+  the week, from the activities' parsed schedules
+
+The store calls the ``activity_*`` hooks when an activity is stored,
+removed or gains or loses a participant, and ``student_changed()`` when a
+student's number of activities changes. Each costs O(1), apart from the
+two rankings (a binary search plus a list insert) and the demand histogram
+(one counter per hour the activity meets). Reads are O(1), O(log n) or
+O(k) for the top k.
+"""
+
+import bisect
+import math
+import threading
+
+from src.schedule import DAY_NAMES
+
+# Fill-rate histogram buckets: [0%, 10%), ..., [90%, 100%), then full
+FILL_BUCKETS = 10
+
+HOURS_PER_WEEK = 7 * 24
+
+
+class Ranking:
+    """Names ordered by a numeric score, highest first
+
+    Entries are ``(-score, name)`` in a sorted list, so ties come out in
+    name order and an update is a binary search plus a list insert.
+    """
+
+    __slots__ = ("_scores", "_entries")
+
+    def __init__(self):
+        self._scores = {}
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set(self, name, score):
+        """Add ``name`` or move it to ``score``"""
+        self.discard(name)
+        self._scores[name] = score
+        bisect.insort(self._entries, (-score, name))
+
+    def discard(self, name):
+        """Remove ``name`` (no-op if absent)"""
+        score = self._scores.pop(name, None)
+        if score is not None:
+            del self._entries[bisect.bisect_left(self._entries, (-score, name))]
+
+    def top(self, limit):
+        """The ``limit`` best ``(name, score)`` pairs"""
+        return [(name, -negative) for negative, name in self._entries[:limit]]
+
+    def rank(self, name):
+        """1-based position of ``name``, or None"""
+        score = self._scores.get(name)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._entries, (-score, name)) + 1
+
+
+class _ActivityStats:
+    """What the reports remember about one activity"""
+
+    __slots__ = ("participants", "capacity", "hours")
+
+    def __init__(self, participants, capacity, hours):
+        self.participants = participants
+        self.capacity = capacity
+        self.hours = hours
+
+    @property
+    def fill_rate(self):
+        return self.participants / self.capacity if self.capacity else None
+
+
+class Reports:
+    """Incrementally maintained aggregates over the activity store
+
+    Thread-safe: every hook and read takes the reports lock, which is a
+    leaf lock (nothing else is acquired while holding it).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._activities = {}
+        self._enrollments = 0
+        # Enrollments in activities with a capacity, for the overall fill rate
+        self._limited_enrollments = 0
+        self._capacity = 0
+        self._full = 0
+        self._by_participants = Ranking()
+        self._by_fill_rate = Ranking()
+        self._fill_histogram = [0] * (FILL_BUCKETS + 1)
+        # Enrolled students and seats offered per hour of the week
+        self._demand = [0] * HOURS_PER_WEEK
+        self._seats = [0] * HOURS_PER_WEEK
+        # number of activities -> number of students taking that many
+        self._students = {}
+        self._student_count = 0
+
+    # Hooks called by the store
+
+    def activity_added(self, name, participants, capacity, intervals):
+        """An activity was stored with ``participants`` enrolled"""
+        capacity = capacity if isinstance(capacity, int) and capacity > 0 else None
+        stats = _ActivityStats(participants, capacity, _hours(intervals))
+        with self._lock:
+            self._activities[name] = stats
+            self._capacity += capacity or 0
+            for hour in stats.hours:
+                self._seats[hour] += capacity or 0
+            self._add(name, stats)
+
+    def activity_removed(self, name):
+        """An activity was removed along with its participants"""
+        with self._lock:
+            stats = self._activities.pop(name, None)
+            if stats is None:
+                return
+            self._remove(name, stats)
+            self._capacity -= stats.capacity or 0
+            for hour in stats.hours:
+                self._seats[hour] -= stats.capacity or 0
+
+    def activity_changed(self, name, delta):
+        """An activity gained (``delta`` 1) or lost (-1) a participant"""
+        with self._lock:
+            stats = self._activities.get(name)
+            if stats is None:
+                return
+            self._remove(name, stats)
+            stats.participants += delta
+            self._add(name, stats)
+
+    def student_changed(self, before, after):
+        """A student went from ``before`` to ``after`` activities"""
+        with self._lock:
+            for count, delta in ((before, -1), (after, 1)):
+                if count:
+                    total = self._students.get(count, 0) + delta
+                    if total:
+                        self._students[count] = total
+                    else:
+                        del self._students[count]
+            self._student_count += (after > 0) - (before > 0)
+
+    # Reads
+
+    def summary(self):
+        """Catalog-wide totals and the fill-rate histogram"""
+        with self._lock:
+            histogram = [
+                {"from": bucket / FILL_BUCKETS, "to": (bucket + 1) / FILL_BUCKETS, "activities": count}
+                for bucket, count in enumerate(self._fill_histogram[:FILL_BUCKETS])
+            ]
+            histogram.append({"from": 1.0, "to": None, "activities": self._fill_histogram[FILL_BUCKETS]})
+            return {
+                "activities": len(self._activities),
+                "enrollments": self._enrollments,
+                "capacity": self._capacity,
+                "fill_rate": _ratio(self._limited_enrollments, self._capacity),
+                "full_activities": self._full,
+                "students": self._student_count,
+                "fill_rate_histogram": histogram,
+            }
+
+    def activity(self, name):
+        """One activity's participants, capacity, fill rate and ranks, or None"""
+        with self._lock:
+            stats = self._activities.get(name)
+            if stats is None:
+                return None
+            return {
+                **_describe(name, stats),
+                "rank_by_participants": self._by_participants.rank(name),
+                "rank_by_fill_rate": self._by_fill_rate.rank(name),
+            }
+
+    def top_activities(self, by="participants", limit=10):
+        """The ``limit`` activities with the most participants (or highest fill rate)"""
+        ranking = self._by_participants if by == "participants" else self._by_fill_rate
+        with self._lock:
+            return [_describe(name, self._activities[name]) for name, _ in ranking.top(limit)]
+
+    def students(self):
+        """How many students take 1, 2, ... activities"""
+        with self._lock:
+            return {
+                "students": self._student_count,
+                "enrollments": self._enrollments,
+                "activities_per_student": _ratio(self._enrollments, self._student_count),
+                "distribution": [{"activities": count, "students": self._students[count]}
+                                 for count in sorted(self._students)],
+            }
+
+    def demand(self):
+        """Enrolled students and seats per hour of the week and of the day"""
+        with self._lock:
+            by_hour = [
+                {"day": DAY_NAMES[hour // 24], "hour": hour % 24,
+                 "enrolled": self._demand[hour], "seats": self._seats[hour]}
+                for hour in range(HOURS_PER_WEEK) if self._seats[hour] or self._demand[hour]
+            ]
+            by_hour_of_day = []
+            for hour in range(24):
+                enrolled = sum(self._demand[hour::24])
+                seats = sum(self._seats[hour::24])
+                if enrolled or seats:
+                    by_hour_of_day.append({"hour": hour, "enrolled": enrolled, "seats": seats})
+            return {"by_hour": by_hour, "by_hour_of_day": by_hour_of_day}
+
+    # Bookkeeping, with the lock held: an activity's participants count
+    # towards the totals between _add() and _remove()
+
+    def _add(self, name, stats):
+        self._shift(stats, 1)
+        self._by_participants.set(name, stats.participants)
+        if stats.capacity:
+            self._by_fill_rate.set(name, stats.fill_rate)
+
+    def _remove(self, name, stats):
+        self._shift(stats, -1)
+        self._by_participants.discard(name)
+        self._by_fill_rate.discard(name)
+
+    def _shift(self, stats, sign):
+        participants = sign * stats.participants
+        self._enrollments += participants
+        for hour in stats.hours:
+            self._demand[hour] += participants
+        if stats.capacity:
+            self._limited_enrollments += participants
+            self._fill_histogram[_bucket(stats.fill_rate)] += sign
+            if stats.participants >= stats.capacity:
+                self._full += sign
+
+
+def _describe(name, stats):
+    return {
+        "name": name,
+        "participants": stats.participants,
+        "max_participants": stats.capacity,
+        "fill_rate": _ratio(stats.participants, stats.capacity),
+    }
+
+
+def _hours(intervals):
+    # The hours of the week an activity meets in, counting partial hours
+    hours = set()
+    for start, end in intervals:
+        hours.update(range(start // 60, min(HOURS_PER_WEEK, math.ceil(end / 60))))
+    return tuple(sorted(hours))
+
+
+def _bucket(rate):
+    return FILL_BUCKETS if rate >= 1 else int(rate * FILL_BUCKETS)
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
@@ -0,0 +1,196 @@
+"""
+Schedule parsing
+
+Activity schedules are free text such as "Tuesdays and Thursdays, 3:30 PM -
+4:30 PM". This module pulls the structured parts out of them: the days an
+activity meets on and its weekly time intervals, expressed as minutes since
+Monday 00:00 so overlapping meetings can be found with a binary search.
+"""
+
+import bisect
+import re
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Lowercase spellings (full, plural, abbreviated) to day index, 0 = Monday
+_DAY_ALIASES = {}
+for _index, _day in enumerate(DAY_NAMES):
+    _name = _day.lower()
+    for _alias in (_name, _name + "s", _name[:3], _name[:3] + "s"):
+        _DAY_ALIASES[_alias] = _index
+_DAY_ALIASES.update({"tue": 1, "tues": 1, "thu": 3, "thur": 3, "thurs": 3})
+
+_GROUPS = {
+    "weekdays": range(0, 5),
+    "weekends": range(5, 7),
+    "daily": range(0, 7),
+}
+
+# Minutes in a day and in a week
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+
+_WORD = re.compile(r"[a-z]+")
+
+# A day word, or a time range such as "3:30 PM - 4:30 PM", "3-4pm", "15:00-16:30".
+# A meridiem must end its word, so the "a" of "4:30 at the gym" isn't AM;
+# ranges without one are read as 24-hour times
+_TOKEN = re.compile(
+    r"(?P<range>(?P<h1>\d{1,2})(?::(?P<m1>\d{2}))?\s*(?:(?P<p1>[ap])\.?m?\.?(?![a-z]))?\s*"
+    r"(?:-|–|to)\s*(?P<h2>\d{1,2})(?::(?P<m2>\d{2}))?\s*(?:(?P<p2>[ap])\.?m?\.?(?![a-z]))?)"
+    r"|(?P<word>[a-z]+)"
+)
+
+
+def parse_day(text):
+    """Return the day index (0 = Monday) for a day name, or None"""
+    return _DAY_ALIASES.get(text.strip().lower().rstrip("."))
+
+
+def parse_days(schedule):
+    """Return the set of day indices a schedule string mentions"""
+    days = set()
+    for word in _WORD.findall(schedule.lower()):
+        if word in _DAY_ALIASES:
+            days.add(_DAY_ALIASES[word])
+        elif word in _GROUPS:
+            days.update(_GROUPS[word])
+    return frozenset(days)
+
+
+def parse_intervals(schedule):
+    """Return the weekly ``(start, end)`` minute intervals a schedule describes
+
+    Days listed before a time range meet at that time, so "Mondays 3-4 PM,
+    Fridays 2-3 PM" yields two intervals. Returns an empty tuple when the
+    schedule has no recognizable days or times.
+    """
+    intervals = set()
+    pending, days = [], []
+    for match in _TOKEN.finditer(schedule.lower()):
+        word = match.group("word")
+        if word is not None:
+            if word in _DAY_ALIASES:
+                pending.append(_DAY_ALIASES[word])
+            elif word in _GROUPS:
+                pending.extend(_GROUPS[word])
+            continue
+
+        times = _parse_range(match)
+        if times is None:
+            continue
+        if pending:
+            days, pending = pending, []
+        for day in days:
+            start, end = day * DAY_MINUTES + times[0], day * DAY_MINUTES + times[1]
+            if end > WEEK_MINUTES:
+                # Sunday night into Monday morning wraps around the week
+                intervals.add((0, end - WEEK_MINUTES))
+                end = WEEK_MINUTES
+            intervals.add((start, end))
+    return tuple(sorted(intervals))
+
+
+def overlaps(intervals, others):
+    """Whether any interval in ``intervals`` overlaps one in ``others``"""
+    return any(start < other_end and other_start < end
+               for start, end in intervals for other_start, other_end in others)
+
+
+def describe_interval(start, end):
+    """Render a weekly interval as ``{"day", "start", "end"}`` for the API"""
+    return {
+        "day": DAY_NAMES[start // DAY_MINUTES],
+        "start": _clock(start),
+        "end": _clock(end),
+    }
+
+
+class Timetable:
+    """One student's weekly intervals, sorted by start time
+
+    ``overlapping()`` finds clashes with a binary search plus a scan back
+    over only the entries long enough to reach the queried start, so a
+    check costs O(log n) for a student's n meetings.
+    """
+
+    __slots__ = ("_entries", "_longest")
+
+    def __init__(self):
+        self._entries = []
+        self._longest = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def add(self, name, intervals):
+        """Add an activity's intervals"""
+        self.add_entries([(start, end, name) for start, end in intervals])
+
+    def remove(self, name, intervals):
+        """Remove intervals previously added for an activity"""
+        self.remove_entries([(start, end, name) for start, end in intervals])
+
+    def add_entries(self, entries):
+        """Add ``(start, end, name)`` entries, which may be shared with other timetables"""
+        for entry in entries:
+            bisect.insort(self._entries, entry)
+            self._longest = max(self._longest, entry[1] - entry[0])
+
+    def remove_entries(self, entries):
+        """Remove entries previously added"""
+        for entry in entries:
+            index = bisect.bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    def overlapping(self, intervals):
+        """Return the names of activities overlapping any of ``intervals``"""
+        names = set()
+        for start, end in intervals:
+            # Entries starting at or after `end` can't overlap
+            index = bisect.bisect_left(self._entries, (end,))
+            while index > 0:
+                index -= 1
+                entry_start, entry_end, name = self._entries[index]
+                if entry_start + self._longest <= start:
+                    break
+                if entry_end > start:
+                    names.add(name)
+        return names
+
+
+def _parse_range(match):
+    # Minutes after midnight for a matched time range, or None if invalid
+    h1, h2 = int(match.group("h1")), int(match.group("h2"))
+    m1, m2 = int(match.group("m1") or 0), int(match.group("m2") or 0)
+    p1, p2 = match.group("p1"), match.group("p2")
+    if max(m1, m2) > 59 or max(h1, h2) > 23 or (p1 or p2) and max(h1, h2) > 12:
+        return None
+
+    end = _minutes(h2, m2, p2)
+    start = _minutes(h1, m1, p1 or p2)
+    if p1 is None and p2 is not None and start > end:
+        # "11 - 1 PM": the start is in the morning
+        start = _minutes(h1, m1, "a")
+    if start == end:
+        return None
+    if end < start:
+        end += DAY_MINUTES
+    return start, end
+
+
+def _minutes(hour, minute, period):
+    if period == "p" and hour != 12:
+        hour += 12
+    elif period == "a" and hour == 12:
+        hour = 0
+    return hour * 60 + minute
+
+
+def _clock(minutes):
+    minutes %= DAY_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
@@ -0,0 +1,203 @@
+"""
+Activity search
+
+``SearchIndex`` is an inverted index over each activity's name, description
+and schedule. Every term maps to the activities containing it with a
+field-weighted frequency, and all terms are also kept in a sorted array so
+a query word matches every term it is a prefix of ("math" finds
+"mathematics") with a binary search.
+
+Queries match activities containing every query word. An activity's score
+sums, per word, its best matching term's weight times the term's inverse
+document frequency, with prefix matches counting half as much as exact
+ones. Each term's postings are also kept ranked by weight, so a query
+walks its most selective word's matches best first and stops as soon as
+nothing unseen can make the top results: popular words cost about as much
+as rare ones, and only words that rarely occur together (where every
+match has to be checked) cost more. Updates are incremental: adding or
+removing an activity touches only its own terms.
+"""
+
+import bisect
+import heapq
+import math
+import re
+
+# How much one occurrence of a term counts, by field
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+SCHEDULE_WEIGHT = 1
+
+# Score factor for a term that only starts with the query word
+PREFIX_WEIGHT = 0.5
+
+# Terms one query word may expand to, so "a" stays cheap
+MAX_EXPANSIONS = 64
+
+_TERM = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Split text into lowercase search terms"""
+    return _TERM.findall(text.lower())
+
+
+class SearchIndex:
+    """Inverted index of activity text with prefix matching"""
+
+    __slots__ = ("_postings", "_terms", "_documents", "_ranked")
+
+    def __init__(self):
+        # term -> {activity name: weight}
+        self._postings = {}
+        # Every term in sorted order, for prefix ranges
+        self._terms = []
+        # activity name -> {term: weight}, to undo add() and score matches
+        self._documents = {}
+        # term -> postings as (-weight, name) sorted best first, built on
+        # demand and dropped whenever the term's postings change
+        self._ranked = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, name, description="", schedule=""):
+        """Index an activity, replacing what was indexed under ``name``"""
+        for term in self._insert(name, description, schedule):
+            bisect.insort(self._terms, term)
+
+    def add_many(self, documents):
+        """Index many ``(name, description, schedule)`` triples at once
+
+        Same result as calling ``add()`` for each, but the sorted term array
+        is rebuilt once at the end instead of growing one insert at a time,
+        which is quadratic when most activities bring a term of their own.
+        """
+        for name, description, schedule in documents:
+            self._insert(name, description, schedule)
+        self._terms = sorted(self._postings)
+
+    def _insert(self, name, description, schedule):
+        # Index the postings and return the terms that are new to the index
+        self.remove(name)
+        weights = {}
+        for text, weight in ((name, NAME_WEIGHT), (description, DESCRIPTION_WEIGHT),
+                             (schedule, SCHEDULE_WEIGHT)):
+            for term in tokenize(text or ""):
+                weights[term] = weights.get(term, 0) + weight
+        self._documents[name] = weights
+
+        new_terms = []
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                new_terms.append(term)
+            postings[name] = weight
+            self._ranked.pop(term, None)
+        return new_terms
+
+    def remove(self, name):
+        """Drop an activity from the index (no-op if absent)"""
+        weights = self._documents.pop(name, None)
+        if weights is None:
+            return
+        for term in weights:
+            postings = self._postings[term]
+            del postings[name]
+            self._ranked.pop(term, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def search(self, query, limit=20):
+        """Return up to ``limit`` ``(name, score)`` pairs, best first"""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or limit < 1:
+            return []
+        expansions = []
+        for word in words:
+            factors = self._expand(word)
+            if not factors:
+                return []
+            expansions.append(factors)
+
+        # Walk the matches of the most selective word best first and score
+        # each activity fully; stop once the k-th best beats anything an
+        # unseen activity could still reach, counting the other words at
+        # their best possible score (Fagin's threshold algorithm)
+        expansions.sort(key=self._match_count)
+        ceiling = sum(self._top_score(factors) for factors in expansions[1:])
+        best, seen = [], set()
+        for negative, name in self._stream(expansions[0]):
+            if len(best) == limit and best[0][0] >= ceiling - negative:
+                break
+            if name in seen:
+                continue
+            seen.add(name)
+            score = self._score(name, expansions)
+            if score is None:
+                continue
+            if len(best) < limit:
+                heapq.heappush(best, (score, name))
+            elif score > best[0][0]:
+                heapq.heapreplace(best, (score, name))
+        return sorted(((name, score) for score, name in best), key=lambda pair: (-pair[1], pair[0]))
+
+    def _expand(self, word):
+        # The terms ``word`` is a prefix of, with their score factor
+        factors = {}
+        documents = len(self._documents)
+        terms = self._terms
+        position = bisect.bisect_left(terms, word)
+        end = min(len(terms), position + MAX_EXPANSIONS)
+        while position < end and terms[position].startswith(word):
+            term = terms[position]
+            position += 1
+            idf = math.log(1 + documents / len(self._postings[term]))
+            factors[term] = idf * (1.0 if term == word else PREFIX_WEIGHT)
+        return factors
+
+    def _stream(self, factors):
+        # (-score, name) for every match of one word, best first
+        return heapq.merge(*(self._scaled(term, factor) for term, factor in factors.items()))
+
+    def _scaled(self, term, factor):
+        # A function of its own so each generator keeps its own factor
+        return ((negative * factor, name) for negative, name in self._ranked_postings(term))
+
+    def _match_count(self, factors):
+        return sum(len(self._postings[term]) for term in factors)
+
+    def _top_score(self, factors):
+        return max(-self._ranked_postings(term)[0][0] * factor for term, factor in factors.items())
+
+    def _ranked_postings(self, term):
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            ranked = self._ranked[term] = sorted((-weight, name) for name, weight in self._postings[term].items())
+        return ranked
+
+    def _score(self, name, expansions):
+        # Sum of each word's best matching term in the activity, or None
+        # if some word doesn't match it at all
+        weights = self._documents[name]
+        total = 0.0
+        for factors in expansions:
+            # Look up whichever side is smaller: usually the word has one term
+            if len(factors) == 1:
+                (term, factor), = factors.items()
+                weight = weights.get(term)
+                if not weight:
+                    return None
+                total += weight * factor
+                continue
+            if len(factors) <= len(weights):
+                pairs = ((weights.get(term), factor) for term, factor in factors.items())
+            else:
+                pairs = ((weight, factors.get(term)) for term, weight in weights.items())
+            best = max((weight * factor for weight, factor in pairs if weight and factor), default=0.0)
+            if not best:
+                return None
+            total += best
+        return total
@@ -0,0 +1,31 @@
+"""
+JSON serialization
+
+One place that turns response data into JSON bytes. orjson is used when it
+is installed (``pip install orjson``) and the standard library otherwise;
+both produce the same compact UTF-8 output, so payloads and ETags keep the
+shape clients already rely on.
+"""
+
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps(data):
+    """Serialize data to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with ``dumps()`` (orjson when available)"""
+
+    def render(self, content):
+        return dumps(content)
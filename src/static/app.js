@@ -4,73 +4,506 @@ document.addEventListener("DOMContentLoaded", () => {
   const signupForm = document.getElementById("signup-form");
   const messageDiv = document.getElementById("message");
 
-  // Function to fetch activities from API
+  // Fields fetched for the catalog view; rosters are loaded per card on demand
+  const LIST_URL =
+    "/activities?participants=count&fields=description,schedule,max_participants,participants,version";
+  const PAGE_SIZE = 500;
+
+  // Only the cards in and near the visible part of the list are in the DOM.
+  // Cards not measured yet are assumed to be this tall (margin included).
+  const ESTIMATED_CARD_HEIGHT = 200;
+  const CARD_MARGIN = 15;
+  const OVERSCAN = 5;
+  // Roster rows shown at first, and added by each "Show more"
+  const ROSTER_PAGE = 50;
+
+  // Last rendered catalog: the change-feed version it reflects, the
+  // activities keyed by name (in server order) and the cards currently in
+  // the DOM. Cards whose roster is open keep the loaded participant list in
+  // their state.
+  let activitiesVersion = null;
+  let activitiesState = {};
+  let order = [];
+  const activityCards = new Map();
+  const expanded = new Set();
+  // Measured card heights and how many roster rows each open card shows
+  const heights = new Map();
+  const rosterShown = new Map();
+
+  // Spacers stand in for the cards above and below the rendered window
+  const topSpacer = document.createElement("div");
+  const bottomSpacer = document.createElement("div");
+  let renderScheduled = false;
+
+  // Page URL -> { etag, data } so an unchanged page revalidates with a 304
+  const pageCache = new Map();
+
+  // True while the live event stream is connected and keeping us current
+  let liveUpdates = false;
+
+  // Build a participant row with its remove button
+  function createParticipantItem(activityName, email) {
+    const item = document.createElement("div");
+    item.className = "participant-item";
+
+    const emailSpan = document.createElement("span");
+    emailSpan.className = "participant-email";
+    emailSpan.textContent = email;
+
+    const deleteButton = document.createElement("button");
+    deleteButton.className = "delete-btn";
+    deleteButton.title = "Remove participant";
+    deleteButton.textContent = "×";
+    deleteButton.addEventListener("click", () => removeParticipant(activityName, email));
+
+    item.append(emailSpan, deleteButton);
+    return item;
+  }
+
+  // Fill a card's roster from its loaded participants, a page at a time
+  function renderParticipants(name, roster) {
+    const details = activitiesState[name];
+    roster.replaceChildren();
+    if (details.participants.length === 0) {
+      const empty = document.createElement("p");
+      empty.className = "no-participants";
+      empty.textContent = "No participants yet";
+      roster.appendChild(empty);
+      return;
+    }
+
+    const shown = rosterShown.get(name) || ROSTER_PAGE;
+    const participantsList = document.createElement("div");
+    participantsList.className = "participants-list";
+    details.participants.slice(0, shown).forEach((email) => {
+      participantsList.appendChild(createParticipantItem(name, email));
+    });
+    roster.appendChild(participantsList);
+
+    const hidden = details.participants.length - shown;
+    if (hidden > 0) {
+      const more = document.createElement("button");
+      more.type = "button";
+      more.className = "show-more";
+      more.textContent = `Show ${Math.min(hidden, ROSTER_PAGE)} more of ${hidden}`;
+      more.addEventListener("click", () => {
+        rosterShown.set(name, shown + ROSTER_PAGE);
+        refreshCard(name);
+      });
+      roster.appendChild(more);
+    }
+  }
+
+  // Append a "<strong>label</strong> value" paragraph; returns the value span
+  function addField(card, label) {
+    const paragraph = document.createElement("p");
+    const strong = document.createElement("strong");
+    strong.textContent = `${label}:`;
+    const value = document.createElement("span");
+    paragraph.append(strong, " ", value);
+    card.appendChild(paragraph);
+    return value;
+  }
+
+  // Build an empty card for one activity; updateCard() fills it in
+  function createActivityCard(name) {
+    const activityCard = document.createElement("div");
+    activityCard.className = "activity-card";
+
+    const title = document.createElement("h4");
+    title.textContent = name;
+    const description = document.createElement("p");
+    description.className = "activity-description";
+    activityCard.append(title, description);
+    const schedule = addField(activityCard, "Schedule");
+    schedule.className = "activity-schedule";
+    const availability = addField(activityCard, "Availability");
+
+    const participantsSection = document.createElement("div");
+    participantsSection.className = "participants-section";
+    const toggle = document.createElement("button");
+    toggle.type = "button";
+    toggle.className = "participants-toggle";
+    toggle.addEventListener("click", () => toggleParticipants(name));
+    const roster = document.createElement("div");
+    participantsSection.append(toggle, roster);
+    activityCard.appendChild(participantsSection);
+
+    activityCard.parts = { description, schedule, availability, toggle, roster };
+    activityCard.renderKey = null;
+    updateCard(name, activityCard);
+    return activityCard;
+  }
+
+  // Patch a card in place with the current state, touching only what changed
+  function updateCard(name, activityCard) {
+    const details = activitiesState[name];
+    const isOpen = expanded.has(name) && Boolean(details.participants);
+    const key = [details.version, details.participant_count, details.max_participants,
+      details.description, details.schedule, isOpen, rosterShown.get(name)].join("\u0000");
+    if (key === activityCard.renderKey) {
+      return;
+    }
+    const parts = activityCard.parts;
+    if (activityCard.renderKey === null || parts.description.textContent !== details.description) {
+      parts.description.textContent = details.description;
+    }
+    if (activityCard.renderKey === null || parts.schedule.textContent !== details.schedule) {
+      parts.schedule.textContent = details.schedule;
+    }
+    parts.availability.textContent = `${details.max_participants - details.participant_count} spots left`;
+    parts.toggle.textContent = `${isOpen ? "Hide" : "Show"} participants (${details.participant_count})`;
+    if (isOpen) {
+      renderParticipants(name, parts.roster);
+    } else if (parts.roster.firstChild) {
+      parts.roster.replaceChildren();
+    }
+    activityCard.renderKey = key;
+  }
+
+  // Bring one activity's card up to date, if it is rendered
+  function refreshCard(name) {
+    const activityCard = activityCards.get(name);
+    if (activityCard) {
+      updateCard(name, activityCard);
+      // Its height may have changed (roster opened or grew)
+      scheduleRender();
+    }
+  }
+
+  // Open or close a card's roster, loading it the first time it is shown
+  async function toggleParticipants(name) {
+    if (expanded.has(name)) {
+      expanded.delete(name);
+      rosterShown.delete(name);
+      refreshCard(name);
+      return;
+    }
+
+    expanded.add(name);
+    if (!activitiesState[name].participants) {
+      try {
+        const params = new URLSearchParams({ name, fields: "participants,version" });
+        const response = await fetch(`/activities?${params}`, { cache: "no-store" });
+        const roster = (await response.json())[name];
+        const details = activitiesState[name];
+        if (!roster || !details) {
+          return;
+        }
+        details.participants = roster.participants;
+        details.participant_count = roster.participants.length;
+        details.version = Math.max(details.version, roster.version);
+      } catch (error) {
+        expanded.delete(name);
+        console.error("Error fetching participants:", error);
+      }
+    }
+    refreshCard(name);
+  }
+
+  function heightOf(name) {
+    return heights.get(name) || ESTIMATED_CARD_HEIGHT;
+  }
+
+  // Render the cards overlapping the visible part of the list (plus a few
+  // on either side), reusing the cards already in the DOM
+  function renderWindow() {
+    renderScheduled = false;
+    const viewTop = activitiesList.scrollTop;
+    const viewBottom = viewTop + (activitiesList.clientHeight || window.innerHeight);
+
+    let start = 0;
+    let offset = 0;
+    while (start < order.length && offset + heightOf(order[start]) <= viewTop) {
+      offset += heightOf(order[start]);
+      start += 1;
+    }
+    let end = start;
+    while (end < order.length && offset < viewBottom) {
+      offset += heightOf(order[end]);
+      end += 1;
+    }
+    start = Math.max(0, start - OVERSCAN);
+    end = Math.min(order.length, end + OVERSCAN);
+    const visible = order.slice(start, end);
+
+    // Drop cards that scrolled out, then place the window's cards in order
+    const keep = new Set(visible);
+    activityCards.forEach((activityCard, name) => {
+      if (!keep.has(name)) {
+        activityCard.remove();
+        activityCards.delete(name);
+      }
+    });
+    let previous = topSpacer;
+    visible.forEach((name) => {
+      let activityCard = activityCards.get(name);
+      if (activityCard) {
+        updateCard(name, activityCard);
+      } else {
+        activityCard = createActivityCard(name);
+        activityCards.set(name, activityCard);
+      }
+      if (previous.nextSibling !== activityCard) {
+        previous.after(activityCard);
+      }
+      previous = activityCard;
+    });
+
+    // Remember real heights so the spacers (and later windows) are exact
+    visible.forEach((name) => {
+      const height = activityCards.get(name).offsetHeight;
+      if (height) {
+        heights.set(name, height + CARD_MARGIN);
+      }
+    });
+    let above = 0;
+    for (let i = 0; i < start; i += 1) {
+      above += heightOf(order[i]);
+    }
+    let below = 0;
+    for (let i = end; i < order.length; i += 1) {
+      below += heightOf(order[i]);
+    }
+    topSpacer.style.height = `${above}px`;
+    bottomSpacer.style.height = `${below}px`;
+  }
+
+  function scheduleRender() {
+    if (!renderScheduled) {
+      renderScheduled = true;
+      requestAnimationFrame(renderWindow);
+    }
+  }
+
+  // Rebuild the dropdown only when the set of activities changed
+  let optionNames = null;
+  function renderOptions() {
+    const names = order.join("\n");
+    if (names === optionNames) {
+      return;
+    }
+    optionNames = names;
+    const selected = activitySelect.value;
+    const options = document.createDocumentFragment();
+    order.forEach((name) => {
+      const option = document.createElement("option");
+      option.value = name;
+      option.textContent = name;
+      options.appendChild(option);
+    });
+    // Keep only the "-- Select an activity --" placeholder
+    activitySelect.length = 1;
+    activitySelect.appendChild(options);
+    activitySelect.value = selected;
+  }
+
+  // Show the catalog: cards for the visible window and every dropdown option
+  function renderActivities() {
+    if (topSpacer.parentNode !== activitiesList) {
+      // First render, or after an error message replaced the list
+      activitiesList.replaceChildren(topSpacer, bottomSpacer);
+      activityCards.clear();
+    }
+    heights.forEach((_, name) => {
+      if (!(name in activitiesState)) {
+        heights.delete(name);
+      }
+    });
+    renderOptions();
+    renderWindow();
+  }
+
+  activitiesList.addEventListener("scroll", scheduleRender, { passive: true });
+  window.addEventListener("resize", scheduleRender);
+
+  // Fetch one page of the catalog, revalidating against the cached copy
+  async function fetchPage(url) {
+    const cached = pageCache.get(url);
+    const response = await fetch(url, {
+      cache: "no-store",
+      headers: cached ? { "If-None-Match": cached.etag } : {},
+    });
+    const version = Number(response.headers.get("X-Activities-Version"));
+    const next = response.headers.get("X-Next-Cursor");
+    if (response.status === 304) {
+      return { data: cached.data, version, next, changed: false };
+    }
+    const data = await response.json();
+    pageCache.set(url, { etag: response.headers.get("ETag"), data });
+    return { data, version, next, changed: true };
+  }
+
+  // Function to fetch activities from API, following the page cursors
   async function fetchActivities() {
     try {
-      const response = await fetch("/activities");
-      const activities = await response.json();
-
-      // Clear loading message
-      activitiesList.innerHTML = "";
-
-      // Populate activities list
-      Object.entries(activities).forEach(([name, details]) => {
-        const activityCard = document.createElement("div");
-        activityCard.className = "activity-card";
-
-        const spotsLeft = details.max_participants - details.participants.length;
-
-        // Create participants list HTML
-        const participantsList = details.participants.length > 0
-          ? `<div class="participants-list">${details.participants.map(participant => 
-              `<div class="participant-item">
-                <span class="participant-email">${participant}</span>
-                <button class="delete-btn" onclick="removeParticipant('${name}', '${participant}')" title="Remove participant">
-                  ×
-                </button>
-              </div>`
-            ).join('')}</div>`
-          : '<p class="no-participants">No participants yet</p>';
-
-        activityCard.innerHTML = `
-          <h4>${name}</h4>
-          <p>${details.description}</p>
-          <p><strong>Schedule:</strong> ${details.schedule}</p>
-          <p><strong>Availability:</strong> ${spotsLeft} spots left</p>
-          <div class="participants-section">
-            <p><strong>Current Participants:</strong></p>
-            ${participantsList}
-          </div>
-        `;
-
-        activitiesList.appendChild(activityCard);
-
-        // Add option to select dropdown
-        const option = document.createElement("option");
-        option.value = name;
-        option.textContent = name;
-        activitySelect.appendChild(option);
+      const state = {};
+      let version = null;
+      let changed = false;
+      let cursor = null;
+      do {
+        const url = `${LIST_URL}&limit=${PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : "");
+        const page = await fetchPage(url);
+        // The feed must resume from the oldest version any page reflects
+        version = version === null ? page.version : Math.min(version, page.version);
+        changed = changed || page.changed;
+        Object.entries(page.data).forEach(([name, details]) => {
+          state[name] = { ...details };
+        });
+        cursor = page.next;
+      } while (cursor);
+
+      activitiesVersion = version;
+      if (!changed && topSpacer.parentNode === activitiesList) {
+        return;
+      }
+      // Rosters stay open and loaded for activities unchanged since
+      Object.entries(state).forEach(([name, details]) => {
+        const previous = activitiesState[name];
+        if (previous && previous.participants && previous.version === details.version) {
+          details.participants = previous.participants;
+        }
+      });
+      expanded.forEach((name) => {
+        if (!state[name] || !state[name].participants) {
+          expanded.delete(name);
+          rosterShown.delete(name);
+        }
       });
+      activitiesState = state;
+      order = Object.keys(state);
+      renderActivities();
     } catch (error) {
       activitiesList.innerHTML = "<p>Failed to load activities. Please try again later.</p>";
       console.error("Error fetching activities:", error);
     }
   }
 
+  // Apply one change from the feed; returns false if it can't be patched in.
+  // Each activity carries the version it was read at, so a change that is
+  // already reflected (replayed after a page was fetched) is skipped.
+  function applyChange(change) {
+    const details = activitiesState[change.activity];
+    if (!details) {
+      return false;
+    }
+    if (change.version <= details.version) {
+      return true;
+    }
+
+    if (change.op === "signup") {
+      details.participant_count += 1;
+      if (details.participants && !details.participants.includes(change.email)) {
+        details.participants.push(change.email);
+      }
+    } else if (change.op === "unregister") {
+      details.participant_count -= 1;
+      if (details.participants) {
+        details.participants = details.participants.filter((email) => email !== change.email);
+      }
+    }
+    details.version = change.version;
+
+    refreshCard(change.activity);
+    return true;
+  }
+
+  // Bring the list up to date with only the changes since the last sync,
+  // falling back to a full reload when the server asks for a resync
+  async function syncActivities() {
+    if (activitiesVersion === null) {
+      return fetchActivities();
+    }
+
+    try {
+      const response = await fetch(`/activities/changes?since=${activitiesVersion}`, {
+        cache: "no-store",
+      });
+      const feed = await response.json();
+
+      if (feed.resync || !feed.changes.every(applyChange)) {
+        return fetchActivities();
+      }
+      activitiesVersion = feed.version;
+      // The rendered state no longer matches the cached pages
+      pageCache.clear();
+    } catch (error) {
+      console.error("Error syncing activities:", error);
+    }
+  }
+
+  // Subscribe to pushed changes so the list stays current without polling
+  function connectStream() {
+    if (!window.EventSource) {
+      return;
+    }
+
+    const stream = new EventSource("/activities/stream");
+
+    // Sent on every (re)connect: catch up on anything missed while offline
+    stream.addEventListener("version", (event) => {
+      liveUpdates = true;
+      if (JSON.parse(event.data).version !== activitiesVersion) {
+        syncActivities();
+      }
+    });
+
+    stream.onmessage = (event) => {
+      const change = JSON.parse(event.data);
+      if (activitiesVersion === null || change.version <= activitiesVersion) {
+        return;
+      }
+      if (change.op === "resync" || change.version !== activitiesVersion + 1) {
+        syncActivities();
+        return;
+      }
+      if (applyChange(change)) {
+        activitiesVersion = change.version;
+        pageCache.clear();
+      } else {
+        fetchActivities();
+      }
+    };
+
+    // The browser reconnects on its own; until then fall back to the feed
+    stream.onerror = () => {
+      liveUpdates = false;
+    };
+  }
+
+  // Keep the button disabled while a signup is in flight, and for as long
+  // as the server asks when it sheds load, so repeated clicks don't pile up
+  const submitButton = signupForm.querySelector('button[type="submit"]');
+  let retryTimer = null;
+
+  function holdSubmit(seconds) {
+    submitButton.disabled = true;
+    clearTimeout(retryTimer);
+    retryTimer = setTimeout(() => {
+      submitButton.disabled = false;
+    }, seconds * 1000);
+  }
+
   // Handle form submission
   signupForm.addEventListener("submit", async (event) => {
     event.preventDefault();
+    if (submitButton.disabled) {
+      return;
+    }
 
     const email = document.getElementById("email").value;
     const activity = document.getElementById("activity").value;
 
+    submitButton.disabled = true;
+    let retryAfter = 0;
+    const url = `/activities/${encodeURIComponent(activity)}/signup?email=${encodeURIComponent(email)}`;
+    const action = `POST ${url}`;
     try {
-      const response = await fetch(
-        `/activities/${encodeURIComponent(activity)}/signup?email=${encodeURIComponent(email)}`,
-        {
-          method: "POST",
-        }
-      );
+      const response = await fetch(url, {
+        method: "POST",
+        headers: { "Idempotency-Key": idempotencyKey(action) },
+      });
+      settleIdempotencyKey(action, response);
 
       const result = await response.json();
 
@@ -78,6 +511,13 @@ document.addEventListener("DOMContentLoaded", () => {
         messageDiv.textContent = result.message;
         messageDiv.className = "success";
         signupForm.reset();
+        if (!liveUpdates) {
+          syncActivities();
+        }
+      } else if (response.status === 429 || response.status === 503) {
+        retryAfter = Number(response.headers.get("Retry-After")) || 1;
+        messageDiv.textContent = `${result.detail}. You can try again in ${retryAfter} s.`;
+        messageDiv.className = "error";
       } else {
         messageDiv.textContent = result.detail || "An error occurred";
         messageDiv.className = "error";
@@ -94,29 +534,62 @@ document.addEventListener("DOMContentLoaded", () => {
       messageDiv.className = "error";
       messageDiv.classList.remove("hidden");
       console.error("Error signing up:", error);
+    } finally {
+      if (retryAfter) {
+        holdSubmit(retryAfter);
+      } else {
+        submitButton.disabled = false;
+      }
     }
   });
 
-  // Make fetchActivities globally accessible for refresh after deletion
-  window.fetchActivities = fetchActivities;
+  // Make syncActivities globally accessible for refresh after deletion;
+  // with live updates on, the change arrives through the stream instead
+  window.syncActivities = () => (liveUpdates ? undefined : syncActivities());
 
   // Initialize app
-  fetchActivities();
+  fetchActivities().then(connectStream);
 });
 
+// Idempotency keys of the mutations still waiting for a definitive answer,
+// by method and URL. Submitting the same action again (after a network
+// error, a 5xx or a 429) reuses its key, so the server runs it at most once
+// and answers the retry from its record of the first attempt
+const pendingKeys = new Map();
+
+function idempotencyKey(action) {
+  let key = pendingKeys.get(action);
+  if (!key) {
+    key = window.crypto && crypto.randomUUID
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    pendingKeys.set(action, key);
+  }
+  return key;
+}
+
+// Forget an action's key once the server has answered it for good; "try
+// again" answers (5xx, 429), which the server doesn't keep, hold on to it
+function settleIdempotencyKey(action, response) {
+  if (response.status < 500 && response.status !== 429) {
+    pendingKeys.delete(action);
+  }
+}
+
 // Function to remove participant from activity
 async function removeParticipant(activityName, participantEmail) {
   if (!confirm(`Are you sure you want to remove ${participantEmail} from ${activityName}?`)) {
     return;
   }
 
+  const url = `/activities/${encodeURIComponent(activityName)}/participants/${encodeURIComponent(participantEmail)}`;
+  const action = `DELETE ${url}`;
   try {
-    const response = await fetch(
-      `/activities/${encodeURIComponent(activityName)}/participants/${encodeURIComponent(participantEmail)}`,
-      {
-        method: "DELETE",
-      }
-    );
+    const response = await fetch(url, {
+      method: "DELETE",
+      headers: { "Idempotency-Key": idempotencyKey(action) },
+    });
+    settleIdempotencyKey(action, response);
 
     const result = await response.json();
 
@@ -132,8 +605,8 @@ async function removeParticipant(activityName, participantEmail) {
         messageDiv.classList.add("hidden");
       }, 3000);
 
-      // Refresh the activities list
-      window.fetchActivities();
+      // Patch the activities list with what changed
+      window.syncActivities();
     } else {
       alert(result.detail || "Failed to remove participant");
     }
@@ -0,0 +1,541 @@
+"""
+Activity storage backends
+
+Pluggable persistence for the activity store. ``MemoryStorage`` keeps
+nothing, which is the original behavior. ``WALStorage`` appends every
+mutation to a write-ahead log and periodically compacts it into a snapshot,
+so a restart only has to replay the log written since the last snapshot.
+``SQLiteStorage`` keeps the log in a SQLite database that several worker
+processes share, each replaying the others' records into its own store.
+
+Besides the blocking ``sync()``, every backend has an awaitable
+``synced()`` so async request handlers can wait for durability without
+holding a thread, and a ``blocking`` flag telling the store whether
+``transaction()`` and ``append()`` can wait on I/O and so must be kept off
+the event loop.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# How WAL appends reach the disk:
+#   always - fsync every request's record before it returns
+#   group  - concurrent requests share one fsync (group commit)
+#   async  - fsync in the background; a crash can lose the last interval
+DURABILITY_MODES = ("always", "group", "async")
+
+# Records appended before the store compacts the log into a snapshot
+SNAPSHOT_EVERY = 10_000
+
+# Seconds between background fsyncs in "async" mode
+ASYNC_FLUSH_INTERVAL = 0.05
+
+# Seconds a shared-database writer waits for another process's transaction
+SQLITE_BUSY_TIMEOUT = 30
+
+
+class MemoryStorage:
+    """No persistence: state lives and dies with the process"""
+
+    # Whether other processes write to the same state
+    shared = False
+    # Whether transaction() or append() can wait on I/O
+    blocking = False
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+    def load(self):
+        return None
+
+    def append(self, record):
+        return None
+
+    def sync(self, ticket):
+        pass
+
+    async def synced(self, ticket):
+        pass
+
+    def wants_snapshot(self):
+        return False
+
+    def rotate(self):
+        return None
+
+    def write_snapshot(self, checkpoint, state):
+        pass
+
+    def close(self):
+        pass
+
+
+class WALStorage:
+    """Append-only JSON-lines log plus compacted snapshots in a directory
+
+    Every record gets a log sequence number (LSN). A snapshot stores the
+    full state together with the LSN it covers; on startup the snapshot is
+    loaded and only log records with a higher LSN are replayed.
+
+    Compaction is two-phase: ``rotate()`` moves the live log aside while the
+    store is quiesced, then ``write_snapshot()`` atomically replaces the
+    snapshot and drops the rotated log. A crash in between is recovered on
+    the next ``load()`` by replaying both logs.
+
+    In "group" mode, ``synced()`` hands waiting coroutines to a committer
+    thread that fsyncs whenever anyone is waiting, so every request that
+    arrives during one fsync is covered by the next one.
+    """
+
+    shared = False
+
+    def __init__(self, directory, durability="group", snapshot_every=SNAPSHOT_EVERY,
+                 flush_interval=ASYNC_FLUSH_INTERVAL):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability!r}, expected one of {DURABILITY_MODES}")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.durability = durability
+        # append() only buffers; fsyncs happen in sync()/synced(), after the
+        # store has released its locks
+        self.blocking = False
+        self.snapshot_every = snapshot_every
+        self._wal_path = self.directory / "wal.log"
+        self._rotated_path = self.directory / "wal.rotated.log"
+        self._snapshot_path = self.directory / "snapshot.json"
+
+        self._file = None
+        self._lsn = 0
+        self._since_snapshot = 0
+        self._recovering = False
+        self._write_lock = threading.Lock()
+
+        # Group commit: one waiter at a time fsyncs on behalf of everyone
+        self._synced = 0
+        self._syncing = False
+        self._sync_cond = threading.Condition()
+        # (ticket, loop, future) of coroutines waiting in synced()
+        self._waiters = []
+        self._committer = None
+
+        self._flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+    def load(self):
+        """Open the log and return the persisted state, or None if empty
+
+        The state is a dict with the snapshot's ``version``, ``activities``
+        and ``waitlists`` plus the ``records`` to replay on top of it.
+        """
+        snapshot = None
+        if self._snapshot_path.exists():
+            snapshot = json.loads(self._snapshot_path.read_text(encoding="utf-8"))
+        snapshot_lsn = snapshot["lsn"] if snapshot else 0
+
+        records = []
+        self._recovering = self._rotated_path.exists()
+        for path in (self._rotated_path, self._wal_path):
+            records.extend(r for r in self._read_log(path) if r["lsn"] > snapshot_lsn)
+
+        self._lsn = max([snapshot_lsn] + [r["lsn"] for r in records])
+        self._synced = self._lsn
+        self._since_snapshot = len(records)
+        self._file = open(self._wal_path, "ab")
+
+        if self.durability == "async":
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+        if snapshot is None and not records:
+            return None
+        return {
+            "version": snapshot["version"] if snapshot else 0,
+            "activities": snapshot["activities"] if snapshot else {},
+            "waitlists": snapshot["waitlists"] if snapshot else {},
+            "records": records,
+        }
+
+    def append(self, record):
+        """Write a record to the log and return its LSN as the commit ticket"""
+        with self._write_lock:
+            self._lsn += 1
+            line = json.dumps({"lsn": self._lsn, **record}, ensure_ascii=False, separators=(",", ":"))
+            self._file.write(line.encode("utf-8") + b"\n")
+            self._since_snapshot += 1
+            return self._lsn
+
+    def sync(self, ticket):
+        """Block until the record with LSN ``ticket`` is on disk
+
+        In "always" mode every caller fsyncs for itself. In "group" mode
+        whoever finds no fsync in progress flushes everything written so
+        far, and the rest piggyback on it. "async" mode doesn't wait.
+        """
+        if ticket is None or self.durability == "async":
+            return
+        if self.durability == "always":
+            if self._synced < ticket:
+                synced = self._flush()
+                with self._sync_cond:
+                    self._synced = max(self._synced, synced)
+            return
+
+        with self._sync_cond:
+            while self._synced < ticket:
+                if self._syncing:
+                    self._sync_cond.wait()
+                    continue
+                self._syncing = True
+                self._sync_cond.release()
+                try:
+                    synced = self._flush()
+                finally:
+                    self._sync_cond.acquire()
+                    self._syncing = False
+                    self._sync_cond.notify_all()
+                self._synced = max(self._synced, synced)
+
+    async def synced(self, ticket):
+        """Wait until the record with LSN ``ticket`` is on disk, without
+        blocking the event loop ("async" mode doesn't wait)"""
+        if ticket is None or self.durability == "async":
+            return
+        if self.durability == "always":
+            await asyncio.to_thread(self.sync, ticket)
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._sync_cond:
+            if self._synced >= ticket:
+                return
+            self._waiters.append((ticket, loop, future))
+            if self._committer is None:
+                self._committer = threading.Thread(target=self._commit_waiters, daemon=True)
+                self._committer.start()
+            self._sync_cond.notify_all()
+        await future
+
+    def wants_snapshot(self):
+        """Whether enough log has accumulated to be worth compacting"""
+        return self._recovering or self._since_snapshot >= self.snapshot_every
+
+    def rotate(self):
+        """Move the live log aside and return the LSN a snapshot must cover
+
+        Must be called while no mutations are in flight.
+        """
+        with self._write_lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            if self._rotated_path.exists():
+                # Left over from an interrupted compaction: keep its records
+                with open(self._rotated_path, "ab") as rotated:
+                    rotated.write(self._wal_path.read_bytes())
+                self._wal_path.unlink()
+            else:
+                os.replace(self._wal_path, self._rotated_path)
+            self._file = open(self._wal_path, "ab")
+            self._synced = self._lsn
+            self._since_snapshot = 0
+            return self._lsn
+
+    def write_snapshot(self, checkpoint, state):
+        """Atomically persist ``state`` as of LSN ``checkpoint``"""
+        tmp_path = self._snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"lsn": checkpoint, **state}, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        self._fsync_directory()
+        self._rotated_path.unlink(missing_ok=True)
+        self._recovering = False
+
+    def close(self):
+        """Flush outstanding records and close the log"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._committer is not None:
+            with self._sync_cond:
+                self._sync_cond.notify_all()
+            self._committer.join()
+        if self._file is not None:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def _flush(self):
+        with self._write_lock:
+            file = self._file
+            file.flush()
+            lsn = self._lsn
+        try:
+            os.fsync(file.fileno())
+        except ValueError:
+            # Closed by rotate(), which already fsynced everything up to lsn
+            pass
+        return lsn
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self._flush_interval):
+            self._flush()
+
+    def _commit_waiters(self):
+        # Group commit for synced(): fsync on behalf of every waiting
+        # coroutine, taking turns with threads fsyncing in sync()
+        with self._sync_cond:
+            while True:
+                pending = []
+                for waiter in self._waiters:
+                    if waiter[0] <= self._synced:
+                        _resolve(waiter[1], waiter[2])
+                    else:
+                        pending.append(waiter)
+                self._waiters = pending
+                if not pending and self._stop.is_set():
+                    return
+                if not pending or self._syncing:
+                    self._sync_cond.wait()
+                    continue
+
+                self._syncing = True
+                self._sync_cond.release()
+                try:
+                    synced = self._flush()
+                finally:
+                    self._sync_cond.acquire()
+                    self._syncing = False
+                    self._sync_cond.notify_all()
+                self._synced = max(self._synced, synced)
+
+    def _fsync_directory(self):
+        if os.name == "nt":
+            return
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _read_log(self, path):
+        if not path.exists():
+            return []
+
+        records = []
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+
+        # Drop a torn record left by a crash mid-write, so appends stay valid
+        if valid_bytes != path.stat().st_size:
+            with open(path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return records
+
+
+class SQLiteStorage:
+    """Log and snapshot in a SQLite database shared by worker processes
+
+    Every process keeps its own in-memory store and this backend is how they
+    agree. Mutations run inside ``transaction()``, which takes SQLite's
+    write lock (``BEGIN IMMEDIATE``) so only one process mutates at a time;
+    the store first replays records other processes committed (``poll()``),
+    then validates and appends its own. ``PRAGMA data_version`` tells cheaply
+    whether anyone else has committed since the last poll.
+
+    Compaction stores a snapshot row and prunes log records older than
+    ``snapshot_every`` records before it. A process that falls further
+    behind than that gets None from ``poll()`` and reloads from ``load()``.
+    """
+
+    shared = True
+    blocking = True
+
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY):
+        self.path = Path(path)
+        self.snapshot_every = snapshot_every
+        # Serializes use of the connection; held for a whole transaction
+        self.lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS log (lsn INTEGER PRIMARY KEY AUTOINCREMENT, record TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot (id INTEGER PRIMARY KEY CHECK (id = 1), "
+            "lsn INTEGER NOT NULL, pruned INTEGER NOT NULL, state TEXT NOT NULL)")
+
+        self._depth = 0
+        self._dirty = False
+        self._diverged = False
+        self._position = 0
+        self._data_version = None
+        self._since_snapshot = 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Hold the cross-process write lock; nested calls join the outer one"""
+        with self.lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._depth, self._dirty = 1, False
+            try:
+                yield
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Records already applied in memory were not committed, even
+                # when COMMIT itself failed (SQLITE_BUSY, SQLITE_IOERR)
+                self._diverged = self._dirty
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._depth = 0
+
+    def load(self):
+        """Return the shared state (same shape as ``WALStorage.load()``) or None"""
+        with self.lock:
+            row = self._conn.execute("SELECT lsn, state FROM snapshot WHERE id = 1").fetchone()
+            snapshot_lsn, snapshot = (row[0], json.loads(row[1])) if row else (0, None)
+            records = self._records_after(snapshot_lsn)
+
+            self._position = records[-1]["lsn"] if records else snapshot_lsn
+            self._data_version = self._current_data_version()
+            self._diverged = False
+            if snapshot is None and not records:
+                return None
+            return {
+                "version": snapshot["version"] if snapshot else 0,
+                "activities": snapshot["activities"] if snapshot else {},
+                "waitlists": snapshot["waitlists"] if snapshot else {},
+                "records": records,
+            }
+
+    def poll(self):
+        """Return records committed by other processes since the last call
+
+        Returns None when they can no longer be replayed (pruned by a
+        compaction, or this process's own transaction was rolled back) and
+        the caller must reload the whole state.
+        """
+        with self.lock:
+            if self._diverged:
+                return None
+            data_version = self._current_data_version()
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+
+            row = self._conn.execute("SELECT pruned FROM snapshot WHERE id = 1").fetchone()
+            if row and row[0] > self._position:
+                return None
+            records = self._records_after(self._position)
+            if records:
+                self._position = records[-1]["lsn"]
+            return records
+
+    def append(self, record):
+        """Insert a record in the open transaction and return its LSN"""
+        if not self._depth:
+            raise RuntimeError("SQLiteStorage.append() needs an open transaction")
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        self._position = self._conn.execute("INSERT INTO log (record) VALUES (?)", (line,)).lastrowid
+        self._dirty = True
+        self._since_snapshot += 1
+        return self._position
+
+    def sync(self, ticket):
+        # Records are durable once their transaction commits
+        pass
+
+    async def synced(self, ticket):
+        pass
+
+    def wants_snapshot(self):
+        return self._since_snapshot >= self.snapshot_every
+
+    def rotate(self):
+        """Return the LSN the store's current state reflects"""
+        self._since_snapshot = 0
+        return self._position
+
+    def write_snapshot(self, checkpoint, state):
+        """Store ``state`` as of LSN ``checkpoint`` and prune the log behind it"""
+        with self.transaction():
+            row = self._conn.execute("SELECT lsn FROM snapshot WHERE id = 1").fetchone()
+            if row and row[0] >= checkpoint:
+                return
+            pruned = max(0, checkpoint - self.snapshot_every)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshot (id, lsn, pruned, state) VALUES (1, ?, ?, ?)",
+                (checkpoint, pruned, json.dumps(state, ensure_ascii=False, separators=(",", ":"))))
+            self._conn.execute("DELETE FROM log WHERE lsn <= ?", (pruned,))
+
+    def close(self):
+        with self.lock:
+            self._conn.close()
+
+    def _current_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _records_after(self, lsn):
+        rows = self._conn.execute("SELECT lsn, record FROM log WHERE lsn > ? ORDER BY lsn", (lsn,))
+        return [{"lsn": row_lsn, **json.loads(record)} for row_lsn, record in rows]
+
+
+def _resolve(loop, future):
+    # Wake a coroutine waiting in synced() from another thread
+    def wake():
+        if not future.done():
+            future.set_result(None)
+    try:
+        loop.call_soon_threadsafe(wake)
+    except RuntimeError:
+        # Its event loop has already been closed
+        pass
+
+
+def open_storage(data_dir=None, durability=None, database=None):
+    """Build the storage backend from arguments or the environment
+
+    ``ACTIVITIES_DB`` names a SQLite database shared by every worker process
+    (for ``uvicorn --workers N``). Otherwise ``ACTIVITIES_DATA_DIR`` enables
+    the write-ahead log in that directory and ``ACTIVITIES_DURABILITY`` picks
+    the durability mode (default "group"). Without either everything stays
+    in memory.
+    """
+    database = database or os.environ.get("ACTIVITIES_DB")
+    if database:
+        return SQLiteStorage(database)
+    data_dir = data_dir or os.environ.get("ACTIVITIES_DATA_DIR")
+    if not data_dir:
+        return MemoryStorage()
+    durability = durability or os.environ.get("ACTIVITIES_DURABILITY", "group")
+    return WALStorage(data_dir, durability=durability)
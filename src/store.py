@@ -0,0 +1,1459 @@
+"""
+Activity store
+
+Keeps the extracurricular activities catalog in memory together with the
+indexes the API needs to answer membership questions in constant time.
+Activities are compact ``Activity`` records whose participants are stored
+as arrays of interned integer IDs rather than lists of email strings.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import copy
+import functools
+import hashlib
+import itertools
+import struct
+import threading
+from array import array
+from collections import deque, namedtuple
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+from src.reports import Reports
+from src.schedule import Timetable, overlaps, parse_days, parse_intervals
+from src.search import SearchIndex
+from src.serialization import dumps
+from src.storage import MemoryStorage
+
+# Number of locks guarding the email -> activities reverse index
+INDEX_LOCK_STRIPES = 64
+
+# Number of recent participant changes kept for /activities/changes
+CHANGE_LOG_SIZE = 1024
+
+# Participant sets larger than this also keep a hash set of IDs, so
+# membership stays O(1); smaller ones just scan their array
+PARTICIPANT_SET_THRESHOLD = 128
+
+# Seconds between checks for other processes' writes with shared storage
+SHARED_POLL_INTERVAL = 0.05
+
+# Threads running event-loop calls that may block on storage I/O or that
+# rebuild large results; mutations only hold one for their critical section,
+# durability is awaited without a thread
+STORAGE_EXECUTOR_WORKERS = 4
+
+
+# Serialized /activities payload for a given store version
+Snapshot = namedtuple("Snapshot", ["version", "body", "etag"])
+
+
+class StoreError(Exception):
+    """Base class for signup/unregister failures, carrying an HTTP status"""
+
+    status_code = 400
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class ActivityNotFound(StoreError):
+    status_code = 404
+
+
+class ActivityFull(StoreError):
+    status_code = 409
+
+
+class ScheduleConflict(StoreError):
+    status_code = 409
+
+
+class SearchNotReady(StoreError):
+    status_code = 503
+    headers = {"Retry-After": "1"}
+
+
+class ReportsNotReady(StoreError):
+    status_code = 503
+    headers = {"Retry-After": "1"}
+
+
+class EmailRegistry:
+    """Interns participant emails as small integer IDs
+
+    Each distinct email is stored once, however many activities, waitlists
+    and indexes refer to it. IDs are never reused.
+    """
+
+    __slots__ = ("_ids", "_emails", "_lock")
+
+    def __init__(self):
+        self._ids = {}
+        self._emails = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._emails)
+
+    def intern(self, email):
+        """Return the ID for an email, assigning one if it is new"""
+        member = self._ids.get(email)
+        if member is None:
+            with self._lock:
+                member = self._ids.get(email)
+                if member is None:
+                    member = len(self._emails)
+                    self._emails.append(email)
+                    self._ids[email] = member
+        return member
+
+    def lookup(self, email):
+        """Return the ID for an email, or None if it was never interned"""
+        return self._ids.get(email)
+
+    def email(self, member):
+        """Return the canonical email string for an ID"""
+        return self._emails[member]
+
+    def emails(self, members):
+        """Return the emails for a sequence of IDs, in order"""
+        return list(map(self._emails.__getitem__, members))
+
+
+# Process-wide intern table shared by every participant set
+EMAILS = EmailRegistry()
+
+_ID = struct.Struct("=I")
+
+# Fills the slot of a removed participant; never an interned ID
+_TOMBSTONE = 2 ** 32 - 1
+
+
+class ParticipantSet:
+    """Insertion-ordered set of participant emails
+
+    Stores interned email IDs in an ``array`` (4 bytes per participant), so
+    iteration follows signup order, which is what the /activities payload
+    shows. Small sets answer membership by scanning the array at memchr
+    speed. Past ``PARTICIPANT_SET_THRESHOLD`` members a dict of ID -> slot
+    is kept alongside, so checks and removals stay O(1): a removed member's
+    slot is overwritten with a tombstone, and the array is compacted once
+    tombstones make up half of it.
+    """
+
+    __slots__ = ("_ids", "_slots", "_dead")
+
+    def __init__(self, emails=()):
+        self._slots = None
+        self._dead = 0
+        if isinstance(emails, ParticipantSet):
+            self._ids = array("I", emails._live())
+        else:
+            self._ids = array("I")
+            for email in emails:
+                self.add(email)
+            return
+        self._index_if_large()
+
+    def __contains__(self, email):
+        member = EMAILS.lookup(email)
+        return member is not None and self._has(member)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __len__(self):
+        return len(self._ids) - self._dead
+
+    def __eq__(self, other):
+        if isinstance(other, ParticipantSet):
+            return self._live() == other._live()
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ParticipantSet({self.to_list()!r})"
+
+    def add(self, email):
+        """Append an email, keeping its original position if already present"""
+        member = EMAILS.intern(email)
+        if self._has(member):
+            return
+        self._ids.append(member)
+        if self._slots is not None:
+            self._slots[member] = len(self._ids) - 1
+        else:
+            self._index_if_large()
+
+    def remove(self, email):
+        """Remove an email, raising KeyError if it is not a participant"""
+        member = EMAILS.lookup(email)
+        if member is None:
+            raise KeyError(email)
+        if self._slots is None:
+            position = self._find(member)
+            if position < 0:
+                raise KeyError(email)
+            del self._ids[position]
+            return
+
+        position = self._slots.pop(member, None)
+        if position is None:
+            raise KeyError(email)
+        self._ids[position] = _TOMBSTONE
+        self._dead += 1
+        # Trailing tombstones can simply go; others wait for a compaction
+        while self._ids and self._ids[-1] == _TOMBSTONE:
+            self._ids.pop()
+            self._dead -= 1
+        if self._dead * 2 > len(self._ids):
+            self._compact()
+
+    def to_list(self):
+        """Return the participants in signup order"""
+        return EMAILS.emails(self._live())
+
+    def _live(self):
+        if not self._dead:
+            return self._ids
+        return array("I", [member for member in self._ids if member != _TOMBSTONE])
+
+    def _has(self, member):
+        if self._slots is not None:
+            return member in self._slots
+        return self._find(member) >= 0
+
+    def _find(self, member):
+        # Byte search over the array, skipping matches that straddle items
+        data = self._ids.tobytes()
+        needle = _ID.pack(member)
+        position = data.find(needle)
+        while position > 0 and position % _ID.size:
+            position = data.find(needle, position + 1)
+        return position // _ID.size if position >= 0 else -1
+
+    def _index_if_large(self):
+        if len(self._ids) > PARTICIPANT_SET_THRESHOLD:
+            self._slots = {member: slot for slot, member in enumerate(self._ids)}
+
+    def _compact(self):
+        self._ids = self._live()
+        self._dead = 0
+        self._slots = {member: slot for slot, member in enumerate(self._ids)}
+
+
+class Waitlist:
+    """First-come, first-served queue of interned emails
+
+    Every arrival gets a ticket one past the last, held in ``_tickets``, and
+    its ID is appended to a deque whose front has ticket ``_head``. Adding,
+    taking the head and checking membership are O(1). Removing someone
+    further back only drops their ticket: the deque entry goes stale and is
+    discarded when it reaches the front, and the ticket is kept in the
+    sorted ``_gaps``. A position is the distance from the head less the
+    gaps ahead of it, so it is O(1) until people leave from the middle and
+    a bisect over those gaps after that.
+    """
+
+    __slots__ = ("_queue", "_tickets", "_head", "_gaps")
+
+    def __init__(self, emails=()):
+        self._queue = deque()
+        self._tickets = {}
+        self._head = 0
+        self._gaps = []
+        for email in emails:
+            self.add(email)
+
+    def __contains__(self, email):
+        member = EMAILS.lookup(email)
+        return member is not None and member in self._tickets
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __repr__(self):
+        return f"Waitlist({self.to_list()!r})"
+
+    def add(self, email):
+        """Queue an email at the back, keeping its place if already queued"""
+        member = EMAILS.intern(email)
+        if member in self._tickets:
+            return
+        self._tickets[member] = self._head + len(self._queue)
+        self._queue.append(member)
+
+    def remove(self, email):
+        """Take an email out of the queue, raising KeyError if it is not queued"""
+        member = EMAILS.lookup(email)
+        ticket = None if member is None else self._tickets.pop(member, None)
+        if ticket is None:
+            raise KeyError(email)
+        bisect.insort(self._gaps, ticket)
+        # Keep the front entry live, so first() and position() stay O(1)
+        while self._gaps and self._gaps[0] == self._head:
+            self._queue.popleft()
+            self._head += 1
+            del self._gaps[0]
+        if len(self._gaps) > max(len(self._tickets), PARTICIPANT_SET_THRESHOLD):
+            self._renumber()
+
+    def first(self):
+        """Return the email at the front, or None if the queue is empty"""
+        return EMAILS.email(self._queue[0]) if self._tickets else None
+
+    def position(self, email):
+        """Return an email's place in the queue, counting from 1, or None"""
+        member = EMAILS.lookup(email)
+        ticket = None if member is None else self._tickets.get(member)
+        if ticket is None:
+            return None
+        return ticket - self._head + 1 - bisect.bisect_left(self._gaps, ticket)
+
+    def to_list(self):
+        """Return the queued emails in arrival order"""
+        return EMAILS.emails(self._live())
+
+    def _live(self):
+        tickets, head = self._tickets, self._head
+        return [member for offset, member in enumerate(self._queue) if tickets.get(member) == head + offset]
+
+    def _renumber(self):
+        # Drop the stale entries once they outnumber the queue
+        live = self._live()
+        self._queue = deque(live)
+        self._tickets = {member: self._head + offset for offset, member in enumerate(live)}
+        self._gaps = []
+
+
+# Marks a field an activity was created without
+_MISSING = object()
+
+
+class Activity(MutableMapping):
+    """One activity's details as a slotted record
+
+    Still reads and writes like the dict the API used to keep
+    (``activity["participants"]``, ``{**activity}``), but the common fields
+    live in slots and participants in a ``ParticipantSet``. Any other keys
+    are kept in ``extra``. Missing fields stay missing, so ``to_dict()``
+    gives back exactly the shape the activity was created with.
+    """
+
+    __slots__ = ("description", "schedule", "max_participants", "participants", "extra")
+
+    FIELDS = ("description", "schedule", "max_participants")
+
+    def __init__(self, details):
+        for field in self.FIELDS:
+            setattr(self, field, details.get(field, _MISSING))
+        self.participants = ParticipantSet(details.get("participants", ()))
+        extra = {key: value for key, value in details.items()
+                 if key not in self.FIELDS and key != "participants"}
+        self.extra = extra or None
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif key == "participants":
+            return self.participants
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif key == "participants":
+            self.participants = ParticipantSet(value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        self[key]  # Raise KeyError for absent keys
+        if key in self.FIELDS:
+            setattr(self, key, _MISSING)
+        elif key == "participants":
+            raise KeyError("participants can't be removed")
+        else:
+            del self.extra[key]
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        yield "participants"
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Activity({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Return the activity as plain JSON-serializable data"""
+        data = {key: self[key] for key in self}
+        data["participants"] = self.participants.to_list()
+        return data
+
+
+class ActivityStore(MutableMapping):
+    """Mapping of activity name to activity details
+
+    Behaves like the plain dict the API used to keep, but every activity's
+    ``participants`` is stored as a ``ParticipantSet`` and a reverse index of
+    email -> activity names is maintained alongside it. Activities assigned
+    with plain lists of participants are converted on the way in.
+
+    Mutations are serialized per activity: each activity has its own lock, so
+    the capacity check and the insert happen atomically without blocking
+    signups for unrelated activities. The reverse index is guarded by a
+    striped set of locks keyed by email.
+
+    Every mutation made through the store bumps ``version``; ``snapshot()``
+    uses it to re-serialize the catalog only when something changed. Edits
+    made directly to an activity's nested dict bypass this, so call
+    ``touch()`` after them.
+
+    Participant changes are also appended to a bounded change log so clients
+    can catch up with ``changes_since()``. Anything that is not a single
+    signup or unregister (adding, replacing or deleting activities, or a
+    ``touch()``) empties the log, forcing clients to resync.
+
+    Listeners registered with ``add_listener()`` receive each logged change
+    (or a ``{"op": "resync"}`` notice) synchronously and in version order,
+    so they must be quick and must not call back into the store.
+
+    Students queued on a full activity's waitlist are promoted in arrival
+    order, under the activity lock, as soon as an unregister frees a seat;
+    the promotion is logged as their signup. It does not check schedule
+    conflicts, since the student chose to queue.
+
+    Each activity's schedule is parsed into weekly intervals when it is
+    stored. A student's ``Timetable`` of the intervals they are enrolled in
+    is built from the reverse index the first time it is needed (a signup's
+    conflict check or ``timetable_for()``) and kept current from then on.
+    Signups that would overlap one of the student's activities are rejected
+    unless conflicts are explicitly allowed.
+
+    Names, descriptions and schedules are also kept in a ``SearchIndex``,
+    updated as activities are stored and removed, for ``search()``, and
+    the same changes keep the aggregates behind ``reports`` current.
+    Direct edits to an activity's nested dict reach neither. Both are built
+    in one pass once the catalog is loaded; with ``defer_indexes`` they are
+    left for ``build_indexes()`` so a large store can start serving first,
+    and ``search()`` and ``reports`` raise ``SearchNotReady`` and
+    ``ReportsNotReady`` until then.
+
+    Every mutation is also appended to ``storage`` (see ``src/storage.py``)
+    while its activity lock is held, and the call returns once the storage
+    backend considers the record durable. When the backend already holds
+    state, it is restored and ``activities`` (the seed data) is ignored.
+
+    With a ``shared`` backend (``SQLiteStorage``) other processes mutate the
+    same state. Each mutation then runs in a storage transaction that first
+    replays their records, and reads catch up the same way, so every worker
+    sees the others' writes. A background thread also polls for them so
+    listeners hear about changes made elsewhere.
+
+    Async callers use ``enroll_async()``, ``withdraw_async()``,
+    ``read_async()`` and ``snapshot_async()``. They run on the event loop
+    when the storage can't block and otherwise in a small bounded executor,
+    and they await durability with the backend's ``synced()`` instead of
+    holding a thread while an fsync is in flight. Snapshot rebuilds, and
+    reads passed to ``read_async()`` with ``offload`` because their cost
+    grows with the catalog, always go to the executor.
+    """
+
+    def __init__(self, activities=None, change_log_size=CHANGE_LOG_SIZE, storage=None, defer_indexes=False):
+        self._activities = {}
+        # The per-student indexes (_enrollments, _waitlisted, _timetables)
+        # are keyed by interned email ID, like the participant sets.
+        # Email ID -> tuple of the names of the activities the student is in;
+        # students take a handful, where a tuple is a third the size of a set
+        # and as quick to scan
+        self._enrollments = {}
+        self._waitlists = {}
+        # Email ID -> names of the activities whose waitlist they are on,
+        # guarded like _enrollments by the student's index lock
+        self._waitlisted = {}
+        self._locks = {}
+        # Catalog order for cursor pagination: (sequence, name) pairs in
+        # insertion order; entries whose sequence no longer matches _seq are
+        # stale and skipped
+        self._order = []
+        self._seq = {}
+        self._next_seq = itertools.count(1)
+        self._days = {}
+        self._intervals = {}
+        # name -> the activity's (start, end, name) timetable entries, one
+        # tuple per meeting shared by every enrolled student's Timetable
+        self._meetings = {}
+        # Only students whose timetable has been needed since startup
+        # (see _timetable()); restoring a large catalog builds none
+        self._timetables = {}
+        self._activity_versions = {}
+        # Built in one pass once the catalog is loaded (build_indexes())
+        self._search = None
+        self._search_lock = threading.Lock()
+        self._reports = None
+        self._index_locks = [threading.Lock() for _ in range(INDEX_LOCK_STRIPES)]
+        self._version = 0
+        self._version_lock = threading.Lock()
+        self._changes = deque(maxlen=change_log_size)
+        self._listeners = []
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+        self._structure_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._storage = storage or MemoryStorage()
+        self._executor = None
+
+        # Shared storage serializes seeding, so only the first process seeds
+        with self._storage.transaction():
+            state = self._storage.load()
+            if state is not None:
+                self._restore(state)
+            elif activities:
+                self.update(activities)
+        if self._storage.wants_snapshot():
+            self.compact()
+        if not defer_indexes:
+            self.build_indexes()
+
+        self._stop = threading.Event()
+        self._poller = None
+        if self._storage.shared:
+            self._poller = threading.Thread(target=self._poll_periodically, daemon=True)
+            self._poller.start()
+
+    def __getitem__(self, name):
+        return self._activities[name]
+
+    def __setitem__(self, name, details):
+        record = Activity(details)
+
+        with self._transaction(), self._structure_lock, self._locks.setdefault(name, threading.Lock()):
+            self._put(name, record)
+            version = self.touch()
+            ticket = self._storage.append(
+                {"version": version, "op": "put", "activity": name, "details": record.to_dict()}
+            )
+        self._committed(ticket)
+
+    def __delitem__(self, name):
+        with self._transaction(), self._structure_lock, self._locks.get(name) or threading.Lock():
+            if not self._remove_activity(name):
+                raise KeyError(name)
+            version = self.touch()
+            ticket = self._storage.append({"version": version, "op": "delete", "activity": name})
+        self._committed(ticket)
+
+    def __contains__(self, name):
+        return name in self._activities
+
+    def __iter__(self):
+        return iter(self._activities)
+
+    def __len__(self):
+        return len(self._activities)
+
+    def __deepcopy__(self, memo):
+        # Copies come out as plain data so they can be fed back via update()
+        return copy.deepcopy(self.to_dict(), memo)
+
+    def enroll(self, name, email, waitlist=False, allow_conflicts=False):
+        """Atomically sign a student up for an activity
+
+        Returns ``"enrolled"``, or ``"waitlisted"`` when the activity is full
+        and ``waitlist`` is set. Raises ``ScheduleConflict`` if the activity
+        overlaps one the student is already in, unless ``allow_conflicts``
+        is set, and a ``StoreError`` for the other failures.
+        """
+        result, ticket = self._enroll(name, email, waitlist, allow_conflicts)
+        self._committed(ticket)
+        return result
+
+    async def enroll_async(self, name, email, waitlist=False, allow_conflicts=False):
+        """``enroll()`` for the event loop, awaiting durability"""
+        result, ticket = await self._offload(self._storage.blocking, self._enroll,
+                                             name, email, waitlist, allow_conflicts)
+        await self._committed_async(ticket)
+        return result
+
+    def withdraw(self, name, email):
+        """Atomically remove a student from an activity or its waitlist
+
+        Returns ``"unregistered"`` or ``"unwaitlisted"``.
+        """
+        result, ticket = self._withdraw(name, email)
+        self._committed(ticket)
+        return result
+
+    async def withdraw_async(self, name, email):
+        """``withdraw()`` for the event loop, awaiting durability"""
+        result, ticket = await self._offload(self._storage.blocking, self._withdraw, name, email)
+        await self._committed_async(ticket)
+        return result
+
+    async def read_async(self, method, *args, offload=False):
+        """Call a read method such as ``query()`` from the event loop
+
+        With shared storage reads first catch up with other processes,
+        which is database I/O, so they run in the executor. So do reads
+        made with ``offload`` set, whose cost grows with the catalog, so
+        that they don't stall every other request on the loop.
+        """
+        return await self._offload(offload or self._storage.shared, method, *args)
+
+    async def snapshot_async(self):
+        """``snapshot()`` for the event loop
+
+        A current cached snapshot is returned inline; rebuilding one
+        serializes the whole catalog, so that runs in the executor.
+        """
+        cached = self._snapshot
+        if not self._storage.shared and cached is not None and cached.version == self._version:
+            return cached
+        return await self._offload(True, self.snapshot)
+
+    def apply_batch(self, operations, atomic=False):
+        """Apply many ``(op, activity, email)`` operations in one pass
+
+        ``op`` is "signup" or "unregister", validated exactly like
+        ``enroll()`` and ``withdraw()``. Every involved activity is locked
+        up front (in name order) and the batch waits for durability once.
+
+        Returns ``(outcomes, applied)`` with one outcome per operation: the
+        result string, or the ``StoreError`` it failed with. With ``atomic``
+        set, nothing is applied unless every operation would succeed.
+        """
+        with self._transaction():
+            locked = {name: self._locks[name] for name in sorted({op[1] for op in operations})
+                      if name in self._locks}
+            for lock in locked.values():
+                lock.acquire()
+            try:
+                if atomic:
+                    outcomes = self._simulate_batch(operations, locked)
+                    if any(isinstance(outcome, StoreError) for outcome in outcomes):
+                        return outcomes, False
+
+                outcomes, tickets = [], []
+                for op, name, email in operations:
+                    try:
+                        if name not in locked:
+                            raise ActivityNotFound("Activity not found")
+                        if op == "signup":
+                            result, ticket = self._enroll_locked(name, email, False, False)
+                        else:
+                            result, ticket = self._withdraw_locked(name, email)
+                    except StoreError as exc:
+                        outcomes.append(exc)
+                        continue
+                    outcomes.append(result)
+                    tickets.append(ticket)
+            finally:
+                for lock in reversed(locked.values()):
+                    lock.release()
+
+        self._committed(max((t for t in tickets if t is not None), default=None))
+        return outcomes, True
+
+    def waitlist(self, name):
+        """Return the waitlisted emails for an activity in arrival order"""
+        self._refresh()
+        with self._lock(name):
+            self._record(name)
+            return self._waitlists[name].to_list()
+
+    def waitlist_position(self, name, email):
+        """Return ``(position, length)`` for a student on an activity's waitlist
+
+        ``position`` counts from 1 at the front; it is 0 once the student has
+        a seat and None if they are neither enrolled nor queued.
+        """
+        self._refresh()
+        with self._lock(name):
+            record = self._record(name)
+            queue = self._waitlists[name]
+            if email in record["participants"]:
+                return 0, len(queue)
+            return queue.position(email), len(queue)
+
+    def activities_for(self, email):
+        """Return the names of the activities a student is signed up for"""
+        self._refresh()
+        with self._index_lock(email):
+            return frozenset(self._enrollments.get(EMAILS.lookup(email), ()))
+
+    def enrollments_for(self, email):
+        """Return ``(enrolled, waitlisted)``: the activities a student is in and queued for
+
+        Read from the reverse indexes, so the cost follows the student's own
+        enrollments rather than the size of the catalog.
+        """
+        self._refresh()
+        with self._index_lock(email):
+            member = EMAILS.lookup(email)
+            return frozenset(self._enrollments.get(member, ())), frozenset(self._waitlisted.get(member, ()))
+
+    def withdraw_everywhere(self, email):
+        """Remove a student from every activity and waitlist they are on
+
+        Returns ``{activity: outcome}`` with "unregistered" or
+        "unwaitlisted" per activity; empty if they were on none. The
+        student's activities come from the reverse indexes and are locked
+        in name order, like ``apply_batch()``, so the work is proportional
+        to their enrollments and the whole removal waits for durability
+        once.
+        """
+        outcomes, ticket = self._withdraw_everywhere(email)
+        self._committed(ticket)
+        return outcomes
+
+    async def withdraw_everywhere_async(self, email):
+        """``withdraw_everywhere()`` for the event loop, awaiting durability"""
+        outcomes, ticket = await self._offload(self._storage.blocking, self._withdraw_everywhere, email)
+        await self._committed_async(ticket)
+        return outcomes
+
+    def conflicts(self, email, name):
+        """Return the student's other activities that overlap ``name``"""
+        self._refresh()
+        with self._index_lock(email):
+            return frozenset(self._clashes(email, name))
+
+    def timetable_for(self, email):
+        """Return a student's ``(start, end, activity)`` intervals in weekly order
+
+        Also returns the activities they are in whose schedule has no
+        recognizable times, as ``(intervals, unscheduled)``.
+        """
+        self._refresh()
+        with self._index_lock(email):
+            member = EMAILS.lookup(email)
+            timetable = self._timetable(member)
+            intervals = list(timetable) if timetable else []
+            names = self._enrollments.get(member, ())
+            unscheduled = sorted(name for name in names if not self._intervals.get(name))
+        return intervals, unscheduled
+
+    @property
+    def version(self):
+        """Monotonically increasing counter of visible catalog changes"""
+        return self._version
+
+    def touch(self):
+        """Record an untracked change to the catalog and return the new version"""
+        with self._version_lock:
+            self._version += 1
+            self._changes.clear()
+            self._notify({"version": self._version, "op": "resync"})
+            return self._version
+
+    def add_listener(self, listener):
+        """Call ``listener(change)`` for every change from now on"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop notifying a listener added with ``add_listener()``"""
+        self._listeners.remove(listener)
+
+    def changes_since(self, since):
+        """Return ``(version, changes)`` for everything after version ``since``
+
+        ``changes`` is None when the log no longer covers ``since`` (the
+        client fell too far behind, or the catalog changed structurally) and
+        the client has to fetch the full catalog again.
+        """
+        self._refresh()
+        with self._version_lock:
+            version = self._version
+            if since == version:
+                return version, []
+            # Logged versions are contiguous, so the log covers `since` exactly
+            # when its first entry is the one right after it
+            if since > version or not self._changes or since < self._changes[0]["version"] - 1:
+                return version, None
+            start = since + 1 - self._changes[0]["version"]
+            return version, list(itertools.islice(self._changes, start, None))
+
+    def snapshot(self):
+        """Return the catalog serialized as JSON bytes with a strong ETag
+
+        The serialized body is cached and rebuilt only once the version has
+        moved on, so repeated reads between mutations cost a dict lookup.
+        """
+        self._refresh()
+        cached = self._snapshot
+        if cached is not None and cached.version == self._version:
+            return cached
+
+        with self._snapshot_lock:
+            cached = self._snapshot
+            # Read the version before serializing: a concurrent mutation then
+            # leaves the cache looking stale rather than wrongly fresh
+            version = self._version
+            if cached is None or cached.version != version:
+                body, etag = encode_payload(self.to_dict())
+                cached = self._snapshot = Snapshot(version, body, etag)
+            return cached
+
+    def to_dict(self):
+        """Return the catalog as plain JSON-serializable data"""
+        snapshot = {}
+        for name in list(self._activities):
+            with self._locks[name]:
+                record = self._activities.get(name)
+                if record is not None:
+                    snapshot[name] = record.to_dict()
+        return snapshot
+
+    def query(self, project, after=0, limit=None, day=None):
+        """Return a page of ``(name, item)`` pairs in catalog order
+
+        Walks the activities after cursor ``after`` (optionally only those
+        meeting on ``day``, 0 = Monday) and calls ``project(name, record,
+        version)`` under each activity's lock, where ``version`` is the last
+        store version that touched it. Activities for which ``project``
+        returns None are skipped. Returns ``(items, cursor)``; ``cursor``
+        resumes after the last item and is None once the catalog is done.
+        """
+        self._refresh()
+        order = self._order
+        position = bisect.bisect_right(order, after, key=itemgetter(0))
+        items, last = [], after
+        while position < len(order) and (limit is None or len(items) < limit):
+            seq, name = order[position]
+            position += 1
+            # Checked without the lock, so an activity being deleted may
+            # have lost its days but not yet its sequence number
+            if self._seq.get(name) != seq or (day is not None and day not in self._days.get(name, ())):
+                continue
+            with self._locks[name]:
+                record = self._activities.get(name)
+                if record is None or self._seq.get(name) != seq:
+                    continue
+                item = project(name, record, self._activity_versions[name])
+            if item is not None:
+                items.append((name, item))
+                last = seq
+        return items, (last if position < len(order) else None)
+
+    def search(self, text, project, limit=20):
+        """Return the best matches for a search as ``(name, score, item)``
+
+        Ranks activities by the words in ``text`` (see ``src/search.py``)
+        and calls ``project(name, record, version)`` for each, as in
+        ``query()``.
+        """
+        self._refresh()
+        # Checked without the lock, which the build holds throughout
+        if self._search is None:
+            raise SearchNotReady("Search is still starting up, try again shortly")
+        with self._search_lock:
+            ranked = self._search.search(text, limit)
+        results = []
+        for name, score in ranked:
+            lock = self._locks.get(name)
+            if lock is None:
+                continue
+            with lock:
+                record = self._activities.get(name)
+                if record is None:
+                    continue
+                item = project(name, record, self._activity_versions[name])
+            if item is not None:
+                results.append((name, score, item))
+        return results
+
+    def build_indexes(self):
+        """Build the search index and the reports; no-op once built
+
+        Runs in the constructor unless ``defer_indexes`` is set, in which
+        case call it (typically from a background thread) once the store is
+        serving.
+        """
+        self.build_search_index()
+        self.build_reports()
+
+    def build_search_index(self):
+        """Index every activity for ``search()``; no-op once built
+
+        Activities stored or removed during the build wait for it and then
+        update the finished index.
+        """
+        with self._search_lock:
+            if self._search is not None:
+                return
+            index = SearchIndex()
+            index.add_many(
+                (name, record.get("description", ""), record.get("schedule", ""))
+                for name, record in list(self._activities.items())
+            )
+            self._search = index
+
+    def build_reports(self):
+        """Compute the aggregates behind ``reports``; no-op once built
+
+        Takes every activity lock (in name order, as ``compact()`` does) for
+        the pass, so no change is counted twice or missed; mutations wait
+        for it and then update the finished aggregates.
+        """
+        if self._reports is not None:
+            return
+        with self._structure_lock:
+            locks = [self._locks[name] for name in sorted(self._locks)]
+            for lock in locks:
+                lock.acquire()
+            try:
+                if self._reports is not None:
+                    return
+                reports = Reports()
+                for name, record in self._activities.items():
+                    reports.activity_added(name, len(record["participants"]), record.get("max_participants"),
+                                           self._intervals[name])
+                for names in self._enrollments.values():
+                    reports.student_changed(0, len(names))
+                self._reports = reports
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+
+    @property
+    def search_ready(self):
+        """Whether the search index has been built"""
+        return self._search is not None
+
+    @property
+    def reports_ready(self):
+        """Whether the reports have been built"""
+        return self._reports is not None
+
+    @property
+    def reports(self):
+        """Aggregates for the ``/reports`` endpoints (see ``src/reports.py``)
+
+        Caught up with other processes first, like every read.
+        """
+        self._refresh()
+        if self._reports is None:
+            raise ReportsNotReady("Reports are still starting up, try again shortly")
+        return self._reports
+
+    def compact(self):
+        """Write a snapshot to storage so its log can be truncated
+
+        Briefly takes every activity lock (in name order, so it can't
+        deadlock with other multi-activity operations) to capture a
+        consistent state; the snapshot itself is written after releasing
+        them. Returns False if another compaction is already running.
+        """
+        if not self._compaction_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._transaction(), self._structure_lock:
+                locks = [self._locks[name] for name in sorted(self._locks)]
+                for lock in locks:
+                    lock.acquire()
+                try:
+                    checkpoint = self._storage.rotate()
+                    state = {
+                        "version": self._version,
+                        "activities": {name: record.to_dict() for name, record in self._activities.items()},
+                        "waitlists": {name: queue.to_list() for name, queue in self._waitlists.items() if queue},
+                    }
+                finally:
+                    for lock in reversed(locks):
+                        lock.release()
+            self._storage.write_snapshot(checkpoint, state)
+            return True
+        finally:
+            self._compaction_lock.release()
+
+    def close(self):
+        """Flush and release the storage backend"""
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._storage.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # Outermost scope of a mutation: with shared storage this holds the
+        # cross-process write lock and catches up with other processes first
+        with self._storage.transaction():
+            self._refresh()
+            yield
+
+    def _refresh(self):
+        # Replay records other processes committed since the last check
+        if not self._storage.shared:
+            return
+        with self._storage.lock:
+            records = self._storage.poll()
+            if records is None:
+                self._reload()
+                return
+            for record in records:
+                self._replay(record)
+
+    def _replay(self, record):
+        op, name = record["op"], record["activity"]
+        if op in ("put", "delete"):
+            with self._structure_lock, self._locks.setdefault(name, threading.Lock()):
+                self._apply(record)
+            with self._version_lock:
+                self._version = record["version"]
+                self._changes.clear()
+                self._notify({"version": self._version, "op": "resync"})
+            return
+
+        lock = self._locks.get(name)
+        if lock is None:
+            return
+        with lock:
+            self._apply(record)
+        if op in ("signup", "unregister"):
+            with self._version_lock:
+                self._version = record["version"]
+                change = {key: record[key] for key in ("version", "op", "activity", "email")}
+                self._activity_versions[name] = self._version
+                self._changes.append(change)
+                self._notify(change)
+
+    def _reload(self):
+        # Replace everything with the storage's current state
+        state = self._storage.load()
+        with self._structure_lock:
+            locks = [self._locks[name] for name in sorted(self._locks)]
+            for lock in locks:
+                lock.acquire()
+            try:
+                for name in list(self._activities):
+                    self._remove_activity(name)
+                if state is not None:
+                    self._restore(state)
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+        with self._version_lock:
+            self._changes.clear()
+            self._notify({"version": self._version, "op": "resync"})
+
+    def _poll_periodically(self):
+        while not self._stop.wait(SHARED_POLL_INTERVAL):
+            try:
+                self._refresh()
+            except Exception:
+                # The database may be briefly unavailable; try again later
+                continue
+
+    async def _offload(self, blocking, function, *args):
+        # Run inline when nothing in the call can wait on I/O
+        if not blocking:
+            return function(*args)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(STORAGE_EXECUTOR_WORKERS, thread_name_prefix="activity-storage")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args))
+
+    def _enroll(self, name, email, waitlist, allow_conflicts):
+        with self._transaction(), self._lock(name):
+            return self._enroll_locked(name, email, waitlist, allow_conflicts)
+
+    def _withdraw(self, name, email):
+        with self._transaction(), self._lock(name):
+            return self._withdraw_locked(name, email)
+
+    def _lock(self, name):
+        lock = self._locks.get(name)
+        if lock is None:
+            raise ActivityNotFound("Activity not found")
+        return lock
+
+    def _record(self, name):
+        # Re-read under the lock: the activity may have been deleted meanwhile
+        record = self._activities.get(name)
+        if record is None:
+            raise ActivityNotFound("Activity not found")
+        return record
+
+    def _put(self, name, record):
+        self._remove_activity(name)
+        self._activities[name] = record
+        self._waitlists[name] = Waitlist()
+        self._days[name] = parse_days(record.get("schedule", ""))
+        self._intervals[name] = parse_intervals(record.get("schedule", ""))
+        self._meetings[name] = tuple((start, end, name) for start, end in self._intervals[name])
+        self._activity_versions[name] = self._version
+        seq = self._seq[name] = next(self._next_seq)
+        self._order.append((seq, name))
+        for email in record["participants"]:
+            self._index(email, name)
+        with self._search_lock:
+            if self._search is not None:
+                self._search.add(name, record.get("description", ""), record.get("schedule", ""))
+        if self._reports is not None:
+            self._reports.activity_added(name, len(record["participants"]), record.get("max_participants"),
+                                         self._intervals[name])
+
+    def _enroll_locked(self, name, email, waitlist, allow_conflicts):
+        record = self._record(name)
+        participants = record["participants"]
+        if email in participants:
+            raise StoreError("Student already signed up for this activity")
+
+        capacity = record.get("max_participants")
+        if capacity is not None and len(participants) >= capacity:
+            if not waitlist:
+                raise ActivityFull("Activity is full")
+            if email in self._waitlists[name]:
+                raise StoreError("Student already on the waitlist for this activity")
+            self._enqueue(name, email)
+            return "waitlisted", self._storage.append({"op": "waitlist", "activity": name, "email": email})
+
+        # Check and index under the student's lock, so two concurrent
+        # signups for overlapping activities can't both pass the check
+        with self._index_lock(email):
+            if not allow_conflicts:
+                clashes = self._clashes(email, name)
+                if clashes:
+                    raise ScheduleConflict(f"Schedule conflicts with {', '.join(sorted(clashes))}")
+            self._add_participant(name, email, indexed=True)
+        return "enrolled", self._log_change("signup", name, email)
+
+    def _withdraw_locked(self, name, email):
+        record = self._record(name)
+        if email in record["participants"]:
+            self._remove_participant(name, email)
+            ticket = self._log_change("unregister", name, email)
+            return "unregistered", self._promote(name, ticket)
+        if email in self._waitlists[name]:
+            self._dequeue(name, email)
+            return "unwaitlisted", self._storage.append({"op": "unwaitlist", "activity": name, "email": email})
+        raise StoreError("Student is not signed up for this activity")
+
+    def _promote(self, name, ticket):
+        # Fill freed seats from the front of the waitlist under the same
+        # activity lock; each promotion is logged (and replayed) as a signup
+        record = self._activities[name]
+        capacity = record.get("max_participants")
+        queue = self._waitlists[name]
+        while queue and (capacity is None or len(record["participants"]) < capacity):
+            email = queue.first()
+            self._add_participant(name, email)
+            ticket = self._log_change("signup", name, email)
+        return ticket
+
+    def _withdraw_everywhere(self, email):
+        with self._transaction():
+            while True:
+                names = self._student_activities(email)
+                locked = {name: self._locks[name] for name in sorted(names) if name in self._locks}
+                for lock in locked.values():
+                    lock.acquire()
+                try:
+                    # A signup may have slipped in between the lookup and
+                    # the locks; start over until the locks cover them all
+                    if not self._student_activities(email) <= locked.keys():
+                        continue
+                    outcomes, tickets = {}, []
+                    for name in locked:
+                        try:
+                            outcomes[name], ticket = self._withdraw_locked(name, email)
+                        except StoreError:
+                            # Deleted, or already left, before we got the lock
+                            continue
+                        tickets.append(ticket)
+                    return outcomes, max((t for t in tickets if t is not None), default=None)
+                finally:
+                    for lock in reversed(locked.values()):
+                        lock.release()
+
+    def _student_activities(self, email):
+        with self._index_lock(email):
+            member = EMAILS.lookup(email)
+            return set(self._enrollments.get(member, ())) | self._waitlisted.get(member, set())
+
+    def _simulate_batch(self, operations, locked):
+        # Dry run of apply_batch() against the locked state, tracking the
+        # batch's own effects instead of touching the activities
+        joined, left, unwaitlisted, counts = set(), set(), set(), {}
+        joined_by, left_by = {}, {}
+        # Waitlists still to be promoted from, copied on first use
+        queues = {}
+        outcomes = []
+        for op, name, email in operations:
+            record = self._activities.get(name) if name in locked else None
+            if record is None:
+                outcomes.append(ActivityNotFound("Activity not found"))
+                continue
+
+            key = (name, email)
+            present = key in joined or (email in record["participants"] and key not in left)
+            count = counts.get(name, len(record["participants"]))
+            capacity = record.get("max_participants")
+
+            if op == "signup":
+                if present:
+                    outcomes.append(StoreError("Student already signed up for this activity"))
+                elif capacity is not None and count >= capacity:
+                    outcomes.append(ActivityFull("Activity is full"))
+                elif clashes := self._batch_clashes(email, name, joined_by, left_by):
+                    outcomes.append(ScheduleConflict(f"Schedule conflicts with {', '.join(sorted(clashes))}"))
+                else:
+                    joined.add(key)
+                    left.discard(key)
+                    joined_by.setdefault(email, set()).add(name)
+                    left_by.get(email, set()).discard(name)
+                    counts[name] = count + 1
+                    outcomes.append("enrolled")
+            elif present:
+                left.add(key)
+                joined.discard(key)
+                left_by.setdefault(email, set()).add(name)
+                joined_by.get(email, set()).discard(name)
+                counts[name] = count - 1
+                outcomes.append("unregistered")
+
+                # The freed seat goes to the front of the waitlist
+                queue = queues.get(name)
+                if queue is None:
+                    queue = queues[name] = deque(self._waitlists[name])
+                while queue and (capacity is None or counts[name] < capacity):
+                    promoted = (name, queue.popleft())
+                    if promoted in unwaitlisted or promoted in joined or promoted in left:
+                        continue
+                    # Off the waitlist too, should the batch unregister them again
+                    joined.add(promoted)
+                    unwaitlisted.add(promoted)
+                    joined_by.setdefault(promoted[1], set()).add(name)
+                    counts[name] += 1
+            elif email in self._waitlists[name] and key not in unwaitlisted:
+                unwaitlisted.add(key)
+                outcomes.append("unwaitlisted")
+            else:
+                outcomes.append(StoreError("Student is not signed up for this activity"))
+        return outcomes
+
+    def _batch_clashes(self, email, name, joined_by, left_by):
+        # Conflicts for a simulated signup, counting the batch's own effects
+        with self._index_lock(email):
+            clashes = self._clashes(email, name) - left_by.get(email, set())
+        intervals = self._intervals[name]
+        clashes.update(other for other in joined_by.get(email, ())
+                       if other != name and overlaps(self._intervals[other], intervals))
+        return clashes
+
+    def _clashes(self, email, name):
+        # Caller holds the student's index lock
+        timetable = self._timetable(EMAILS.lookup(email))
+        if timetable is None:
+            return set()
+        clashes = timetable.overlapping(self._intervals[name])
+        clashes.discard(name)
+        return clashes
+
+    def _add_participant(self, name, email, indexed=False):
+        self._activities[name]["participants"].add(email)
+        if self._reports is not None:
+            self._reports.activity_changed(name, 1)
+        if email in self._waitlists[name]:
+            self._dequeue(name, email, indexed)
+        if indexed:
+            self._link(email, name)
+        else:
+            self._index(email, name)
+
+    def _remove_participant(self, name, email):
+        self._activities[name]["participants"].remove(email)
+        if self._reports is not None:
+            self._reports.activity_changed(name, -1)
+        self._unindex(email, name)
+
+    def _restore(self, state):
+        for name, details in state["activities"].items():
+            self._locks.setdefault(name, threading.Lock())
+            self._put(name, Activity(details))
+        for name, emails in state["waitlists"].items():
+            for email in emails:
+                self._enqueue(name, email)
+
+        version = state["version"]
+        for record in state["records"]:
+            self._apply(record)
+            version = max(version, record.get("version", version))
+        self._version = version
+
+    def _apply(self, record):
+        # Replays one storage record; every op is idempotent so records
+        # already reflected in the snapshot are harmless
+        op, name = record["op"], record["activity"]
+        if op == "put":
+            self._locks.setdefault(name, threading.Lock())
+            details = record["details"]
+            self._put(name, Activity(details))
+        elif op == "delete":
+            self._remove_activity(name)
+        elif name not in self._activities:
+            return
+        elif op == "signup":
+            if record["email"] not in self._activities[name]["participants"]:
+                self._add_participant(name, record["email"])
+        elif op == "unregister":
+            if record["email"] in self._activities[name]["participants"]:
+                self._remove_participant(name, record["email"])
+        elif op == "waitlist":
+            self._enqueue(name, record["email"])
+        elif op == "unwaitlist" and record["email"] in self._waitlists[name]:
+            self._dequeue(name, record["email"])
+
+    def _committed(self, ticket):
+        # Wait for durability outside the activity lock, so concurrent
+        # writers can share an fsync, then compact in the background if due
+        self._storage.sync(ticket)
+        self._compact_if_due()
+
+    async def _committed_async(self, ticket):
+        await self._storage.synced(ticket)
+        self._compact_if_due()
+
+    def _compact_if_due(self):
+        if self._storage.wants_snapshot() and not self._compaction_lock.locked():
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def _remove_activity(self, name):
+        record = self._activities.pop(name, None)
+        if record is None:
+            return False
+        for email in self._waitlists.pop(name):
+            with self._index_lock(email):
+                self._unlink_waitlist(email, name)
+        del self._days[name]
+        del self._activity_versions[name]
+        del self._seq[name]
+        if len(self._order) > 2 * len(self._seq) + 64:
+            # Drop stale order entries; readers keep iterating the old list
+            self._order = [(seq, n) for seq, n in self._order if self._seq.get(n) == seq]
+        for email in record["participants"]:
+            self._unindex(email, name)
+        del self._intervals[name]
+        del self._meetings[name]
+        with self._search_lock:
+            if self._search is not None:
+                self._search.remove(name)
+        if self._reports is not None:
+            self._reports.activity_removed(name)
+        return True
+
+    def _log_change(self, op, name, email):
+        with self._version_lock:
+            self._version += 1
+            change = {"version": self._version, "op": op, "activity": name, "email": email}
+            self._activity_versions[name] = self._version
+            self._changes.append(change)
+            ticket = self._storage.append(change)
+            self._notify(change)
+            return ticket
+
+    def _notify(self, change):
+        for listener in self._listeners:
+            listener(change)
+
+    def _index_lock(self, email):
+        return self._index_locks[hash(email) % INDEX_LOCK_STRIPES]
+
+    def _index(self, email, name):
+        with self._index_lock(email):
+            self._link(email, name)
+
+    def _unindex(self, email, name):
+        with self._index_lock(email):
+            member = EMAILS.lookup(email)
+            names = self._enrollments.get(member)
+            if names is None or name not in names:
+                return
+            if self._reports is not None:
+                self._reports.student_changed(len(names), len(names) - 1)
+            if len(names) == 1:
+                del self._enrollments[member]
+                self._timetables.pop(member, None)
+                return
+            self._enrollments[member] = tuple(other for other in names if other != name)
+            timetable = self._timetables.get(member)
+            if timetable is not None:
+                timetable.remove_entries(self._meetings[name])
+
+    def _enqueue(self, name, email):
+        self._waitlists[name].add(email)
+        with self._index_lock(email):
+            self._waitlisted.setdefault(EMAILS.intern(email), set()).add(name)
+
+    def _dequeue(self, name, email, indexed=False):
+        # ``indexed``: the caller already holds the student's index lock
+        self._waitlists[name].remove(email)
+        if indexed:
+            self._unlink_waitlist(email, name)
+        else:
+            with self._index_lock(email):
+                self._unlink_waitlist(email, name)
+
+    def _unlink_waitlist(self, email, name):
+        # Caller holds the student's index lock
+        member = EMAILS.lookup(email)
+        names = self._waitlisted.get(member)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._waitlisted[member]
+
+    def _link(self, email, name):
+        # Caller holds the student's index lock
+        member = EMAILS.intern(email)
+        names = self._enrollments.get(member, ())
+        if name in names:
+            return
+        self._enrollments[member] = names + (name,)
+        if self._reports is not None:
+            self._reports.student_changed(len(names), len(names) + 1)
+        timetable = self._timetables.get(member)
+        if timetable is not None:
+            timetable.add_entries(self._meetings[name])
+
+    def _timetable(self, member):
+        # Caller holds the student's index lock. Built from the student's
+        # enrollments on first use, then kept current by _link/_unindex
+        timetable = self._timetables.get(member)
+        if timetable is None:
+            names = self._enrollments.get(member)
+            if not names:
+                return None
+            timetable = self._timetables[member] = Timetable()
+            for name in names:
+                timetable.add_entries(self._meetings[name])
+        return timetable
+
+
+def encode_payload(data):
+    """Serialize response data to compact JSON bytes and a strong ETag"""
+    body = dumps(data)
+    return body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
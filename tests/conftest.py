@@ -3,14 +3,8 @@ Test configuration and fixtures for FastAPI tests
 """
 import pytest
 from fastapi.testclient import TestClient
-from src.app import app, activities
-import copy
-
-
-@pytest.fixture
-def client():
-    """FastAPI test client fixture"""
-    return TestClient(app)
+from src.app import AppConfig, create_app
+from src.store import ActivityStore
 
 
 @pytest.fixture
@@ -32,13 +26,22 @@ def sample_activities():
     }
 
 
-@pytest.fixture(autouse=True)
-def reset_activities(sample_activities):
-    """Reset activities data before each test"""
-    original_activities = copy.deepcopy(activities)
-    activities.clear()
-    activities.update(sample_activities)
-    yield
-    # Restore original activities after test
-    activities.clear()
-    activities.update(original_activities)
\ No newline at end of file
+@pytest.fixture
+def activities(sample_activities):
+    """A fresh store of the sample activities"""
+    store = ActivityStore(sample_activities)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def app(activities):
+    """A fresh app serving the test's store, with its own rate limits and caches"""
+    return create_app(AppConfig(store=activities))
+
+
+@pytest.fixture
+def client(app):
+    """FastAPI test client fixture, running the app's lifespan"""
+    with TestClient(app) as client:
+        yield client
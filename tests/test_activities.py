@@ -198,4 +198,121 @@ class TestActivitiesAPI:
         assert len(participants) == 2
         assert emails[0] in participants
         assert emails[1] not in participants
-        assert emails[2] in participants
\ No newline at end of file
+        assert emails[2] in participants
+
+class TestActivitiesCaching:
+    """Test class for the cached /activities snapshot and conditional GET"""
+
+    def test_etag_and_not_modified(self, client):
+        """Test that a matching If-None-Match answers 304 with no body"""
+        response = client.get("/activities")
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+
+        response = client.get("/activities", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        response = client.get("/activities", headers={"If-None-Match": f'"stale", W/{etag}'})
+        assert response.status_code == 304
+
+    def test_etag_changes_after_mutation(self, client):
+        """Test that signup and unregister invalidate the snapshot"""
+        etag = client.get("/activities").headers["etag"]
+
+        client.post("/activities/Empty Activity/signup?email=new@example.com")
+        response = client.get("/activities", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert "new@example.com" in response.json()["Empty Activity"]["participants"]
+        signup_etag = response.headers["etag"]
+        assert signup_etag != etag
+
+        client.delete("/activities/Empty Activity/participants/new@example.com")
+        response = client.get("/activities", headers={"If-None-Match": signup_etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] == etag  # Same content, same strong ETag
+
+    def test_if_none_match_variants(self, client):
+        """Test the wildcard, weak tags and tags that don't match"""
+        etag = client.get("/activities").headers["etag"]
+        assert client.get("/activities", headers={"If-None-Match": "*"}).status_code == 304
+        assert client.get("/activities", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+        assert client.get("/activities", headers={"If-None-Match": '"other"'}).status_code == 200
+        assert client.get("/activities", headers={"If-None-Match": ""}).status_code == 200
+
+    def test_etag_changes_when_an_activity_is_replaced(self, client, activities):
+        """Test that changes made outside signups also move the ETag"""
+        etag = client.get("/activities").headers["etag"]
+        activities["Empty Activity"] = {"description": "Renamed", "schedule": "Later", "participants": []}
+        response = client.get("/activities", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["Empty Activity"]["description"] == "Renamed"
+
+    def test_snapshot_reused_between_mutations(self, activities):
+        """Test that the serialized body is only rebuilt when the version moves"""
+        first = activities.snapshot()
+        assert activities.snapshot() is first
+
+        activities.touch()
+        assert activities.snapshot() is not first
+
+
+class TestActivityChanges:
+    """Test class for the /activities/changes delta feed"""
+
+    def test_changes_since_version(self, client):
+        """Test that only the mutations after `since` are returned"""
+        response = client.get("/activities")
+        version = int(response.headers["x-activities-version"])
+
+        client.post("/activities/Empty Activity/signup?email=new@example.com")
+        client.delete("/activities/Test Activity/participants/test1@example.com")
+
+        data = client.get(f"/activities/changes?since={version}").json()
+        assert data["resync"] is False
+        assert data["version"] == version + 2
+        assert [(c["op"], c["activity"], c["email"]) for c in data["changes"]] == [
+            ("signup", "Empty Activity", "new@example.com"),
+            ("unregister", "Test Activity", "test1@example.com"),
+        ]
+
+        data = client.get(f"/activities/changes?since={version + 1}").json()
+        assert [c["version"] for c in data["changes"]] == [version + 2]
+
+        data = client.get(f"/activities/changes?since={version + 2}").json()
+        assert data == {"version": version + 2, "resync": False, "changes": []}
+
+    def test_failed_mutations_are_not_logged(self, client):
+        """Test that rejected signups leave the version untouched"""
+        version = client.get("/activities/changes?since=0").json()["version"]
+        client.post("/activities/Test Activity/signup?email=test1@example.com")
+        data = client.get(f"/activities/changes?since={version}").json()
+        assert data["changes"] == []
+
+    def test_resync_when_structure_changes(self, client, activities):
+        """Test that adding an activity asks clients to reload everything"""
+        version = activities.version
+        activities["Another Activity"] = {
+            "description": "New", "schedule": "Now", "max_participants": 1, "participants": []
+        }
+        data = client.get(f"/activities/changes?since={version}").json()
+        assert data["resync"] is True
+
+        # A version from the future (e.g. before a server restart) also resyncs
+        data = client.get(f"/activities/changes?since={activities.version + 5}").json()
+        assert data["resync"] is True
+
+    def test_resync_when_log_overflows(self, sample_activities):
+        """Test that the ring buffer drops old entries and reports resync"""
+        from src.store import ActivityStore
+        store = ActivityStore(sample_activities, change_log_size=3)
+        start = store.version
+        for i in range(5):
+            store.enroll("Empty Activity", f"user{i}@example.com")
+
+        assert store.changes_since(start)[1] is None
+        assert store.changes_since(start + 1)[1] is None
+        version, changes = store.changes_since(start + 2)
+        assert version == start + 5
+        assert [c["email"] for c in changes] == [f"user{i}@example.com" for i in (2, 3, 4)]
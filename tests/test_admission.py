@@ -0,0 +1,107 @@
+"""
+Tests for signup rate limiting and the concurrency limit
+"""
+import asyncio
+
+import pytest
+
+from src.admission import ConcurrencyLimit, RateLimiter, Rejected, SignupAdmission
+
+
+class TestRateLimiter:
+    """Test class for the token buckets"""
+
+    def test_burst_then_refill(self):
+        """Test that a key gets its burst, then one token per 1/rate seconds"""
+        limiter = RateLimiter(rate=2, burst=3)
+        assert [limiter.acquire("a", now=0) for _ in range(3)] == [0, 0, 0]
+        assert limiter.acquire("a", now=0) == 0.5
+        assert limiter.acquire("b", now=0) == 0
+        assert limiter.acquire("a", now=0.5) == 0
+
+    def test_buckets_are_bounded(self):
+        """Test that the least recently used bucket is evicted"""
+        limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+        limiter.acquire("a", now=0)
+        limiter.acquire("b", now=0)
+        limiter.acquire("a", now=0)
+        limiter.acquire("c", now=0)
+        assert len(limiter) == 2
+        # "b" was evicted, so it starts with a full bucket again
+        assert limiter.acquire("b", now=0) == 0
+        assert limiter.acquire("c", now=0) > 0
+
+
+class TestConcurrencyLimit:
+    """Test class for the signup slots and their queue"""
+
+    @pytest.mark.asyncio
+    async def test_queue_then_reject(self):
+        """Test that waiters get slots in order and overflow fails fast"""
+        limit = ConcurrencyLimit(limit=1, queue_size=1, timeout=5)
+        order = []
+        release = asyncio.Event()
+
+        async def holder(name):
+            async with limit.slot():
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(holder("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(holder("second"))
+        await asyncio.sleep(0)
+        assert (limit.active, limit.queued) == (1, 1)
+
+        with pytest.raises(Rejected) as rejected:
+            async with limit.slot():
+                pass
+        assert rejected.value.status_code == 503
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+        assert (limit.active, limit.queued) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """Test that a waiter gives up after the queue timeout"""
+        limit = ConcurrencyLimit(limit=1, queue_size=10, timeout=0.01)
+        async with limit.slot():
+            with pytest.raises(Rejected):
+                async with limit.slot():
+                    pass
+        assert (limit.active, limit.queued) == (0, 0)
+
+
+class TestSignupAdmission:
+    """Test class for 429/503 answers on the signup route"""
+
+    def test_email_rate_limit(self, app, client):
+        """Test that retrying one email past its burst answers 429 with Retry-After"""
+        app.state.admission = SignupAdmission(email_rate=0.5, email_burst=2)
+        url = "/activities/Empty Activity/signup?email=Retry@example.com"
+        assert client.post(url).status_code == 200
+        assert client.post(url).status_code == 400
+
+        response = client.post(url.lower())
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        assert response.json()["detail"] == "Too many signup attempts for this email"
+
+    def test_client_rate_limit(self, app, client):
+        """Test that one client address is limited across emails"""
+        app.state.admission = SignupAdmission(client_rate=1, client_burst=1)
+        assert client.post("/activities/Empty Activity/signup?email=a@example.com").status_code == 200
+        response = client.post("/activities/Empty Activity/signup?email=b@example.com")
+        assert response.status_code == 429
+        assert "retry-after" in response.headers
+
+    def test_overload_answers_503(self, app, client, activities):
+        """Test that a full signup queue is rejected without touching the store"""
+        app.state.admission = SignupAdmission(max_concurrent=1, queue_size=0)
+        app.state.admission.concurrency.active = 1
+        response = client.post("/activities/Empty Activity/signup?email=new@example.com")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "2"
+        assert "new@example.com" not in activities["Empty Activity"]["participants"]
@@ -0,0 +1,141 @@
+"""
+Tests for the bulk signup/unregister endpoint
+"""
+
+def _statuses(response):
+    return [result["status"] for result in response.json()["results"]]
+
+
+class TestBulkOperations:
+    """Test class for POST /activities/bulk"""
+
+    def test_per_item_results(self, client, activities):
+        """Test that each item gets the single-endpoint status and message"""
+        response = client.post("/activities/bulk", json=[
+            {"op": "signup", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Test Activity", "email": "test1@example.com"},
+            {"op": "signup", "activity": "Missing Activity", "email": "a@example.com"},
+            {"op": "unregister", "activity": "Test Activity", "email": "test2@example.com"},
+            {"op": "unregister", "activity": "Empty Activity", "email": "nobody@example.com"},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert data["applied"] is True
+        assert (data["succeeded"], data["failed"]) == (2, 3)
+        assert _statuses(response) == [200, 400, 404, 200, 400]
+        assert data["results"][0]["message"] == "Signed up a@example.com for Empty Activity"
+        assert data["results"][1]["detail"] == "Student already signed up for this activity"
+        assert data["results"][2]["detail"] == "Activity not found"
+        assert data["results"][3]["message"] == "Unregistered test2@example.com from Test Activity"
+
+        assert activities["Empty Activity"]["participants"] == ["a@example.com"]
+        assert activities["Test Activity"]["participants"] == ["test1@example.com"]
+
+    def test_batch_sees_its_own_effects(self, client, activities):
+        """Test that later items are validated against earlier ones"""
+        activities["Empty Activity"] = {**activities["Empty Activity"], "max_participants": 1}
+        response = client.post("/activities/bulk", json={"operations": [
+            {"op": "signup", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Empty Activity", "email": "b@example.com"},
+            {"op": "unregister", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Empty Activity", "email": "b@example.com"},
+        ]})
+        assert _statuses(response) == [200, 400, 409, 200, 200]
+        assert activities["Empty Activity"]["participants"] == ["b@example.com"]
+
+    def test_atomic_batch_all_or_nothing(self, client, activities):
+        """Test that one failing item rejects the whole atomic batch"""
+        version = activities.version
+        response = client.post("/activities/bulk?atomic=true", json=[
+            {"op": "signup", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "unregister", "activity": "Test Activity", "email": "nobody@example.com"},
+        ])
+        assert response.status_code == 409
+        assert response.json()["applied"] is False
+        assert _statuses(response) == [424, 400]
+        assert activities["Empty Activity"]["participants"] == []
+        assert activities.version == version
+
+    def test_atomic_batch_applies_when_valid(self, client, activities):
+        """Test that a valid atomic batch is applied in full"""
+        activities["Empty Activity"] = {**activities["Empty Activity"], "max_participants": 2}
+        response = client.post("/activities/bulk?atomic=true", json=[
+            {"op": "signup", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Empty Activity", "email": "b@example.com"},
+            {"op": "unregister", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Empty Activity", "email": "c@example.com"},
+        ])
+        assert response.status_code == 200
+        assert _statuses(response) == [200, 200, 200, 200]
+        assert activities["Empty Activity"]["participants"] == ["b@example.com", "c@example.com"]
+
+    def test_ndjson_body(self, client):
+        """Test newline-delimited JSON input"""
+        body = (
+            '{"op": "signup", "activity": "Empty Activity", "email": "a@example.com"}\n'
+            "\n"
+            '{"op": "signup", "activity": "Empty Activity", "email": "b@example.com"}'
+        )
+        response = client.post("/activities/bulk", content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert _statuses(response) == [200, 200]
+
+    def test_csv_body(self, client, activities):
+        """Test CSV input with a header row"""
+        body = "op,activity,email\r\nsignup,Empty Activity,a@example.com\r\nunregister,Test Activity,test1@example.com\r\n"
+        response = client.post("/activities/bulk", content=body, headers={"Content-Type": "text/csv"})
+        assert _statuses(response) == [200, 200]
+        assert activities.activities_for("test1@example.com") == frozenset()
+
+    def test_csv_multiline_fields(self, client, activities, monkeypatch):
+        """Test quoted CSV fields may span lines, counting each record once"""
+        monkeypatch.setattr("src.bulk.MAX_OPERATIONS", 2)
+        body = (
+            'op,activity,email,note\n'
+            'signup,Empty Activity,a@example.com,"Moved from\n\nChess ""A"" team"\n'
+            'signup,"Empty Activity",b@example.com,\n'
+        )
+        response = client.post("/activities/bulk", content=body, headers={"Content-Type": "text/csv"})
+        assert _statuses(response) == [200, 200]
+        assert activities["Empty Activity"]["participants"] == ["a@example.com", "b@example.com"]
+
+    def test_invalid_items(self, client, activities):
+        """Test malformed items fail individually with 422"""
+        response = client.post("/activities/bulk", json=[
+            {"op": "delete", "activity": "Empty Activity", "email": "a@example.com"},
+            {"op": "signup", "activity": "Empty Activity"},
+            "signup",
+            {"op": "signup", "activity": "Empty Activity", "email": "a@example.com"},
+        ])
+        assert _statuses(response) == [422, 422, 422, 200]
+
+        response = client.post("/activities/bulk?atomic=true", json=[
+            {"op": "signup", "activity": "Empty Activity", "email": "b@example.com"},
+            {"op": "bogus"},
+        ])
+        assert response.status_code == 409
+        assert _statuses(response) == [424, 422]
+        assert "b@example.com" not in activities["Empty Activity"]["participants"]
+
+    def test_unusable_bodies(self, client, monkeypatch):
+        """Test whole-request errors for bad bodies"""
+        response = client.post("/activities/bulk", content="{not json",
+                               headers={"Content-Type": "application/json"})
+        assert response.status_code == 400
+
+        response = client.post("/activities/bulk", json={"ops": []})
+        assert response.status_code == 400
+
+        response = client.post("/activities/bulk", content="x", headers={"Content-Type": "text/plain"})
+        assert response.status_code == 415
+
+        for content_type in ("application/x-ndjson", "text/csv", "application/json"):
+            response = client.post("/activities/bulk", content=b'"op"\n\xff\xfe\n',
+                                   headers={"Content-Type": content_type})
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Request body must be UTF-8"
+
+        monkeypatch.setattr("src.bulk.MAX_OPERATIONS", 2)
+        response = client.post("/activities/bulk", json=[{}] * 3)
+        assert response.status_code == 413
@@ -0,0 +1,123 @@
+"""
+Stress tests for concurrent signups, through the async handlers and from threads
+"""
+import asyncio
+import random
+import sys
+import threading
+from collections import Counter
+
+import httpx
+import pytest
+
+from src.admission import SignupAdmission
+from src.app import AppConfig, create_app
+from src.storage import MemoryStorage
+from src.store import ActivityStore, StoreError
+
+CAPACITIES = {"Test Activity": 40, "Empty Activity": 25}
+
+
+class OffloadedStorage(MemoryStorage):
+    """In-memory storage the store treats as blocking, so writes run on its executor threads"""
+
+    blocking = True
+
+
+async def _send_signups(app, requests):
+    """Fire all (activity, email) signups concurrently through the ASGI app"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(
+            client.post(f"/activities/{name}/signup", params={"email": email})
+            for name, email in requests
+        ))
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads as often as possible so lock-free races would show up"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def assert_consistent(store, emails):
+    for name, capacity in CAPACITIES.items():
+        participants = store[name]["participants"].to_list()
+        assert len(participants) == capacity
+        assert len(set(participants)) == capacity
+
+    for email in emails:
+        enrolled = {name for name in CAPACITIES if email in store[name]["participants"]}
+        assert store.activities_for(email) == enrolled
+
+
+class TestConcurrentSignups:
+    """Test class for atomic capacity enforcement under load"""
+
+    @pytest.mark.asyncio
+    async def test_no_overbooking_or_duplicates(self, sample_activities, fast_switching):
+        """Test thousands of signups racing on the store's executor threads"""
+        catalog = {name: {**sample_activities[name], "participants": [], "max_participants": capacity}
+                   for name, capacity in CAPACITIES.items()}
+        store = ActivityStore(catalog, storage=OffloadedStorage())
+        app = create_app(AppConfig(store=store))
+        # Admit every request so they all race inside the store
+        app.state.admission = SignupAdmission(email_rate=0, max_concurrent=0)
+
+        # 100 distinct students, each trying every activity 10 times
+        requests = [
+            (name, f"student{i}@example.com")
+            for _ in range(10)
+            for i in range(100)
+            for name in CAPACITIES
+        ]
+        responses = await _send_signups(app, requests)
+        # The writes really ran off the event loop, in parallel threads
+        assert store._executor is not None
+
+        statuses = Counter(response.status_code for response in responses)
+        assert statuses[200] == sum(CAPACITIES.values())
+        assert set(statuses) <= {200, 400, 409}
+        assert_consistent(store, {email for _, email in requests})
+        store.close()
+
+    def test_threaded_enrolls(self, sample_activities, fast_switching):
+        """Test that threads enrolling and withdrawing at once never oversell or duplicate a seat"""
+        catalog = {name: {**sample_activities[name], "participants": [], "max_participants": capacity}
+                   for name, capacity in CAPACITIES.items()}
+        store = ActivityStore(catalog)
+        emails = [f"student{i}@example.com" for i in range(100)]
+        names = list(CAPACITIES)
+        oversold = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(1000):
+                try:
+                    if rng.random() < 0.8:
+                        store.enroll(rng.choice(names), rng.choice(emails))
+                    else:
+                        store.withdraw(rng.choice(names), rng.choice(emails))
+                except StoreError:
+                    pass
+                oversold.extend(name for name, capacity in CAPACITIES.items()
+                                if len(store[name]["participants"]) > capacity)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not oversold
+
+        # Fill whatever seats the last withdrawals freed, then check the totals
+        for email in emails:
+            for name in names:
+                try:
+                    store.enroll(name, email)
+                except StoreError:
+                    pass
+        assert_consistent(store, emails)
@@ -0,0 +1,107 @@
+"""
+Tests for the live event hub and Server-Sent Events stream
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.events import EventHub, event_stream
+from src.store import ActivityStore
+
+
+def _change(version):
+    return {"version": version, "op": "signup", "activity": "Test Activity", "email": "a@example.com"}
+
+
+class TestEventHub:
+    """Test class for fan-out, backpressure and eviction"""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_every_subscriber(self):
+        """Test that one publish is delivered to all subscribers"""
+        hub = EventHub()
+        subscribers = [hub.subscribe() for _ in range(50)]
+
+        hub.publish(_change(1))
+
+        messages = [subscriber.queue.get_nowait() for subscriber in subscribers]
+        assert len(set(messages)) == 1
+        assert messages[0].startswith("id: 1\n")
+
+    @pytest.mark.asyncio
+    async def test_publish_from_worker_thread(self):
+        """Test that handler threads hand the broadcast to the event loop"""
+        hub = EventHub()
+        subscriber = hub.subscribe()
+
+        thread = threading.Thread(target=hub.publish, args=(_change(7),))
+        thread.start()
+        thread.join()
+
+        message = await asyncio.wait_for(subscriber.queue.get(), 1)
+        assert json.loads(message.split("data: ", 1)[1])["version"] == 7
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_is_evicted(self):
+        """Test that a full queue evicts that subscriber only"""
+        hub = EventHub(queue_size=2)
+        slow = hub.subscribe()
+        fast = hub.subscribe()
+
+        for version in range(1, 4):
+            hub.publish(_change(version))
+            fast.queue.get_nowait()
+
+        assert slow.evicted and not fast.evicted
+        assert hub.evictions == 1
+        assert len(hub) == 1
+        assert slow.queue.get_nowait() is None
+
+    @pytest.mark.asyncio
+    async def test_store_changes_are_published(self, sample_activities):
+        """Test that store mutations flow through the hub in order"""
+        store = ActivityStore(sample_activities)
+        hub = EventHub()
+        store.add_listener(hub.publish)
+        subscriber = hub.subscribe()
+
+        store.enroll("Empty Activity", "new@example.com")
+        store.withdraw("Empty Activity", "new@example.com")
+
+        ops = [json.loads(subscriber.queue.get_nowait().split("data: ", 1)[1])["op"] for _ in range(2)]
+        assert ops == ["signup", "unregister"]
+
+
+class TestEventStream:
+    """Test class for the SSE frame generator"""
+
+    @pytest.mark.asyncio
+    async def test_stream_frames(self):
+        """Test the version preamble, change frames and eviction ending the stream"""
+        hub = EventHub(queue_size=1)
+        stream = event_stream(hub, lambda: 41)
+
+        first = await stream.__anext__()
+        assert "event: version" in first
+        assert '"version": 41' in first
+
+        hub.publish(_change(42))
+        assert (await stream.__anext__()).startswith("id: 42\n")
+
+        hub.publish(_change(43))
+        hub.publish(_change(44))  # Queue of one overflows: evicted
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        assert len(hub) == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_keepalive(self):
+        """Test that idle streams emit keepalive comments"""
+        hub = EventHub()
+        stream = event_stream(hub, lambda: 0, keepalive=0.01)
+        await stream.__anext__()
+        assert await stream.__anext__() == ": keepalive\n\n"
+        await stream.aclose()
+        assert len(hub) == 0
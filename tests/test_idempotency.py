@@ -0,0 +1,93 @@
+"""
+Tests for Idempotency-Key handling on the mutation routes
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from src.idempotency import IdempotencyCache
+
+
+class TestIdempotencyCache:
+    """Test class for expiry and the size bound"""
+
+    def test_expiry_and_bound(self):
+        """Test that responses expire after the TTL and the oldest make room"""
+        cache = IdempotencyCache(ttl=10, max_entries=2)
+        for n, key in enumerate(("a", "b", "c")):
+            cache.finish(key, cache.begin(key, b"fp"), (200, [], b"{}"), now=n)
+        assert len(cache) == 2
+        assert cache.get("a", now=3) is None
+        assert cache.get("b", now=3).response == (200, [], b"{}")
+        assert cache.get("b", now=11) is None
+
+    def test_unkept_response_frees_the_key(self):
+        """Test that a request whose response isn't kept can run again"""
+        cache = IdempotencyCache()
+        cache.finish("a", cache.begin("a", b"fp"), None)
+        assert cache.get("a") is None
+
+
+class TestIdempotencyKeys:
+    """Test class for retried signups and unregisters"""
+
+    def test_retry_is_replayed(self, client, activities):
+        """Test that a retried signup gets the original answer, not a 400"""
+        url = "/activities/Empty Activity/signup?email=retry@example.com"
+        first = client.post(url, headers={"Idempotency-Key": "k1"})
+        version = activities.version
+
+        retry = client.post(url, headers={"Idempotency-Key": "k1"})
+        assert retry.status_code == first.status_code == 200
+        assert retry.json() == first.json() == {"message": "Signed up retry@example.com for Empty Activity"}
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert activities.version == version
+
+        # Without the key the store answers as usual
+        assert client.post(url).status_code == 400
+
+    def test_unregister_retry(self, client):
+        """Test that DELETE is covered too"""
+        url = "/activities/Test Activity/participants/test1@example.com"
+        assert client.delete(url, headers={"Idempotency-Key": "k2"}).status_code == 200
+        retry = client.delete(url, headers={"Idempotency-Key": "k2"})
+        assert retry.status_code == 200
+        assert retry.json()["message"] == "Unregistered test1@example.com from Test Activity"
+
+    def test_key_reused_for_another_request(self, client, activities):
+        """Test that one key can't be used for two different requests"""
+        client.post("/activities/Empty Activity/signup?email=a@example.com", headers={"Idempotency-Key": "k3"})
+        response = client.post("/activities/Empty Activity/signup?email=b@example.com",
+                               headers={"Idempotency-Key": "k3"})
+        assert response.status_code == 422
+        assert "b@example.com" not in activities["Empty Activity"]["participants"]
+
+    def test_oversized_key(self, client):
+        """Test that absurdly long keys are refused"""
+        response = client.post("/activities/Empty Activity/signup?email=a@example.com",
+                               headers={"Idempotency-Key": "k" * 256})
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_run_once(self, monkeypatch, app, activities):
+        """Test that simultaneous requests with one key execute a single time"""
+        calls = []
+        enroll = activities.enroll_async
+
+        async def slow_enroll(*args, **kwargs):
+            calls.append(args)
+            await asyncio.sleep(0.01)
+            return await enroll(*args, **kwargs)
+
+        monkeypatch.setattr(activities, "enroll_async", slow_enroll)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post("/activities/Empty Activity/signup", params={"email": "dup@example.com"},
+                            headers={"Idempotency-Key": "k4"})
+                for _ in range(10)
+            ))
+        assert [response.status_code for response in responses] == [200] * 10
+        assert len(calls) == 1
+        assert sum("idempotent-replayed" in response.headers for response in responses) == 9
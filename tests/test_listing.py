@@ -0,0 +1,144 @@
+"""
+Tests for paginated, filtered and projected activity listings
+"""
+import pytest
+
+from src.schedule import parse_day, parse_days
+from src.store import ActivityStore
+
+
+@pytest.fixture
+def scheduled_activities(activities):
+    """Replace the catalog with activities that have real schedules"""
+    activities.clear()
+    activities.update({
+        "Chess Club": {"description": "Chess strategy", "schedule": "Fridays, 3:30 PM - 5:00 PM",
+                       "max_participants": 12, "participants": ["a@example.com", "b@example.com"]},
+        "Programming Class": {"description": "Code", "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
+                              "max_participants": 20, "participants": ["c@example.com"]},
+        "Gym Class": {"description": "Sports", "schedule": "Mondays, Wednesdays, Fridays, 2:00 PM - 3:00 PM",
+                      "max_participants": 30, "participants": []},
+        "Chess Masters": {"description": "Advanced chess", "schedule": "Weekdays, 5:00 PM - 6:00 PM",
+                          "max_participants": 4, "participants": []},
+    })
+
+
+class TestScheduleParsing:
+    """Test class for day-of-week parsing"""
+
+    def test_parse_days(self):
+        """Test plural, list and group spellings"""
+        assert parse_days("Tuesdays and Thursdays, 3:30 PM - 4:30 PM") == {1, 3}
+        assert parse_days("Mondays, Wednesdays, Fridays, 2:00 PM") == {0, 2, 4}
+        assert parse_days("Weekdays, 5:00 PM") == {0, 1, 2, 3, 4}
+        assert parse_days("Test Schedule") == frozenset()
+
+    def test_parse_day(self):
+        """Test single day names and abbreviations"""
+        assert parse_day("Monday") == 0
+        assert parse_day("thurs") == 3
+        assert parse_day("Sun") == 6
+        assert parse_day("someday") is None
+
+
+@pytest.mark.usefixtures("scheduled_activities")
+class TestActivityListing:
+    """Test class for GET /activities query parameters"""
+
+    def test_cursor_pagination(self, client):
+        """Test that following X-Next-Cursor visits every activity once"""
+        names, cursor = [], None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/activities", params=params)
+            assert response.status_code == 200
+            names.extend(response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+        assert names == ["Chess Club", "Programming Class", "Gym Class", "Chess Masters"]
+
+    def test_pagination_survives_deletes(self, client, activities):
+        """Test that a cursor stays valid when earlier activities are removed"""
+        response = client.get("/activities", params={"limit": 2})
+        cursor = response.headers["x-next-cursor"]
+        del activities["Chess Club"]
+        response = client.get("/activities", params={"limit": 2, "cursor": cursor})
+        assert list(response.json()) == ["Gym Class", "Chess Masters"]
+        assert "x-next-cursor" not in response.headers
+
+    def test_day_filter_racing_a_delete(self):
+        """Test that a day-filtered walk skips an activity being deleted instead of failing"""
+        store = ActivityStore({name: {"schedule": "Mondays 3-4 PM", "participants": []} for name in ("A", "B")})
+        pages = []
+
+        class Days(dict):
+            # Query at the point the delete has dropped the days but not the catalog order
+            def __delitem__(self, name):
+                super().__delitem__(name)
+                pages.append(store.query(lambda name, record, version: name, day=0))
+
+        store._days = Days(store._days)
+        del store["A"]
+        assert pages == [([("B", "B")], None)]
+
+    def test_participant_modes(self, client):
+        """Test full, count and none participant rendering"""
+        data = client.get("/activities", params={"participants": "count"}).json()
+        assert data["Chess Club"] == {
+            "description": "Chess strategy", "schedule": "Fridays, 3:30 PM - 5:00 PM",
+            "max_participants": 12, "participant_count": 2,
+        }
+        data = client.get("/activities", params={"participants": "none"}).json()
+        assert "participants" not in data["Chess Club"]
+        assert "participant_count" not in data["Chess Club"]
+
+        response = client.get("/activities", params={"participants": "all"})
+        assert response.status_code == 422
+
+    def test_field_projection(self, client):
+        """Test that fields= returns exactly the requested keys"""
+        data = client.get("/activities", params={"fields": "spots_left,participant_count"}).json()
+        assert data["Chess Club"] == {"spots_left": 10, "participant_count": 2}
+
+    def test_spots_left_without_a_limit(self, client, activities):
+        """Test that an activity without max_participants has no spot count rather than zero"""
+        activities["Open Studio"] = {"description": "Drop in", "schedule": "Whenever",
+                                     "participants": ["a@example.com"]}
+        data = client.get("/activities", params={"fields": "spots_left", "name": "Open"}).json()
+        assert data == {"Open Studio": {"spots_left": None}}
+
+        response = client.get("/activities", params={"fields": "description,secret"})
+        assert response.status_code == 400
+        assert "secret" in response.json()["detail"]
+
+    def test_counts_follow_mutations(self, client):
+        """Test that counts and versions reflect signups immediately"""
+        before = client.get("/activities", params={"fields": "participant_count,version"}).json()
+        client.post("/activities/Chess Club/signup?email=new@example.com")
+        after = client.get("/activities", params={"fields": "participant_count,version"}).json()
+        assert after["Chess Club"]["participant_count"] == before["Chess Club"]["participant_count"] + 1
+        assert after["Chess Club"]["version"] > before["Chess Club"]["version"]
+        assert after["Gym Class"] == before["Gym Class"]
+
+    def test_name_and_day_filters(self, client):
+        """Test substring name and weekday filters"""
+        assert list(client.get("/activities", params={"name": "chess"}).json()) == [
+            "Chess Club", "Chess Masters"]
+        assert list(client.get("/activities", params={"day": "Tuesday"}).json()) == [
+            "Programming Class", "Chess Masters"]
+        assert list(client.get("/activities", params={"day": "fri", "name": "club"}).json()) == [
+            "Chess Club"]
+        assert client.get("/activities", params={"day": "Caturday"}).status_code == 400
+
+    def test_invalid_cursor(self, client):
+        """Test that a tampered cursor is rejected"""
+        assert client.get("/activities", params={"cursor": "bogus!"}).status_code == 400
+
+    def test_query_responses_support_etags(self, client):
+        """Test conditional GET on filtered listings"""
+        response = client.get("/activities", params={"participants": "count"})
+        etag = response.headers["etag"]
+        response = client.get("/activities", params={"participants": "count"},
+                              headers={"If-None-Match": etag})
+        assert response.status_code == 304
@@ -0,0 +1,115 @@
+"""
+Tests for request metrics, the /metrics endpoint and opt-in profiling
+"""
+import pstats
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.metrics import Histogram, Metrics, MetricsMiddleware, Profiler, TimedRoute
+
+
+def _sample(text, line_start):
+    """Return the value of the first exposition line starting with line_start"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestHistogram:
+    """Test class for bucket bookkeeping"""
+
+    def test_observe(self):
+        """Test that values land in the first bucket whose bound they fit"""
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.total == 56.5
+
+
+class TestMetricsEndpoint:
+    """Test class for GET /metrics"""
+
+    def test_counts_requests_per_route(self, client):
+        """Test request counters, latency phases and sizes keyed by route template"""
+        client.get("/activities")
+        client.post("/activities/Empty Activity/signup?email=new@example.com")
+        client.post("/activities/Unknown/signup?email=new@example.com")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+
+        signup = 'method="POST",route="/activities/{activity_name}/signup"'
+        assert _sample(text, f'http_requests_total{{{signup},status="200"}}') >= 1
+        assert _sample(text, f'http_requests_total{{{signup},status="404"}}') >= 1
+        for phase in ("dispatch", "handler", "serialize"):
+            assert _sample(text, f'http_request_phase_seconds_count{{{signup},phase="{phase}"}}') >= 2
+        assert _sample(text, 'http_response_size_bytes_sum{method="GET",route="/activities"}') > 0
+        assert _sample(text, 'http_request_duration_seconds_bucket{method="GET",route="/activities",le="+Inf"}') >= 1
+        # The /metrics request itself is still in flight
+        assert _sample(text, "http_requests_in_flight") == 1
+
+    def test_unmatched_routes_share_a_label(self, client):
+        """Test that 404s for unknown paths don't create a series per path"""
+        client.get("/no/such/path")
+        client.get("/another/missing/path")
+        text = client.get("/metrics").text
+        assert _sample(text, 'http_requests_total{method="GET",route="unmatched",status="404"}') >= 2
+
+
+class TestProfiling:
+    """Test class for header-triggered and sampled cProfile dumps"""
+
+    @staticmethod
+    def _app(profiler):
+        app = FastAPI()
+        app.router.route_class = TimedRoute
+        app.add_middleware(MetricsMiddleware, metrics=Metrics(), profiler=profiler)
+
+        @app.get("/work")
+        async def work():
+            return {"total": sum(range(1000))}
+
+        return TestClient(app)
+
+    def test_header_triggers_profile(self, tmp_path):
+        """Test that X-Profile writes a dump of the event loop including the handler"""
+        client = self._app(Profiler(enabled=True, directory=tmp_path))
+        response = client.get("/work", headers={"X-Profile": "1"})
+        assert response.json() == {"total": 499500}
+
+        dump = response.headers["x-profile-file"]
+        functions = {name for _, _, name in pstats.Stats(dump).stats}
+        assert "work" in functions
+
+    def test_sync_endpoints_are_rejected(self):
+        """Test that a sync endpoint, which would run outside the profiled loop, can't be timed"""
+        app = FastAPI()
+        app.router.route_class = TimedRoute
+        with pytest.raises(TypeError):
+            @app.get("/sync")
+            def sync():
+                return {}
+
+    def test_profiling_is_opt_in(self, tmp_path):
+        """Test that the header is ignored unless profiling is enabled"""
+        client = self._app(Profiler(enabled=False, directory=tmp_path))
+        response = client.get("/work", headers={"X-Profile": "1"})
+        assert "x-profile-file" not in response.headers
+        assert not list(tmp_path.iterdir())
+
+    def test_sampling_keeps_only_slow_requests(self, tmp_path):
+        """Test that sampled profiles faster than the threshold are dropped"""
+        client = self._app(Profiler(enabled=True, sample=1.0, slow_ms=60_000, directory=tmp_path))
+        client.get("/work")
+        assert not list(tmp_path.iterdir())
+
+        client = self._app(Profiler(enabled=True, sample=1.0, slow_ms=0, directory=tmp_path))
+        client.get("/work")
+        assert len(list(tmp_path.glob("*.prof"))) == 1
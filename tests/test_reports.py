@@ -0,0 +1,260 @@
+"""
+Tests for the incrementally maintained reports, checked against a full recompute
+"""
+import random
+import threading
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from src.app import AppConfig, create_app
+from src.reports import Ranking
+from src.schedule import DAY_NAMES, parse_intervals
+from src.store import ActivityStore, ReportsNotReady, StoreError
+
+SCHEDULES = [
+    "Mondays, 3:30 PM - 4:30 PM",
+    "Tuesdays and Thursdays, 3:00 PM - 5:00 PM",
+    "Fridays, 2:15 PM - 2:45 PM",
+    "Sundays, 11:00 PM - 1:00 AM",
+    "By arrangement",
+]
+
+
+def recompute(store):
+    """Every report computed by walking the whole catalog"""
+    catalog = store.to_dict()
+    stats = {}
+    for name, details in catalog.items():
+        capacity = details.get("max_participants") or None
+        count = len(details["participants"])
+        stats[name] = {"name": name, "participants": count, "max_participants": capacity,
+                       "fill_rate": round(count / capacity, 4) if capacity else None}
+
+    limited = [s for s in stats.values() if s["max_participants"]]
+    histogram = [0] * 11
+    for s in limited:
+        rate = s["participants"] / s["max_participants"]
+        histogram[10 if rate >= 1 else int(rate * 10)] += 1
+    capacity = sum(s["max_participants"] for s in limited)
+    per_student = {}
+    for details in catalog.values():
+        for email in details["participants"]:
+            per_student[email] = per_student.get(email, 0) + 1
+    enrollments = sum(s["participants"] for s in stats.values())
+
+    demand, seats = [0] * 168, [0] * 168
+    for name, details in catalog.items():
+        for hour in range(168):
+            if any(start < (hour + 1) * 60 and hour * 60 < end
+                   for start, end in parse_intervals(details.get("schedule", ""))):
+                demand[hour] += len(details["participants"])
+                seats[hour] += details.get("max_participants") or 0
+
+    distribution = {}
+    for count in per_student.values():
+        distribution[count] = distribution.get(count, 0) + 1
+    return {
+        "summary": {
+            "activities": len(catalog),
+            "enrollments": enrollments,
+            "capacity": capacity,
+            "fill_rate": round(sum(s["participants"] for s in limited) / capacity, 4) if capacity else None,
+            "full_activities": sum(s["participants"] >= s["max_participants"] for s in limited),
+            "students": len(per_student),
+            "histogram": histogram,
+        },
+        "top_participants": sorted(stats.values(), key=lambda s: (-s["participants"], s["name"])),
+        "top_fill_rate": sorted(limited, key=lambda s: (-s["participants"] / s["max_participants"], s["name"])),
+        "distribution": [{"activities": k, "students": distribution[k]} for k in sorted(distribution)],
+        "demand": [(DAY_NAMES[h // 24], h % 24, demand[h], seats[h]) for h in range(168) if demand[h] or seats[h]],
+    }
+
+
+def assert_reports_match(store):
+    expected = recompute(store)
+    reports = store.reports
+    summary = reports.summary()
+    assert {key: summary[key] for key in expected["summary"] if key != "histogram"} == {
+        key: value for key, value in expected["summary"].items() if key != "histogram"}
+    assert [bucket["activities"] for bucket in summary["fill_rate_histogram"]] == expected["summary"]["histogram"]
+    assert reports.top_activities("participants", 1000) == expected["top_participants"]
+    assert reports.top_activities("fill_rate", 1000) == expected["top_fill_rate"]
+    assert reports.students()["distribution"] == expected["distribution"]
+    demand = [(row["day"], row["hour"], row["enrolled"], row["seats"]) for row in reports.demand()["by_hour"]]
+    assert demand == expected["demand"]
+
+
+class TestRanking:
+    """Test class for the sorted top-K structure"""
+
+    def test_updates_and_ties(self):
+        """Test that scores move entries and ties come out in name order"""
+        ranking = Ranking()
+        for name, score in (("b", 2), ("a", 2), ("c", 5)):
+            ranking.set(name, score)
+        assert ranking.top(3) == [("c", 5), ("a", 2), ("b", 2)]
+        ranking.set("c", 1)
+        ranking.discard("a")
+        ranking.discard("missing")
+        assert ranking.top(10) == [("b", 2), ("c", 1)]
+        assert ranking.rank("c") == 2
+        assert ranking.rank("a") is None
+
+
+class TestIncrementalReports:
+    """Test class comparing the aggregates with a recompute after random changes"""
+
+    def test_random_operations(self):
+        """Test signups, unregisters, waitlists, batches, replacements and deletes"""
+        rng = random.Random(7)
+        store = ActivityStore()
+        names = [f"Activity {n}" for n in range(8)]
+        emails = [f"s{n}@example.com" for n in range(30)]
+
+        def put(name):
+            details = {"description": "x", "schedule": rng.choice(SCHEDULES), "participants": []}
+            if rng.random() < 0.8:
+                details["max_participants"] = rng.randint(0, 6)
+            store[name] = details
+
+        for name in names:
+            put(name)
+        assert_reports_match(store)
+
+        for step in range(600):
+            name, email = rng.choice(names), rng.choice(emails)
+            roll = rng.random()
+            try:
+                if roll < 0.45:
+                    store.enroll(name, email, waitlist=rng.random() < 0.5, allow_conflicts=True)
+                elif roll < 0.8:
+                    store.withdraw(name, email)
+                elif roll < 0.9:
+                    operations = [(rng.choice(["signup", "unregister"]), rng.choice(names), rng.choice(emails))
+                                  for _ in range(5)]
+                    store.apply_batch(operations, atomic=rng.random() < 0.5)
+                elif roll < 0.95:
+                    put(name)
+                elif name in store:
+                    del store[name]
+                else:
+                    put(name)
+            except (KeyError, StoreError):
+                pass
+            if step % 20 == 0:
+                assert_reports_match(store)
+        assert_reports_match(store)
+
+
+class TestDeferredReports:
+    """Test class for building the reports after startup"""
+
+    def test_build_includes_changes_made_meanwhile(self, sample_activities):
+        """Test that reports are unavailable until built, then match a recompute"""
+        store = ActivityStore(sample_activities, defer_indexes=True)
+        assert not store.reports_ready
+        with pytest.raises(ReportsNotReady):
+            store.reports.summary()
+
+        store.enroll("Empty Activity", "test1@example.com")
+        store.withdraw("Test Activity", "test2@example.com")
+        store["Robotics"] = {"description": "Build robots", "schedule": SCHEDULES[0], "max_participants": 3,
+                             "participants": ["a@example.com"]}
+        store.build_reports()
+        assert store.reports_ready
+        assert_reports_match(store)
+
+        store.enroll("Robotics", "test1@example.com", allow_conflicts=True)
+        del store["Test Activity"]
+        assert_reports_match(store)
+
+    def test_build_racing_mutations(self):
+        """Test that signups and withdrawals during the build are counted once"""
+        names = [f"Activity {n}" for n in range(50)]
+        emails = [f"s{n}@example.com" for n in range(40)]
+        store = ActivityStore({
+            name: {"description": "x", "schedule": SCHEDULES[n % len(SCHEDULES)], "max_participants": 10,
+                   "participants": emails[n % 7:n % 7 + 5]}
+            for n, name in enumerate(names)
+        }, defer_indexes=True)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(300):
+                try:
+                    if rng.random() < 0.5:
+                        store.enroll(rng.choice(names), rng.choice(emails), allow_conflicts=True)
+                    else:
+                        store.withdraw(rng.choice(names), rng.choice(emails))
+                except StoreError:
+                    pass
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        store.build_reports()
+        for thread in threads:
+            thread.join()
+        assert_reports_match(store)
+
+    def test_endpoints_answer_503_until_ready(self, sample_activities):
+        """Test that the report routes ask clients to retry while the reports are built"""
+        store = ActivityStore(sample_activities, defer_indexes=True)
+        # Without the lifespan, which would start building the reports
+        client = TestClient(create_app(AppConfig(store=store)))
+        response = client.get("/reports/summary")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        store.build_indexes()
+        assert client.get("/reports/summary").json()["activities"] == 2
+
+
+class TestReportEndpoints:
+    """Test class for the /reports routes"""
+
+    def test_summary_and_top(self, client):
+        """Test totals, the histogram and the top activities for the sample data"""
+        summary = client.get("/reports/summary").json()
+        assert summary["activities"] == 2
+        assert summary["enrollments"] == 2
+        assert summary["capacity"] == 15
+        assert summary["fill_rate"] == round(2 / 15, 4)
+        assert summary["students"] == 2
+        assert [bucket["activities"] for bucket in summary["fill_rate_histogram"]][:5] == [1, 0, 0, 0, 1]
+
+        top = client.get("/reports/top-activities?limit=1").json()
+        assert top == {"by": "participants", "activities": [
+            {"name": "Test Activity", "participants": 2, "max_participants": 5, "fill_rate": 0.4}]}
+
+    def test_updates_with_signups(self, client, activities):
+        """Test that a signup is reflected in the reports straight away"""
+        client.post("/activities/Empty Activity/signup?email=test1@example.com")
+        report = client.get("/reports/activities/Empty Activity").json()
+        assert report["participants"] == 1
+        assert report["fill_rate"] == 0.1
+        assert report["rank_by_participants"] == 2
+
+        students = client.get("/reports/students").json()
+        assert students["distribution"] == [{"activities": 1, "students": 1}, {"activities": 2, "students": 1}]
+        assert client.get("/reports/students/test1@example.com").json() == {
+            "email": "test1@example.com", "activities": 2}
+        assert_reports_match(activities)
+
+    def test_demand(self, client, activities):
+        """Test enrolled students and seats per hour"""
+        activities["Chess Club"] = {"description": "Chess", "schedule": "Fridays, 3:30 PM - 5:00 PM",
+                                    "max_participants": 12, "participants": ["a@example.com", "b@example.com"]}
+        demand = client.get("/reports/demand").json()
+        assert demand["by_hour"] == [
+            {"day": "Friday", "hour": 15, "enrolled": 2, "seats": 12},
+            {"day": "Friday", "hour": 16, "enrolled": 2, "seats": 12},
+        ]
+        assert demand["by_hour_of_day"][0] == {"hour": 15, "enrolled": 2, "seats": 12}
+
+    def test_validation(self, client):
+        """Test unknown activities and bad parameters"""
+        assert client.get("/reports/activities/Nope").status_code == 404
+        assert client.get("/reports/top-activities?by=name").status_code == 422
+        assert client.get("/reports/top-activities?limit=0").status_code == 422
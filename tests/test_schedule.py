@@ -0,0 +1,166 @@
+"""
+Tests for schedule intervals, conflict detection and student timetables
+"""
+import pytest
+
+from src.schedule import Timetable, describe_interval, parse_intervals
+from src.store import ActivityStore, ScheduleConflict
+
+
+@pytest.fixture
+def timed_activities(activities):
+    """Replace the catalog with activities whose meeting times overlap"""
+    activities.clear()
+    activities.update({
+        "Programming Class": {"description": "Code", "schedule": "Tuesdays and Thursdays, 3:30 PM - 4:30 PM",
+                              "max_participants": 20, "participants": []},
+        "Basketball Team": {"description": "Hoops", "schedule": "Tuesdays and Thursdays, 4:00 PM - 6:00 PM",
+                            "max_participants": 15, "participants": []},
+        "Math Olympiad": {"description": "Maths", "schedule": "Thursdays, 4:30 PM - 5:00 PM",
+                          "max_participants": 10, "participants": []},
+        "Open Studio": {"description": "Drop in", "schedule": "Whenever you like",
+                        "max_participants": 10, "participants": []},
+    })
+
+
+class TestIntervalParsing:
+    """Test class for turning schedule text into weekly intervals"""
+
+    def test_days_share_the_time_range(self):
+        """Test that every listed day gets the range that follows it"""
+        intervals = parse_intervals("Tuesdays and Thursdays, 3:30 PM - 4:30 PM")
+        assert [describe_interval(*interval) for interval in intervals] == [
+            {"day": "Tuesday", "start": "15:30", "end": "16:30"},
+            {"day": "Thursday", "start": "15:30", "end": "16:30"},
+        ]
+
+    def test_separate_groups_and_formats(self):
+        """Test per-day ranges, 24-hour times and an inherited meridiem"""
+        assert parse_intervals("Mondays 3-4 PM, Fridays 14:00-15:30") == ((900, 960), (4 * 1440 + 840, 4 * 1440 + 930))
+        assert parse_intervals("Saturdays 11 - 1 PM") == ((5 * 1440 + 660, 5 * 1440 + 780),)
+
+    def test_meridiem_must_be_a_whole_word(self):
+        """Test that a word after the range starting with "a" or "p" isn't read as AM or PM"""
+        assert parse_intervals("Mondays 11 - 12 at the library") == ((660, 720),)
+        assert parse_intervals("Mondays 11 - 12 am") == ((660, 1440),)
+        assert parse_intervals("Mondays 3 - 4 p.m. at the pool") == ((900, 960),)
+        assert parse_intervals("Mondays 3p-4p") == ((900, 960),)
+        assert parse_intervals("Mondays 15:00 - 16:00 pool") == ((900, 960),)
+
+    def test_unparseable_schedule(self):
+        """Test that schedules without days or times give no intervals"""
+        assert parse_intervals("Test Schedule") == ()
+        assert parse_intervals("Fridays") == ()
+
+
+class TestTimetable:
+    """Test class for the per-student interval index"""
+
+    def test_overlapping(self):
+        """Test that only intervals sharing time are reported"""
+        timetable = Timetable()
+        timetable.add("Long", [(0, 600)])
+        timetable.add("Short", [(700, 760)])
+        assert timetable.overlapping([(500, 520)]) == {"Long"}
+        assert timetable.overlapping([(600, 700)]) == set()
+        assert timetable.overlapping([(550, 720)]) == {"Long", "Short"}
+
+        timetable.remove("Long", [(0, 600)])
+        assert timetable.overlapping([(500, 520)]) == set()
+        assert len(timetable) == 1
+
+
+class TestScheduleConflicts:
+    """Test class for conflict checks on signup"""
+
+    def test_conflicting_signup_is_rejected(self, client, timed_activities, activities):
+        """Test that an overlapping signup answers 409 and changes nothing"""
+        email = "busy@mergington.edu"
+        assert client.post(f"/activities/Programming Class/signup?email={email}").status_code == 200
+
+        response = client.post(f"/activities/Basketball Team/signup?email={email}")
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Schedule conflicts with Programming Class"
+        assert email not in activities["Basketball Team"]["participants"]
+
+    def test_back_to_back_is_not_a_conflict(self, client, timed_activities):
+        """Test that one activity ending as another starts is allowed"""
+        email = "busy@mergington.edu"
+        client.post(f"/activities/Programming Class/signup?email={email}")
+        assert client.post(f"/activities/Math Olympiad/signup?email={email}").status_code == 200
+
+    def test_warn_mode(self, client, timed_activities, activities):
+        """Test that conflicts=warn enrolls and lists the overlaps"""
+        email = "busy@mergington.edu"
+        client.post(f"/activities/Programming Class/signup?email={email}")
+        client.post(f"/activities/Math Olympiad/signup?email={email}")
+
+        response = client.post(f"/activities/Basketball Team/signup?email={email}&conflicts=warn")
+        assert response.status_code == 200
+        assert response.json()["conflicts"] == ["Math Olympiad", "Programming Class"]
+        assert email in activities["Basketball Team"]["participants"]
+
+    def test_unregister_frees_the_slot(self, client, timed_activities):
+        """Test that leaving an activity removes its intervals"""
+        email = "busy@mergington.edu"
+        client.post(f"/activities/Programming Class/signup?email={email}")
+        client.delete(f"/activities/Programming Class/participants/{email}")
+        assert client.post(f"/activities/Basketball Team/signup?email={email}").status_code == 200
+
+    def test_bulk_sees_its_own_signups(self, timed_activities, activities):
+        """Test that a batch rejects items conflicting with earlier items"""
+        outcomes, applied = activities.apply_batch([
+            ("signup", "Programming Class", "busy@mergington.edu"),
+            ("signup", "Basketball Team", "busy@mergington.edu"),
+        ], atomic=True)
+        assert not applied
+        assert isinstance(outcomes[1], ScheduleConflict)
+
+    def test_rescheduling_reindexes(self):
+        """Test that replacing an activity moves its participants' intervals"""
+        store = ActivityStore({
+            "A": {"schedule": "Mondays 3-4 PM", "max_participants": 5, "participants": ["x@example.com"]},
+            "B": {"schedule": "Tuesdays 3-4 PM", "max_participants": 5, "participants": []},
+        })
+        store["A"] = {"schedule": "Tuesdays 3:30-4:30 PM", "max_participants": 5, "participants": ["x@example.com"]}
+        assert store.conflicts("x@example.com", "B") == {"A"}
+
+    def test_loaded_students_get_a_timetable_on_first_use(self):
+        """Test that students enrolled at load are checked, and stay current afterwards"""
+        store = ActivityStore({
+            "A": {"schedule": "Mondays 3-4 PM", "max_participants": 5, "participants": ["x@example.com"]},
+            "B": {"schedule": "Tuesdays 3-4 PM", "max_participants": 5, "participants": ["x@example.com"]},
+            "C": {"schedule": "Mondays 3:30-4:30 PM", "max_participants": 5, "participants": []},
+            "D": {"schedule": "Tuesdays 3:30-4:30 PM", "max_participants": 5, "participants": []},
+        })
+        with pytest.raises(ScheduleConflict):
+            store.enroll("C", "x@example.com")
+        store.withdraw("A", "x@example.com")
+        store.enroll("C", "x@example.com")
+        assert store.conflicts("x@example.com", "D") == {"B"}
+        assert store.conflicts("x@example.com", "A") == {"C"}
+        assert [name for _, _, name in store.timetable_for("x@example.com")[0]] == ["C", "B"]
+
+
+class TestStudentSchedule:
+    """Test class for GET /students/{email}/schedule"""
+
+    def test_schedule_in_weekly_order(self, client, timed_activities):
+        """Test that meetings come back sorted by day and time"""
+        email = "busy@mergington.edu"
+        client.post(f"/activities/Math Olympiad/signup?email={email}")
+        client.post(f"/activities/Programming Class/signup?email={email}")
+        client.post(f"/activities/Open Studio/signup?email={email}")
+
+        data = client.get(f"/students/{email}/schedule").json()
+        assert data["schedule"] == [
+            {"activity": "Programming Class", "day": "Tuesday", "start": "15:30", "end": "16:30"},
+            {"activity": "Programming Class", "day": "Thursday", "start": "15:30", "end": "16:30"},
+            {"activity": "Math Olympiad", "day": "Thursday", "start": "16:30", "end": "17:00"},
+        ]
+        assert data["unscheduled"] == ["Open Studio"]
+
+    def test_unknown_student(self, client):
+        """Test that a student with no activities gets an empty schedule"""
+        data = client.get("/students/nobody@mergington.edu/schedule").json()
+        assert data == {"email": "nobody@mergington.edu", "schedule": [], "unscheduled": []}
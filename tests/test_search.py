@@ -0,0 +1,199 @@
+"""
+Tests for the activity search index and endpoint
+"""
+import math
+import random
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from src.app import AppConfig, create_app
+from src.search import (DESCRIPTION_WEIGHT, NAME_WEIGHT, PREFIX_WEIGHT, SCHEDULE_WEIGHT, SearchIndex,
+                        tokenize)
+from src.store import ActivityStore, SearchNotReady
+
+
+def brute_force(documents, query):
+    """Score every document against every query word, without the index"""
+    weights = {}
+    for name, description, schedule in documents:
+        counts = weights[name] = {}
+        for text, weight in ((name, NAME_WEIGHT), (description, DESCRIPTION_WEIGHT), (schedule, SCHEDULE_WEIGHT)):
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + weight
+    frequency = {}
+    for counts in weights.values():
+        for term in counts:
+            frequency[term] = frequency.get(term, 0) + 1
+
+    scores = {}
+    for name, counts in weights.items():
+        total = 0.0
+        for word in dict.fromkeys(tokenize(query)):
+            best = max((weight * math.log(1 + len(weights) / frequency[term])
+                        * (1.0 if term == word else PREFIX_WEIGHT)
+                        for term, weight in counts.items() if term.startswith(word)), default=0.0)
+            if not best:
+                break
+            total += best
+        else:
+            scores[name] = total
+    return sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+
+class TestSearchIndex:
+    """Test class for matching and ranking"""
+
+    def test_tokenize(self):
+        """Test that text is split into lowercase words"""
+        assert tokenize("Chess Club: Tuesdays, 3:30 PM") == ["chess", "club", "tuesdays", "3", "30", "pm"]
+
+    def test_name_outranks_description(self):
+        """Test that a word in the name scores above the same word in a description"""
+        index = SearchIndex()
+        index.add("Art Studio", "Painting and chess-themed drawing")
+        index.add("Chess Club", "Strategy games")
+        assert [name for name, _ in index.search("chess")] == ["Chess Club", "Art Studio"]
+
+    def test_exact_outranks_prefix(self):
+        """Test that a prefix matches longer words but counts less than an exact word"""
+        index = SearchIndex()
+        index.add("Mathematics Olympiad")
+        index.add("Math Club")
+        results = index.search("math")
+        assert [name for name, _ in results] == ["Math Club", "Mathematics Olympiad"]
+        assert results[0][1] > results[1][1]
+
+    def test_prefix_expansions_keep_their_own_factor(self):
+        """Test a word matching exact and prefix terms against a brute-force ranking"""
+        # "chess" is rare, so its exact factor far outweighs the "chessboard"
+        # prefix factor; the many "club" activities make "chess" the word walked
+        documents = ([("Chess Club", "", "")]
+                     + [(f"Group {n}", "chessboard " * 8 + "club", "") for n in range(3)]
+                     + [(f"Team {n}", "club", "") for n in range(10)])
+        index = SearchIndex()
+        index.add_many(documents)
+        for limit in range(1, 5):
+            results = index.search("chess club", limit=limit)
+            expected = brute_force(documents, "chess club")[:limit]
+            assert results[0][0] == "Chess Club"
+            assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+    def test_matches_brute_force(self):
+        """Test random queries on random documents against a brute-force ranking"""
+        rng = random.Random(11)
+        vocabulary = ["art", "arts", "artist", "band", "bands", "chess", "chessboard", "club", "clubs",
+                      "math", "mathematics", "robot", "robotics", "run", "runner"]
+        documents = [(f"Activity {n} {rng.choice(vocabulary)}",
+                      " ".join(rng.choices(vocabulary, k=rng.randint(0, 8))),
+                      rng.choice(["", "Mondays", "Fridays"])) for n in range(80)]
+        index = SearchIndex()
+        index.add_many(documents)
+        for _ in range(200):
+            query = " ".join(word[:rng.randint(1, len(word))] for word in rng.sample(vocabulary, rng.randint(1, 2)))
+            limit = rng.randint(1, 10)
+            results = index.search(query, limit=limit)
+            expected = brute_force(documents, query)[:limit]
+            # Names can differ between equal scores at the cut, scores can't
+            assert [score for _, score in results] == pytest.approx([score for _, score in expected]), query
+
+    def test_every_word_must_match(self):
+        """Test that multi-word queries only return activities matching all words"""
+        index = SearchIndex()
+        index.add("Chess Club", "Meets on Mondays")
+        index.add("Chess Team", "Meets on Fridays")
+        index.add("Drama Club", "Meets on Mondays")
+        assert [name for name, _ in index.search("club mon")] == ["Chess Club", "Drama Club"]
+        assert index.search("chess drama") == []
+        assert index.search("nothing") == []
+        assert index.search("  ") == []
+
+    def test_limit_keeps_the_best(self):
+        """Test that the early stop still returns the top results in order"""
+        index = SearchIndex()
+        for n in range(1, 30):
+            index.add(f"Activity {n}", "soccer " * n, "Mondays")
+        results = index.search("soccer mondays", limit=5)
+        assert [name for name, _ in results] == [f"Activity {n}" for n in range(29, 24, -1)]
+
+    def test_replace_and_remove(self):
+        """Test that re-adding replaces an activity's terms and removing drops them"""
+        index = SearchIndex()
+        index.add("Robotics", "Build robots")
+        index.add("Robotics", "Program drones")
+        assert index.search("robots") == []
+        assert [name for name, _ in index.search("drones")] == ["Robotics"]
+        index.remove("Robotics")
+        index.remove("Robotics")
+        assert len(index) == 0
+        assert index.search("robotics") == []
+
+    def test_add_many_matches_add(self):
+        """Test that indexing in one pass gives the same results as one at a time"""
+        documents = [(f"Club {n}", f"topic{n % 7} weekly meetup", "Fridays") for n in range(50)]
+        one_by_one, at_once = SearchIndex(), SearchIndex()
+        for document in documents:
+            one_by_one.add(*document)
+        at_once.add("Club 3", "stale text", "")
+        at_once.add_many(documents)
+        for query in ("topic3", "club", "top fri", "stale"):
+            assert at_once.search(query, limit=50) == one_by_one.search(query, limit=50)
+
+
+class TestDeferredSearch:
+    """Test class for building the store's search index after startup"""
+
+    def test_search_waits_for_the_index(self, sample_activities):
+        """Test that search answers only once built, including changes made meanwhile"""
+        store = ActivityStore(sample_activities, defer_indexes=True)
+        assert not store.search_ready
+        with pytest.raises(SearchNotReady):
+            store.search("test", lambda name, record, version: {})
+
+        store["Robotics"] = {"description": "Build robots", "schedule": "", "participants": []}
+        del store["Empty Activity"]
+        store.build_search_index()
+        assert store.search_ready
+        assert [name for name, _, _ in store.search("robots", lambda *args: {})] == ["Robotics"]
+        assert store.search("empty", lambda *args: {}) == []
+
+    def test_endpoint_answers_503_until_ready(self, sample_activities):
+        """Test that the endpoint asks clients to retry while the index is built"""
+        store = ActivityStore(sample_activities, defer_indexes=True)
+        # Without the lifespan, which would start building the index
+        client = TestClient(create_app(AppConfig(store=store)))
+        response = client.get("/activities/search?q=test")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+
+class TestSearchEndpoint:
+    """Test class for GET /activities/search"""
+
+    def test_search(self, client):
+        """Test that results carry their name, score and the projected fields"""
+        response = client.get("/activities/search", params={"q": "empty"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["query"] == "empty"
+        assert [result["name"] for result in data["results"]] == ["Empty Activity"]
+        assert data["results"][0]["participant_count"] == 0
+        assert data["results"][0]["score"] > 0
+
+    def test_index_follows_store_changes(self, client, activities):
+        """Test that stored and deleted activities are searchable right away"""
+        activities["Chess Club"] = {"description": "Strategy games", "schedule": "Fridays, 3:30 PM - 5:00 PM",
+                                    "max_participants": 12, "participants": []}
+        results = client.get("/activities/search?q=strat fri&fields=schedule").json()["results"]
+        assert results == [{"name": "Chess Club", "score": results[0]["score"],
+                            "schedule": "Fridays, 3:30 PM - 5:00 PM"}]
+
+        del activities["Chess Club"]
+        assert client.get("/activities/search?q=chess").json()["results"] == []
+
+    def test_invalid_parameters(self, client):
+        """Test that an empty query, bad limit or unknown field is rejected"""
+        assert client.get("/activities/search?q=").status_code == 422
+        assert client.get("/activities/search?q=test&limit=0").status_code == 422
+        assert client.get("/activities/search?q=test&fields=bogus").status_code == 400
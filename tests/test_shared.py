@@ -0,0 +1,146 @@
+"""
+Tests for multi-worker shared state through the SQLite storage backend
+
+Each ActivityStore below stands in for one uvicorn worker process: they
+share nothing but the database file.
+"""
+import sqlite3
+import time
+
+import pytest
+
+from src.storage import SQLiteStorage, open_storage
+from src.store import ActivityFull, ActivityStore
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def workers(tmp_path, sample_activities):
+    """Two stores sharing one database, as two worker processes would"""
+    path = tmp_path / "activities.db"
+    stores = [ActivityStore(sample_activities, storage=SQLiteStorage(path)) for _ in range(2)]
+    yield stores
+    for store in stores:
+        store.close()
+
+
+class FailingCommit:
+    """Connection proxy whose next COMMIT fails as a busy database would"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.fail = True
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT" and self.fail:
+            self.fail = False
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.execute(sql, *args)
+
+
+class TestSharedStorage:
+    """Test class for consistency between workers sharing a database"""
+
+    def test_seeded_once(self, workers, tmp_path):
+        """Test that only the first worker writes the seed data"""
+        state = SQLiteStorage(tmp_path / "activities.db").load()
+        assert [record["activity"] for record in state["records"]] == ["Test Activity", "Empty Activity"]
+
+    def test_writes_are_visible_to_other_workers(self, workers):
+        """Test that a signup on one worker shows up on the other"""
+        first, second = workers
+        first.enroll("Empty Activity", "new@example.com")
+
+        assert second.activities_for("new@example.com") == {"Empty Activity"}
+        assert b"new@example.com" in second.snapshot().body
+        assert second.version == first.version
+
+    def test_capacity_is_enforced_across_workers(self, workers):
+        """Test that the capacity check sees the other worker's signups"""
+        first, second = workers
+        first["Tiny"] = {"description": "One seat", "schedule": "Mondays 1-2 PM",
+                         "max_participants": 1, "participants": []}
+        first.enroll("Tiny", "a@example.com")
+
+        with pytest.raises(ActivityFull):
+            second.enroll("Tiny", "b@example.com")
+        assert second["Tiny"]["participants"] == ["a@example.com"]
+
+    def test_change_feed_and_listeners_follow_other_workers(self, workers):
+        """Test that the poller replays remote changes into feed and listeners"""
+        first, second = workers
+        received = []
+        second.add_listener(received.append)
+        since = second.version
+
+        first.enroll("Empty Activity", "new@example.com")
+        assert _wait_for(lambda: received)
+        assert received == [{"version": first.version, "op": "signup",
+                             "activity": "Empty Activity", "email": "new@example.com"}]
+        assert second.changes_since(since) == (first.version, received)
+
+    def test_lagging_worker_reloads_after_pruning(self, tmp_path, sample_activities):
+        """Test that a worker behind a pruned log reloads the snapshot"""
+        path = tmp_path / "activities.db"
+        first = ActivityStore(sample_activities, storage=SQLiteStorage(path, snapshot_every=2))
+        second = ActivityStore(None, storage=SQLiteStorage(path))
+        # Pause the second worker's poller so it falls behind
+        second._stop.set()
+        second._poller.join()
+        received = []
+        second.add_listener(received.append)
+
+        for i in range(6):
+            first.enroll("Empty Activity", f"user{i}@example.com")
+        assert _wait_for(first.compact)
+
+        assert second.activities_for("user5@example.com") == {"Empty Activity"}
+        assert len(second["Empty Activity"]["participants"]) == 6
+        assert received[-1] == {"version": first.version, "op": "resync"}
+        first.close()
+        second.close()
+
+    def test_failed_commit_is_rolled_back(self, workers):
+        """Test that a write whose COMMIT fails is discarded in memory too"""
+        first, second = workers
+        first._storage._conn = FailingCommit(first._storage._conn)
+
+        with pytest.raises(sqlite3.OperationalError):
+            first.enroll("Empty Activity", "lost@example.com")
+        assert not first._storage._conn.in_transaction
+
+        first.enroll("Empty Activity", "new@example.com")
+        assert first["Empty Activity"]["participants"] == ["new@example.com"]
+        assert second.activities_for("lost@example.com") == frozenset()
+        assert second.activities_for("new@example.com") == {"Empty Activity"}
+
+    def test_restart_restores_shared_state(self, tmp_path, sample_activities):
+        """Test that a new worker starts from the database, not the seed"""
+        path = tmp_path / "activities.db"
+        store = ActivityStore(sample_activities, storage=SQLiteStorage(path))
+        store.enroll("Empty Activity", "new@example.com")
+        del store["Test Activity"]
+        version = store.version
+        store.close()
+
+        restored = ActivityStore({"Ignored": {"participants": []}}, storage=SQLiteStorage(path))
+        assert set(restored) == {"Empty Activity"}
+        assert restored["Empty Activity"]["participants"] == ["new@example.com"]
+        assert restored.version == version
+        restored.close()
+
+    def test_open_storage_from_environment(self, tmp_path, monkeypatch):
+        """Test that ACTIVITIES_DB selects the shared backend"""
+        monkeypatch.setenv("ACTIVITIES_DB", str(tmp_path / "activities.db"))
+        storage = open_storage()
+        assert isinstance(storage, SQLiteStorage)
+        storage.close()
@@ -0,0 +1,92 @@
+"""
+Tests for the app factory and loading the catalog at startup
+"""
+import time
+
+from fastapi.testclient import TestClient
+
+from src.app import SEED_ACTIVITIES, AppConfig, create_app
+from src.storage import MemoryStorage, WALStorage
+from src.store import ActivityStore
+
+
+class TestCreateApp:
+    """Test class for create_app() and its lifespan"""
+
+    def test_catalog_loads_at_startup(self, sample_activities):
+        """Test that the store is built when the app starts, not when it is created"""
+        app = create_app(AppConfig(seed=sample_activities, storage=MemoryStorage(), background_indexes=False))
+        assert app.state.activities is None
+        with TestClient(app) as client:
+            assert client.get("/activities").json() == sample_activities
+            assert client.get("/activities/search?q=empty").json()["results"][0]["name"] == "Empty Activity"
+        assert app.state.activities is None
+
+    def test_default_seed(self):
+        """Test that an app without configuration serves the built-in catalog"""
+        with TestClient(create_app(AppConfig(storage=MemoryStorage()))) as client:
+            assert list(client.get("/activities").json()) == list(SEED_ACTIVITIES)
+
+    def test_restores_from_storage(self, tmp_path, sample_activities):
+        """Test that persisted state wins over the seed and survives a restart"""
+        store = ActivityStore(sample_activities, storage=WALStorage(tmp_path))
+        store.enroll("Empty Activity", "new@example.com")
+        store.compact()
+        store.close()
+
+        app = create_app(AppConfig(storage=WALStorage(tmp_path)))
+        with TestClient(app) as client:
+            assert client.get("/activities?name=Empty").json()["Empty Activity"]["participants"] == ["new@example.com"]
+            assert client.delete("/activities/Empty Activity/participants/new@example.com").status_code == 200
+
+        with TestClient(create_app(AppConfig(storage=WALStorage(tmp_path)))) as client:
+            assert client.get("/activities?name=Empty").json()["Empty Activity"]["participants"] == []
+
+    def test_search_index_built_in_background(self, sample_activities):
+        """Test that search starts answering once the background build finishes"""
+        app = create_app(AppConfig(seed=sample_activities, storage=MemoryStorage(), background_indexes=True))
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 5
+            while client.get("/activities/search?q=test").status_code == 503:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert app.state.activities.search_ready
+
+    def test_reports_built_in_background(self, sample_activities):
+        """Test that the reports start answering once the background build finishes"""
+        app = create_app(AppConfig(seed=sample_activities, storage=MemoryStorage(), background_indexes=True))
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 5
+            while (response := client.get("/reports/summary")).status_code == 503:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert response.json()["activities"] == 2
+
+    def test_static_files_read_at_startup(self, sample_activities):
+        """Test that creating the app reads no static files and starting it does"""
+        app = create_app(AppConfig(seed=sample_activities, storage=MemoryStorage()))
+        assert not app.state.static_assets.loaded
+        with TestClient(app):
+            assert app.state.static_assets.loaded
+
+        # Served without a lifespan, the first request reads them
+        app = create_app(AppConfig(store=ActivityStore(sample_activities)))
+        assert TestClient(app).get("/static/index.html").status_code == 200
+        assert app.state.static_assets.loaded
+
+    def test_serves_a_given_store(self, sample_activities):
+        """Test that a store passed in is served without a lifespan and left open"""
+        store = ActivityStore(sample_activities)
+        app = create_app(AppConfig(store=store))
+        assert TestClient(app).post("/activities/Empty Activity/signup?email=a@example.com").status_code == 200
+        with TestClient(app):
+            pass
+        assert app.state.activities is store
+        assert "a@example.com" in store["Empty Activity"]["participants"]
+
+    def test_apps_are_independent(self, sample_activities):
+        """Test that two apps keep separate stores and signup limits"""
+        first, second = (create_app(AppConfig(store=ActivityStore(sample_activities))) for _ in range(2))
+        TestClient(first).post("/activities/Empty Activity/signup?email=a@example.com")
+        assert TestClient(second).get("/activities").json()["Empty Activity"]["participants"] == []
+        assert first.state.admission is not second.state.admission
@@ -0,0 +1,139 @@
+"""
+Tests for fingerprinted static assets and response compression
+"""
+import re
+
+from src.assets import StaticAssets
+from src.compression import negotiate
+
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def hashed_script(client):
+    """The fingerprinted app.js name the page links to"""
+    page = client.get("/static/index.html", headers=IDENTITY).text
+    return re.search(r'<script src="(app\.[0-9a-f]{12}\.js)">', page).group(1)
+
+
+class TestNegotiation:
+    """Test class for Accept-Encoding parsing"""
+
+    def test_negotiate(self):
+        """Test quality values, wildcards and refusals"""
+        assert negotiate("gzip, deflate", ("br", "gzip")) == "gzip"
+        assert negotiate("br;q=0.5, gzip", ("br", "gzip")) == "gzip"
+        assert negotiate("br, gzip", ("br", "gzip")) == "br"
+        assert negotiate("*", ("gzip",)) == "gzip"
+        assert negotiate("*, gzip;q=0", ("gzip",)) is None
+        assert negotiate("", ("gzip",)) is None
+        assert negotiate(None, ("gzip",)) is None
+
+
+class TestStaticAssets:
+    """Test class for fingerprinting, caching headers and precompression"""
+
+    def test_page_links_fingerprinted_assets(self, app, client):
+        """Test that index.html is rewritten to hashed names and revalidated"""
+        response = client.get("/static/index.html", headers=IDENTITY)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "no-cache"
+        assert app.state.static_assets.manifest["styles.css"] in response.text
+        assert 'src="app.js"' not in response.text
+
+    def test_fingerprinted_asset_is_immutable(self, client):
+        """Test that hashed names are cached forever and match the plain file"""
+        name = hashed_script(client)
+        hashed = client.get(f"/static/{name}", headers=IDENTITY)
+        plain = client.get("/static/app.js", headers=IDENTITY)
+        assert hashed.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert plain.headers["cache-control"] == "no-cache"
+        assert hashed.content == plain.content
+        assert hashed.headers["content-type"].startswith("text/javascript")
+
+    def test_precompressed_variants(self, client):
+        """Test that gzip is served when accepted and identity otherwise"""
+        name = hashed_script(client)
+        plain = client.get(f"/static/{name}", headers=IDENTITY)
+        assert "content-encoding" not in plain.headers
+        assert plain.headers["vary"] == "Accept-Encoding"
+
+        compressed = client.get(f"/static/{name}", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert int(compressed.headers["content-length"]) < len(plain.content)
+        assert compressed.content == plain.content
+        assert compressed.headers["etag"] != plain.headers["etag"]
+
+    def test_conditional_get_and_head(self, client):
+        """Test that a current ETag gets 304 and HEAD has no body"""
+        first = client.get("/static/index.html")
+        again = client.get("/static/index.html", headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+        assert again.content == b""
+
+        etag = first.headers["etag"]
+        for header in (f'W/{etag}', f'"other", {etag}', "*"):
+            assert client.get("/static/index.html", headers={"If-None-Match": header}).status_code == 304
+        assert client.get("/static/index.html", headers={"If-None-Match": '"other"'}).status_code == 200
+
+        head = client.head("/static/styles.css", headers=IDENTITY)
+        assert head.status_code == 200
+        assert head.content == b""
+        assert int(head.headers["content-length"]) > 0
+
+    def test_missing_and_wrong_method(self, client):
+        """Test 404 for unknown files and 405 for writes"""
+        assert client.get("/static/nope.js").status_code == 404
+        assert client.post("/static/app.js").status_code == 405
+
+    def test_nested_references(self, tmp_path):
+        """Test that pages in subdirectories keep their relative paths"""
+        (tmp_path / "js").mkdir()
+        (tmp_path / "js" / "main.js").write_text("console.log('hi')")
+        (tmp_path / "index.html").write_text('<script src="js/main.js"></script><a href="https://x.org/a.js">')
+        assets = StaticAssets(tmp_path)
+        hashed = assets.manifest["js/main.js"]
+        assert hashed.startswith("js/main.") and hashed.endswith(".js")
+        page = assets._assets["index.html"].variants[None].decode()
+        assert f'src="{hashed}"' in page
+        assert 'href="https://x.org/a.js"' in page
+
+
+class TestJSONCompression:
+    """Test class for gzipped API responses"""
+
+    def add_activities(self, activities, count):
+        for n in range(count):
+            activities[f"Activity {n}"] = {"description": "A reasonably long description " * 4,
+                                           "schedule": "Mondays, 3:30 PM - 4:30 PM",
+                                           "max_participants": 10, "participants": []}
+
+    def test_small_responses_are_not_compressed(self, client):
+        """Test that responses below the size threshold are sent as is"""
+        response = client.get("/activities", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    def test_snapshot_is_compressed(self, client, activities):
+        """Test that the large catalog is gzipped with a weak ETag that still revalidates"""
+        self.add_activities(activities, 50)
+        response = client.get("/activities", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["etag"].startswith('W/"')
+        assert "Activity 49" in response.json()
+
+        again = client.get("/activities", headers={"Accept-Encoding": "gzip",
+                                                   "If-None-Match": response.headers["etag"]})
+        assert again.status_code == 304
+
+        plain = client.get("/activities", headers=IDENTITY)
+        assert "content-encoding" not in plain.headers
+        assert plain.json() == response.json()
+
+    def test_other_json_is_compressed_on_the_fly(self, client, activities):
+        """Test that filtered listings go through the gzip middleware"""
+        self.add_activities(activities, 50)
+        response = client.get("/activities?participants=count", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/activities?participants=count", headers=IDENTITY)
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(plain.content)
+        assert response.json() == plain.json()
@@ -0,0 +1,234 @@
+"""
+Tests for the write-ahead log storage backend and crash recovery
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from src.storage import MemoryStorage, WALStorage, open_storage
+from src.store import ActivityStore
+
+
+def _open(path, sample_activities, **options):
+    return ActivityStore(sample_activities, storage=WALStorage(path, **options))
+
+
+class TestWALStorage:
+    """Test class for persistence, replay and compaction"""
+
+    @pytest.mark.parametrize("durability", ["always", "group", "async"])
+    def test_restart_recovers_mutations(self, tmp_path, sample_activities, durability):
+        """Test that every durability mode survives a clean restart"""
+        store = _open(tmp_path, sample_activities, durability=durability)
+        store.enroll("Empty Activity", "new@example.com")
+        store.withdraw("Test Activity", "test1@example.com")
+        store["Test Activity"] = {**store["Test Activity"], "max_participants": 1}
+        store.enroll("Test Activity", "queued@example.com", waitlist=True)
+        version = store.version
+        store.close()
+
+        restored = _open(tmp_path, {"Ignored": {"participants": []}}, durability=durability)
+        assert "Ignored" not in restored
+        assert restored["Empty Activity"]["participants"] == ["new@example.com"]
+        assert restored["Test Activity"]["participants"] == ["test2@example.com"]
+        assert restored["Test Activity"]["max_participants"] == 1
+        assert restored.waitlist("Test Activity") == ["queued@example.com"]
+        assert restored.activities_for("new@example.com") == {"Empty Activity"}
+        assert restored.version == version
+        restored.close()
+
+    def test_structural_changes_are_persisted(self, tmp_path, sample_activities):
+        """Test that added and deleted activities are replayed"""
+        store = _open(tmp_path, sample_activities)
+        store["New Activity"] = {"description": "New", "schedule": "Now", "max_participants": 2,
+                                 "participants": ["x@example.com"]}
+        del store["Empty Activity"]
+        store.close()
+
+        restored = _open(tmp_path, None)
+        assert set(restored) == {"Test Activity", "New Activity"}
+        assert restored.activities_for("x@example.com") == {"New Activity"}
+        restored.close()
+
+    def test_compaction_limits_replay_to_tail(self, tmp_path, sample_activities):
+        """Test that startup replays only the records after the snapshot"""
+        store = _open(tmp_path, sample_activities, snapshot_every=10**9)
+        for i in range(5):
+            store.enroll("Empty Activity", f"user{i}@example.com")
+        assert store.compact()
+        store.enroll("Empty Activity", "tail@example.com")
+        store.close()
+
+        assert (tmp_path / "snapshot.json").exists()
+        assert not (tmp_path / "wal.rotated.log").exists()
+        state = WALStorage(tmp_path).load()
+        assert [record["email"] for record in state["records"]] == ["tail@example.com"]
+
+        restored = _open(tmp_path, None)
+        assert len(restored["Empty Activity"]["participants"]) == 6
+        restored.close()
+
+    def test_automatic_compaction(self, tmp_path, sample_activities):
+        """Test that the store compacts once enough records accumulate"""
+        store = _open(tmp_path, sample_activities, snapshot_every=3)
+        for i in range(3):
+            store.enroll("Empty Activity", f"user{i}@example.com")
+
+        # Compaction runs in a background thread
+        deadline = time.monotonic() + 5
+        while not (tmp_path / "snapshot.json").exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert (tmp_path / "snapshot.json").exists()
+        store.close()
+
+    def test_torn_record_is_discarded(self, tmp_path, sample_activities):
+        """Test that a half-written last record is ignored and truncated"""
+        store = _open(tmp_path, sample_activities)
+        store.enroll("Empty Activity", "ok@example.com")
+        store.close()
+        with open(tmp_path / "wal.log", "ab") as wal:
+            wal.write(b'{"lsn":999,"op":"signup","activity":"Empty Ac')
+
+        restored = _open(tmp_path, None)
+        assert restored["Empty Activity"]["participants"] == ["ok@example.com"]
+        restored.enroll("Empty Activity", "after@example.com")
+        restored.close()
+
+        restored = _open(tmp_path, None)
+        assert restored["Empty Activity"]["participants"] == ["ok@example.com", "after@example.com"]
+        restored.close()
+
+    def test_interrupted_compaction_is_recovered(self, tmp_path, sample_activities):
+        """Test recovery when a crash happens between rotate and snapshot"""
+        store = _open(tmp_path, sample_activities, snapshot_every=10**9)
+        store.enroll("Empty Activity", "before@example.com")
+        store._storage.rotate()  # Crash before write_snapshot()
+        store.enroll("Empty Activity", "after@example.com")
+        store.close()
+
+        restored = _open(tmp_path, None)
+        assert restored["Empty Activity"]["participants"] == ["before@example.com", "after@example.com"]
+        assert (tmp_path / "snapshot.json").exists()
+        assert not (tmp_path / "wal.rotated.log").exists()
+        restored.close()
+
+    def test_fsync_outside_store_locks(self, tmp_path, sample_activities, monkeypatch):
+        """Test that "always" mode fsyncs after the store releases its locks"""
+        store = _open(tmp_path, sample_activities, durability="always")
+        held = []
+        fsync = os.fsync
+
+        def checked_fsync(fd):
+            held.append(store._version_lock.locked() or store._locks["Empty Activity"].locked())
+            fsync(fd)
+
+        monkeypatch.setattr(os, "fsync", checked_fsync)
+        store.enroll("Empty Activity", "new@example.com")
+        store.withdraw("Empty Activity", "new@example.com")
+        assert held == [False, False]
+        store.close()
+
+        restored = _open(tmp_path, None)
+        assert restored["Empty Activity"]["participants"] == []
+        restored.close()
+
+    def test_unknown_durability_mode(self, tmp_path):
+        """Test that a typo in the durability mode fails loudly"""
+        with pytest.raises(ValueError):
+            WALStorage(tmp_path, durability="sometimes")
+
+    def test_open_storage_from_environment(self, tmp_path, monkeypatch):
+        """Test backend selection through environment variables"""
+        monkeypatch.delenv("ACTIVITIES_DATA_DIR", raising=False)
+        monkeypatch.delenv("ACTIVITIES_DB", raising=False)
+        assert isinstance(open_storage(), MemoryStorage)
+
+        monkeypatch.setenv("ACTIVITIES_DATA_DIR", str(tmp_path))
+        monkeypatch.setenv("ACTIVITIES_DURABILITY", "always")
+        storage = open_storage()
+        assert isinstance(storage, WALStorage)
+        assert storage.durability == "always"
+
+
+class TestAsyncPath:
+    """Test class for the async store calls used by the request handlers"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writers_share_fsyncs(self, tmp_path, sample_activities):
+        """Test that coroutines waiting for durability are group committed"""
+        sample_activities["Empty Activity"]["max_participants"] = 50
+        store = _open(tmp_path, sample_activities, durability="group")
+        storage = store._storage
+        flushes = []
+        flush = storage._flush
+
+        def slow_flush():
+            flushes.append(time.monotonic())
+            time.sleep(0.01)
+            return flush()
+
+        storage._flush = slow_flush
+        outcomes = await asyncio.gather(*(
+            store.enroll_async("Empty Activity", f"user{i}@example.com") for i in range(50)
+        ))
+        assert outcomes == ["enrolled"] * 50
+        assert storage._synced == storage._lsn
+        assert len(flushes) < 10
+        store.close()
+
+        restored = _open(tmp_path, None)
+        assert len(restored["Empty Activity"]["participants"]) == 50
+        restored.close()
+
+    @pytest.mark.asyncio
+    async def test_fsync_per_record_stays_off_the_event_loop(self, tmp_path, sample_activities, monkeypatch):
+        """Test that "always" mode fsyncs each write in a thread, not on the loop"""
+        store = _open(tmp_path, sample_activities, durability="always")
+        threads = []
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda fd: (threads.append(threading.current_thread()), fsync(fd)))
+        assert await store.enroll_async("Empty Activity", "new@example.com") == "enrolled"
+        assert await store.withdraw_async("Test Activity", "test1@example.com") == "unregistered"
+        assert len(threads) == 2
+        assert threading.current_thread() not in threads
+        assert await store.read_async(store.activities_for, "new@example.com") == {"Empty Activity"}
+        store.close()
+
+        restored = _open(tmp_path, None)
+        assert restored["Empty Activity"]["participants"] == ["new@example.com"]
+        assert restored["Test Activity"]["participants"] == ["test2@example.com"]
+        restored.close()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_rebuilds_leave_the_event_loop(self, sample_activities, monkeypatch):
+        """Test that only a current snapshot is served inline on the loop"""
+        store = ActivityStore(sample_activities)
+        loop_thread = threading.current_thread()
+        threads = []
+        build = store.snapshot
+
+        def snapshot():
+            threads.append(threading.current_thread())
+            return build()
+
+        monkeypatch.setattr(store, "snapshot", snapshot)
+        first = await store.snapshot_async()
+        assert len(threads) == 1 and threads[0] is not loop_thread
+        assert await store.snapshot_async() is first
+        assert len(threads) == 1
+
+        store.enroll("Empty Activity", "new@example.com")
+        assert (await store.snapshot_async()).version > first.version
+        assert len(threads) == 2 and threads[1] is not loop_thread
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_offloaded_reads_use_the_executor(self, sample_activities):
+        """Test that reads marked ``offload`` run off the loop even with in-memory storage"""
+        store = ActivityStore(sample_activities)
+        assert await store.read_async(threading.current_thread) is threading.current_thread()
+        assert await store.read_async(threading.current_thread, offload=True) is not threading.current_thread()
+        store.close()
@@ -0,0 +1,194 @@
+"""
+Tests for the in-memory activity store and its indexes
+"""
+import copy
+import random
+
+import pytest
+
+from src import serialization
+from src.store import (EMAILS, PARTICIPANT_SET_THRESHOLD, Activity, ActivityStore, ParticipantSet, Waitlist,
+                       encode_payload)
+
+
+class TestParticipantSet:
+    """Test class for the ordered participant set"""
+
+    def test_keeps_insertion_order(self):
+        """Test that iteration follows signup order"""
+        participants = ParticipantSet(["b@example.com", "a@example.com"])
+        participants.add("c@example.com")
+        assert participants.to_list() == ["b@example.com", "a@example.com", "c@example.com"]
+
+    def test_membership_add_remove(self):
+        """Test membership, add and remove"""
+        participants = ParticipantSet()
+        participants.add("a@example.com")
+        assert "a@example.com" in participants
+        assert len(participants) == 1
+
+        participants.remove("a@example.com")
+        assert "a@example.com" not in participants
+        with pytest.raises(KeyError):
+            participants.remove("a@example.com")
+
+    def test_compares_equal_to_list(self):
+        """Test that a participant set compares equal to the list it mirrors"""
+        assert ParticipantSet(["a@example.com"]) == ["a@example.com"]
+
+    def test_large_sets_keep_order_and_membership(self):
+        """Test add/remove past the threshold where a hash index is kept"""
+        emails = [f"user{i}@example.com" for i in range(PARTICIPANT_SET_THRESHOLD * 2)]
+        participants = ParticipantSet(emails)
+        participants.add(emails[0])
+        participants.remove(emails[10])
+        assert emails[10] not in participants
+        assert emails[-1] in participants
+        assert participants.to_list() == emails[:10] + emails[11:]
+
+    def test_removals_keep_order_past_the_threshold(self):
+        """Test random adds and removals on an indexed set against a plain list"""
+        rng = random.Random(5)
+        emails = [f"user{i}@example.com" for i in range(PARTICIPANT_SET_THRESHOLD * 3)]
+        participants, expected = ParticipantSet(emails), list(emails)
+        for _ in range(3000):
+            email = rng.choice(emails)
+            if email in expected:
+                participants.remove(email)
+                expected.remove(email)
+            else:
+                participants.add(email)
+                expected.append(email)
+            assert (email in participants) == (email in expected)
+            assert len(participants) == len(expected)
+        assert participants.to_list() == expected
+        assert ParticipantSet(participants) == participants == expected
+
+    def test_emails_are_interned(self):
+        """Test that sets share one string per email and store integer IDs"""
+        first = ParticipantSet(["shared" + "@example.com"])
+        second = ParticipantSet(["".join(["shared", "@example.com"])])
+        assert first.to_list()[0] is second.to_list()[0]
+        assert EMAILS.lookup("shared@example.com") is not None
+        assert "never-added@example.com" not in first
+
+
+class TestWaitlist:
+    """Test class for the first-come, first-served waitlist queue"""
+
+    def test_order_and_positions(self):
+        """Test arrival order, positions and leaving from the middle"""
+        queue = Waitlist(["a@example.com", "b@example.com", "c@example.com"])
+        queue.add("a@example.com")
+        assert queue.to_list() == ["a@example.com", "b@example.com", "c@example.com"]
+        assert queue.position("c@example.com") == 3
+
+        queue.remove("b@example.com")
+        assert queue.position("c@example.com") == 2
+        queue.remove("a@example.com")
+        assert queue.first() == "c@example.com"
+        assert queue.position("c@example.com") == 1
+        assert queue.position("a@example.com") is None
+        with pytest.raises(KeyError):
+            queue.remove("a@example.com")
+
+        queue.remove("c@example.com")
+        assert queue.first() is None
+        assert len(queue) == 0
+
+    def test_matches_a_list(self):
+        """Test random joins, leaves and re-joins against a plain list"""
+        rng = random.Random(3)
+        emails = [f"user{i}@example.com" for i in range(PARTICIPANT_SET_THRESHOLD // 4)]
+        queue, expected = Waitlist(), []
+        for _ in range(5000):
+            email = rng.choice(emails)
+            if email in expected and rng.random() < 0.6:
+                queue.remove(email)
+                expected.remove(email)
+            elif email not in expected:
+                queue.add(email)
+                expected.append(email)
+            assert queue.first() == (expected[0] if expected else None)
+            assert queue.position(email) == (expected.index(email) + 1 if email in expected else None)
+        assert queue.to_list() == expected
+        assert [queue.position(email) for email in expected] == list(range(1, len(expected) + 1))
+
+
+class TestActivity:
+    """Test class for the slotted activity record"""
+
+    def test_round_trips_the_dict_shape(self):
+        """Test that to_dict() gives back the keys it was created with"""
+        details = {"description": "D", "schedule": "S", "max_participants": 3,
+                   "participants": ["a@example.com"]}
+        assert Activity(details).to_dict() == details
+        assert list(Activity(details).to_dict()) == list(details)
+        assert Activity({"participants": [], "room": "101"}).to_dict() == {"participants": [], "room": "101"}
+
+    def test_reads_and_writes_like_a_dict(self):
+        """Test item access, get, updates and unpacking"""
+        activity = Activity({"description": "D", "participants": []})
+        activity["max_participants"] = 2
+        activity["participants"] = ["a@example.com"]
+        assert activity["max_participants"] == 2
+        assert activity.get("schedule") is None
+        assert isinstance(activity["participants"], ParticipantSet)
+        assert {**activity}["participants"] == ["a@example.com"]
+        with pytest.raises(KeyError):
+            activity["schedule"]
+
+    def test_serializers_agree(self, monkeypatch):
+        """Test that orjson and the json fallback produce identical payloads"""
+        data = {"Café – “Club”": Activity({"description": "Line\nbreak / \"quoted\"", "max_participants": 1,
+                                           "participants": ["ü@example.com"]}).to_dict()}
+        fast = encode_payload(data)
+        monkeypatch.setattr(serialization, "orjson", None)
+        assert encode_payload(data) == fast
+
+
+class TestActivityStore:
+    """Test class for the activity store and reverse index"""
+
+    @pytest.fixture
+    def store(self, sample_activities):
+        return ActivityStore(sample_activities)
+
+    def test_plain_lists_are_converted(self, store):
+        """Test that assigned participant lists become participant sets"""
+        store["New Activity"] = {
+            "description": "New",
+            "schedule": "Now",
+            "max_participants": 3,
+            "participants": ["x@example.com"]
+        }
+        assert isinstance(store["New Activity"]["participants"], ParticipantSet)
+        assert store.activities_for("x@example.com") == {"New Activity"}
+
+    def test_reverse_index_tracks_enrollments(self, store):
+        """Test that enroll and withdraw keep the reverse index in sync"""
+        store.enroll("Empty Activity", "test1@example.com")
+        assert store.activities_for("test1@example.com") == {"Test Activity", "Empty Activity"}
+
+        store.withdraw("Test Activity", "test1@example.com")
+        assert store.activities_for("test1@example.com") == {"Empty Activity"}
+
+        store.withdraw("Empty Activity", "test1@example.com")
+        assert store.activities_for("test1@example.com") == frozenset()
+
+    def test_replacing_and_deleting_activity_updates_index(self, store):
+        """Test that replacing or deleting an activity drops stale enrollments"""
+        store["Test Activity"] = {**store["Test Activity"], "participants": ["test1@example.com"]}
+        assert store.activities_for("test2@example.com") == frozenset()
+
+        del store["Test Activity"]
+        assert store.activities_for("test1@example.com") == frozenset()
+
+    def test_deepcopy_returns_plain_data(self, store, sample_activities):
+        """Test that deep copies round-trip through update()"""
+        snapshot = copy.deepcopy(store)
+        assert snapshot == sample_activities
+
+        store.clear()
+        store.update(snapshot)
+        assert store.to_dict() == sample_activities
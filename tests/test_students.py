@@ -0,0 +1,152 @@
+"""
+Tests for the per-student enrollment view and unregistering a student everywhere
+"""
+import random
+import threading
+
+from src.storage import WALStorage
+from src.store import ActivityStore, StoreError
+
+
+def expected_enrollments(store, email):
+    """A student's activities and waitlists found by scanning every activity"""
+    enrolled = {name for name in store if email in store[name]["participants"]}
+    waitlisted = {name for name in store if email in store.waitlist(name)}
+    return enrolled, waitlisted
+
+
+class TestStudentActivities:
+    """Test class for GET /students/{email}/activities"""
+
+    def test_enrolled_and_waitlisted(self, client, activities):
+        """Test that both enrollments and waitlist places are listed"""
+        activities["Full Activity"] = {"description": "Full", "schedule": "Always", "max_participants": 1,
+                                       "participants": ["someone@example.com"]}
+        client.post("/activities/Empty Activity/signup?email=test1@example.com")
+        client.post("/activities/Full Activity/signup?email=test1@example.com&waitlist=true")
+
+        response = client.get("/students/test1@example.com/activities")
+        assert response.status_code == 200
+        assert response.json() == {
+            "email": "test1@example.com",
+            "activities": ["Empty Activity", "Test Activity"],
+            "waitlisted": ["Full Activity"],
+        }
+
+    def test_unknown_student(self, client):
+        """Test that a student with no enrollments gets empty lists"""
+        response = client.get("/students/nobody@example.com/activities")
+        assert response.json() == {"email": "nobody@example.com", "activities": [], "waitlisted": []}
+
+
+class TestUnregisterEverywhere:
+    """Test class for DELETE /students/{email}"""
+
+    def test_removes_every_enrollment(self, client, activities):
+        """Test that the student leaves every activity and waitlist, and others stay"""
+        activities["Full Activity"] = {"description": "Full", "schedule": "Always", "max_participants": 1,
+                                       "participants": ["someone@example.com"]}
+        client.post("/activities/Empty Activity/signup?email=test1@example.com")
+        client.post("/activities/Full Activity/signup?email=test1@example.com&waitlist=true")
+        version = activities.version
+
+        response = client.delete("/students/test1@example.com")
+        assert response.status_code == 200
+        assert response.json() == {
+            "email": "test1@example.com",
+            "unregistered": ["Empty Activity", "Test Activity"],
+            "unwaitlisted": ["Full Activity"],
+        }
+        assert activities.enrollments_for("test1@example.com") == (frozenset(), frozenset())
+        assert activities["Test Activity"]["participants"] == ["test2@example.com"]
+        assert activities.waitlist("Full Activity") == []
+
+        changes = client.get(f"/activities/changes?since={version}").json()["changes"]
+        assert [(change["op"], change["activity"]) for change in changes] == [
+            ("unregister", "Empty Activity"), ("unregister", "Test Activity")]
+
+    def test_unknown_student(self, client):
+        """Test that removing a student who is signed up nowhere answers 404"""
+        response = client.delete("/students/nobody@example.com")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Student is not signed up for any activity"
+
+    def test_persisted(self, tmp_path, sample_activities):
+        """Test that the removal survives a restart"""
+        store = ActivityStore(sample_activities, storage=WALStorage(tmp_path))
+        assert store.withdraw_everywhere("test1@example.com") == {"Test Activity": "unregistered"}
+        store.close()
+
+        restored = ActivityStore(storage=WALStorage(tmp_path))
+        assert restored.enrollments_for("test1@example.com") == (frozenset(), frozenset())
+        assert restored["Test Activity"]["participants"] == ["test2@example.com"]
+        restored.close()
+
+
+class TestReverseIndexConsistency:
+    """Test class checking the reverse indexes against a scan under concurrent mutation"""
+
+    def test_concurrent_mutations(self):
+        """Test signups, waitlists, withdrawals, removals everywhere and replacements racing"""
+        names = [f"Activity {n}" for n in range(6)]
+        emails = [f"s{n}@example.com" for n in range(12)]
+        store = ActivityStore({
+            name: {"description": "x", "schedule": "Always", "max_participants": 4, "participants": []}
+            for name in names
+        })
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(400):
+                name, email = rng.choice(names), rng.choice(emails)
+                roll = rng.random()
+                try:
+                    if roll < 0.5:
+                        store.enroll(name, email, waitlist=True)
+                    elif roll < 0.8:
+                        store.withdraw(name, email)
+                    elif roll < 0.95:
+                        store.withdraw_everywhere(email)
+                    else:
+                        store[name] = {"description": "x", "schedule": "Always", "max_participants": 4,
+                                       "participants": rng.sample(emails, 2)}
+                except StoreError:
+                    pass
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for email in emails:
+            enrolled, waitlisted = store.enrollments_for(email)
+            assert (set(enrolled), set(waitlisted)) == expected_enrollments(store, email)
+
+    def test_removal_racing_signups(self):
+        """Test that a student signing up while being removed is left consistent"""
+        names = [f"Activity {n}" for n in range(20)]
+        store = ActivityStore({
+            name: {"description": "x", "schedule": "Always", "participants": []} for name in names
+        })
+        email = "racer@example.com"
+
+        def sign_up():
+            for name in names:
+                store.enroll(name, email)
+
+        def remove():
+            for _ in range(50):
+                store.withdraw_everywhere(email)
+
+        threads = [threading.Thread(target=sign_up), threading.Thread(target=remove)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        enrolled, waitlisted = store.enrollments_for(email)
+        assert (set(enrolled), set(waitlisted)) == expected_enrollments(store, email)
+        store.withdraw_everywhere(email)
+        assert store.enrollments_for(email) == (frozenset(), frozenset())
+        assert all(email not in store[name]["participants"] for name in names)
@@ -28,10 +28,9 @@ class TestValidationAndEdgeCases:
         assert "detail" in error_data
         assert any("email" in str(error).lower() for error in error_data["detail"])
 
-    def test_special_characters_in_activity_name(self, client, sample_activities):
+    def test_special_characters_in_activity_name(self, client, sample_activities, activities):
         """Test with special characters in activity name"""
         # Add an activity with special characters to our test data
-        from src.app import activities
         special_activity = "Test & Fun Activity!"
         activities[special_activity] = {
             "description": "Activity with special chars",
@@ -110,21 +109,39 @@ class TestValidationAndEdgeCases:
         for email in emails:
             assert email in participants
 
-    def test_signup_to_full_activity(self, client, sample_activities):
+    def test_signup_to_full_activity(self, client, sample_activities, activities):
         """Test signup when activity is at max capacity"""
         # Modify test activity to be nearly full
-        from src.app import activities
         activity_name = "Test Activity"
         activities[activity_name]["max_participants"] = 2  # Already has 2 participants
         
         email = "newuser@example.com"
         
-        # This should still work (no capacity check in current implementation)
+        # Capacity is enforced: a full activity answers 409 Conflict
         response = client.post(f"/activities/{activity_name}/signup?email={email}")
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Activity is full"
+        assert email not in activities[activity_name]["participants"]
+
+    def test_signup_to_full_activity_with_waitlist(self, client, activities):
+        """Test that a full activity queues the student when waitlist=true"""
+        activity_name = "Test Activity"
+        activities[activity_name]["max_participants"] = 2
+
+        email = "waiting@example.com"
+        response = client.post(f"/activities/{activity_name}/signup?email={email}&waitlist=true")
+        assert response.status_code == 202
+        assert response.json()["message"] == f"Added {email} to the waitlist for {activity_name}"
+        assert activities.waitlist(activity_name) == [email]
+
+        # Joining the waitlist twice is rejected
+        response = client.post(f"/activities/{activity_name}/signup?email={email}&waitlist=true")
+        assert response.status_code == 400
+
+        # Unregistering removes the student from the waitlist
+        response = client.delete(f"/activities/{activity_name}/participants/{email}")
         assert response.status_code == 200
-        
-        # Note: Current implementation doesn't enforce max_participants limit
-        # This test documents current behavior
+        assert activities.waitlist(activity_name) == []
 
     def test_activities_data_structure(self, client, sample_activities):
         """Test that activities data has correct structure"""
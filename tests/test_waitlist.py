@@ -0,0 +1,157 @@
+"""
+Tests for waitlist promotion and the waitlist position endpoint
+"""
+import random
+import threading
+
+from src.storage import WALStorage
+from src.store import ActivityStore, StoreError
+
+FULL = {"description": "Full", "schedule": "Always", "max_participants": 2,
+        "participants": ["a@example.com", "b@example.com"]}
+
+
+def queue_up(client, *emails):
+    for email in emails:
+        assert client.post(f"/activities/Full Activity/signup?email={email}&waitlist=true").status_code == 202
+
+
+class TestPromotion:
+    """Test class for promoting the front of the waitlist when a seat frees up"""
+
+    def test_unregister_promotes_in_order(self, client, activities):
+        """Test that each freed seat goes to the longest-waiting student"""
+        activities["Full Activity"] = FULL
+        queue_up(client, "c@example.com", "d@example.com", "e@example.com")
+        version = activities.version
+
+        client.delete("/activities/Full Activity/participants/d@example.com")
+        client.delete("/activities/Full Activity/participants/a@example.com")
+        assert activities["Full Activity"]["participants"] == ["b@example.com", "c@example.com"]
+        assert activities.waitlist("Full Activity") == ["e@example.com"]
+        assert activities.enrollments_for("c@example.com") == (frozenset({"Full Activity"}), frozenset())
+
+        changes = client.get(f"/activities/changes?since={version}").json()["changes"]
+        assert [(change["op"], change["email"]) for change in changes] == [
+            ("unregister", "a@example.com"), ("signup", "c@example.com")]
+
+    def test_leaving_the_waitlist_frees_no_seat(self, activities):
+        """Test that only unregistering a participant promotes anyone"""
+        activities["Full Activity"] = FULL
+        activities.enroll("Full Activity", "c@example.com", waitlist=True)
+        activities.enroll("Full Activity", "d@example.com", waitlist=True)
+        assert activities.withdraw("Full Activity", "c@example.com") == "unwaitlisted"
+        assert activities["Full Activity"]["participants"] == ["a@example.com", "b@example.com"]
+        assert activities.waitlist("Full Activity") == ["d@example.com"]
+
+    def test_batch_promotions_match_the_dry_run(self, activities):
+        """Test that an atomic batch sees the seat it frees already taken"""
+        activities["Full Activity"] = FULL
+        activities.enroll("Full Activity", "c@example.com", waitlist=True)
+        operations = [("unregister", "Full Activity", "a@example.com"),
+                      ("signup", "Full Activity", "x@example.com")]
+
+        outcomes, applied = activities.apply_batch(operations, atomic=True)
+        assert not applied
+        assert outcomes[0] == "unregistered"
+        assert outcomes[1].detail == "Activity is full"
+
+        outcomes, applied = activities.apply_batch(operations[:1] + [("unregister", "Full Activity", "c@example.com")],
+                                                   atomic=True)
+        assert applied
+        assert outcomes == ["unregistered", "unregistered"]
+        assert activities["Full Activity"]["participants"] == ["b@example.com"]
+
+    def test_batch_unregisters_a_promoted_student(self, activities):
+        """Test a batch that frees a seat, drops the student promoted to it, then signs up"""
+        activities["Full Activity"] = FULL
+        activities.enroll("Full Activity", "c@example.com", waitlist=True)
+        operations = [("unregister", "Full Activity", "a@example.com"),
+                      ("unregister", "Full Activity", "c@example.com"),
+                      ("signup", "Full Activity", "x@example.com")]
+
+        outcomes, applied = activities.apply_batch(operations + [("unregister", "Full Activity", "c@example.com")],
+                                                   atomic=True)
+        assert not applied
+        assert outcomes[:3] == ["unregistered", "unregistered", "enrolled"]
+        assert outcomes[3].detail == "Student is not signed up for this activity"
+
+        outcomes, applied = activities.apply_batch(operations, atomic=True)
+        assert applied
+        assert outcomes == ["unregistered", "unregistered", "enrolled"]
+        assert activities["Full Activity"]["participants"] == ["b@example.com", "x@example.com"]
+        assert activities.waitlist("Full Activity") == []
+
+    def test_promotions_survive_a_restart(self, tmp_path):
+        """Test that replaying the log gives the same seats and queue"""
+        store = ActivityStore({"Full Activity": FULL}, storage=WALStorage(tmp_path))
+        for email in ("c@example.com", "d@example.com"):
+            store.enroll("Full Activity", email, waitlist=True)
+        store.withdraw("Full Activity", "a@example.com")
+        store.close()
+
+        restored = ActivityStore(storage=WALStorage(tmp_path))
+        assert restored["Full Activity"]["participants"] == ["b@example.com", "c@example.com"]
+        assert restored.waitlist_position("Full Activity", "d@example.com") == (1, 1)
+        restored.close()
+
+    def test_concurrent_unregisters_and_queueing(self):
+        """Test that seats are never oversold and never left empty with a queue"""
+        names = [f"Activity {n}" for n in range(4)]
+        emails = [f"s{n}@example.com" for n in range(20)]
+        store = ActivityStore({
+            name: {"description": "x", "schedule": "Always", "max_participants": 3, "participants": []}
+            for name in names
+        })
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(500):
+                name, email = rng.choice(names), rng.choice(emails)
+                try:
+                    if rng.random() < 0.6:
+                        store.enroll(name, email, waitlist=True)
+                    else:
+                        store.withdraw(name, email)
+                except StoreError:
+                    pass
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name in names:
+            participants, queue = store[name]["participants"].to_list(), store.waitlist(name)
+            assert len(participants) <= 3
+            assert not queue or len(participants) == 3
+            assert not set(participants) & set(queue)
+
+
+class TestWaitlistPosition:
+    """Test class for GET /activities/{activity_name}/waitlist/{email}"""
+
+    def test_position_moves_up(self, client, activities):
+        """Test the position as students ahead leave and seats free up"""
+        activities["Full Activity"] = FULL
+        queue_up(client, "c@example.com", "d@example.com", "e@example.com")
+        url = "/activities/Full Activity/waitlist/e@example.com"
+        assert client.get(url).json() == {"activity": "Full Activity", "email": "e@example.com",
+                                          "status": "waitlisted", "position": 3, "waitlist_length": 3}
+
+        client.delete("/activities/Full Activity/participants/d@example.com")
+        assert client.get(url).json()["position"] == 2
+        client.delete("/activities/Full Activity/participants/a@example.com")
+        assert client.get(url).json()["position"] == 1
+
+        client.delete("/activities/Full Activity/participants/b@example.com")
+        assert client.get(url).json() == {"activity": "Full Activity", "email": "e@example.com",
+                                          "status": "enrolled", "waitlist_length": 0}
+
+    def test_not_queued(self, client):
+        """Test unknown students and activities"""
+        response = client.get("/activities/Test Activity/waitlist/nobody@example.com")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Student is not on the waitlist for this activity"
+        assert client.get("/activities/Nope/waitlist/test1@example.com").status_code == 404